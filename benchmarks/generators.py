@@ -0,0 +1,167 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+EXAMPLES_DIR = REPO_ROOT / "json_examples"
+
+@dataclass(frozen=True)
+class Scale:
+    # choices: choice-set / option / agent count; resources: resource count (also the
+    # usage-trace length); density: nonzero share of transition and demand matrices.
+    choices: int
+    resources: int = 4
+    density: float = 0.1
+
+    @property
+    def label(self) -> str:
+        return f"n={self.choices},r={self.resources},d={self.density:g}"
+
+def load_example(service: str) -> Dict[str, Any]:
+    path = EXAMPLES_DIR / f"{service}.json"
+    return json.loads(path.read_text()) if path.exists() else {}
+
+def names(prefix: str, n: int) -> List[str]:
+    return [f"{prefix}{i}" for i in range(n)]
+
+def value_range(values: Any, default: Tuple[float, float]) -> Tuple[float, float]:
+    # Synthetic values are drawn from the span of the example's values, so generated
+    # inputs keep the example's magnitudes.
+    arr = np.asarray([v for v in values if isinstance(v, (int, float))], dtype=float)
+    if arr.size == 0:
+        return default
+    lo, hi = float(arr.min()), float(arr.max())
+    return (lo, hi) if hi > lo else (lo * 0.5, lo * 1.5 + 1.0)
+
+def stochastic_matrix(rng: np.random.Generator, n: int, density: float) -> List[List[float]]:
+    # Keep the diagonal so every row has mass and the chain stays aperiodic.
+    P = rng.random((n, n)) * (rng.random((n, n)) < density)
+    P[np.arange(n), np.arange(n)] += rng.random(n) + 0.1
+    return (P / P.sum(axis=1, keepdims=True)).tolist()
+
+def payoffs(rng: np.random.Generator, keys: List[str], example: Dict[str, float], default: Tuple[float, float] = (0.0, 10.0)) -> Dict[str, float]:
+    lo, hi = value_range(example.values(), default)
+    return dict(zip(keys, rng.uniform(lo, hi, len(keys)).tolist()))
+
+def compute_utility(rng: np.random.Generator, template: Dict[str, Any], scale: Scale) -> Dict[str, Any]:
+    outcomes = template.get("outcome_set") or [{"id": "o", "value": 100.0, "attention_cost": 10.0}]
+    attributes = [k for k in outcomes[0] if k != "id"]
+    columns = {a: rng.uniform(*value_range([o.get(a) for o in outcomes], (0.0, 1.0)), scale.choices) for a in attributes}
+    outcome_set = [
+        {"id": f"outcome{i}", **{a: float(columns[a][i]) for a in attributes}}
+        for i in range(scale.choices)
+    ]
+    return {**template, "outcome_set": outcome_set}
+
+def scarcity_constraint(rng: np.random.Generator, template: Dict[str, Any], scale: Scale) -> Dict[str, Any]:
+    resources = names("resource", scale.resources)
+    pool_lo, pool_hi = value_range((template.get("resource_pool") or {}).values(), (50.0, 100.0))
+    demand_lo, demand_hi = value_range(
+        [v for d in (template.get("demand_vector") or {}).values() for v in d.values()], (5.0, 80.0)
+    )
+    pool = dict(zip(resources, rng.uniform(pool_lo, pool_hi, scale.resources).tolist()))
+    demands = rng.uniform(demand_lo, demand_hi, (scale.choices, scale.resources))
+    mask = rng.random(demands.shape) < max(scale.density, 1.0 / scale.resources)
+    demand_vector = {
+        option: {r: float(d) for r, d, m in zip(resources, row, keep) if m}
+        for option, row, keep in zip(names("option", scale.choices), demands, mask)
+    }
+    return {**template, "resource_pool": pool, "demand_vector": demand_vector}
+
+def incentive_alignment(rng: np.random.Generator, template: Dict[str, Any], scale: Scale) -> Dict[str, Any]:
+    choices = names("strategy", scale.choices)
+    return {**template, "choice_set": choices, "payoff_matrix": payoffs(rng, choices, template.get("payoff_matrix") or {})}
+
+def bounded_rationality(rng: np.random.Generator, template: Dict[str, Any], scale: Scale) -> Dict[str, Any]:
+    choices = names("choice", scale.choices)
+    return {**template, "choice_set": choices, "payoff_matrix": payoffs(rng, choices, template.get("payoff_matrix") or {})}
+
+def payoff_weighted_aggregation(rng: np.random.Generator, template: Dict[str, Any], scale: Scale) -> Dict[str, Any]:
+    proposals = names("proposal", scale.choices)
+    amount_lo, amount_hi = value_range(
+        [p.get("amount") for p in (template.get("proposal_map") or {}).values() if isinstance(p, dict)], (50.0, 150.0)
+    )
+    amounts = rng.uniform(amount_lo, amount_hi, scale.choices)
+    return {
+        **template,
+        "proposal_map": {p: {"amount": float(a)} for p, a in zip(proposals, amounts)},
+        "payoff_gradients": payoffs(rng, proposals, template.get("payoff_gradients") or {}, (0.0, 1.0))
+    }
+
+def efficiency_ranking(rng: np.random.Generator, template: Dict[str, Any], scale: Scale) -> Dict[str, Any]:
+    candidates = names("option", scale.choices)
+    traces = rng.dirichlet(np.ones(scale.resources), scale.choices)
+    return {
+        **template,
+        "candidate_set": candidates,
+        "usage_trace": dict(zip(candidates, traces.tolist())),
+        "payoff_vector": payoffs(rng, candidates, template.get("payoff_vector") or {})
+    }
+
+def aggregate_weighted_choice(rng: np.random.Generator, template: Dict[str, Any], scale: Scale) -> Dict[str, Any]:
+    agents = list((template.get("economic_values") or {}).values())
+    metrics = ("benefit", "cost", "capability", "tokenFlow")
+    columns = {m: rng.uniform(*value_range([a.get(m) for a in agents], (0.0, 1.0)), scale.choices) for m in metrics}
+    return {
+        **template,
+        "economic_values": {
+            f"agent{i}": {m: float(columns[m][i]) for m in metrics} for i in range(scale.choices)
+        }
+    }
+
+def risk_assessment(rng: np.random.Generator, template: Dict[str, Any], scale: Scale) -> Dict[str, Any]:
+    choices = names("option", scale.choices)
+    payload = {**template, "choice_set": choices, "payoff_matrix": payoffs(rng, choices, template.get("payoff_matrix") or {})}
+    payload["prob_matrix"] = stochastic_matrix(rng, scale.choices, scale.density) if scale.density > 0 else None
+    return payload
+
+def opportunity_cost(rng: np.random.Generator, template: Dict[str, Any], scale: Scale) -> Dict[str, Any]:
+    choices = names("choice", scale.choices)
+    payload = {**template, "choice_set": choices, "payoff_matrix": payoffs(rng, choices, template.get("payoff_matrix") or {})}
+    payload["P"] = stochastic_matrix(rng, scale.choices, scale.density) if scale.density > 0 else None
+    return payload
+
+Generator = Callable[[np.random.Generator, Dict[str, Any], Scale], Dict[str, Any]]
+
+GENERATORS: Dict[str, Generator] = {
+    "compute_utility": compute_utility,
+    "scarcity_constraint": scarcity_constraint,
+    "incentive_alignment": incentive_alignment,
+    "bounded_rationality": bounded_rationality,
+    "payoff_weighted_aggregation": payoff_weighted_aggregation,
+    "efficiency_ranking": efficiency_ranking,
+    "aggregate_weighted_choice": aggregate_weighted_choice,
+    "risk_assessment": risk_assessment,
+    "opportunity_cost": opportunity_cost
+}
+
+def generate(service: str, scale: Scale, seed: int) -> Dict[str, Any]:
+    # Each (service, scale, seed) maps to one payload, independent of what else runs.
+    rng = np.random.default_rng([seed, scale.choices, scale.resources, int(scale.density * 1e6)])
+    return GENERATORS[service](rng, load_example(service), scale)
+
+def seed_cases(paths: List[Path]) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    # Yields (service, source, payload). A .json file is one payload for the service it is
+    # named after; a .jsonl file holds {"service": ..., "payload": ...} lines. Lines without
+    # a known service and a payload object (e.g. plain work-order entries) are skipped.
+    for path in paths:
+        if path.is_dir():
+            yield from seed_cases(sorted(path.glob("*.json")))
+            continue
+        if not path.exists():
+            continue
+        if path.suffix == ".json":
+            if path.stem in GENERATORS:
+                yield path.stem, path.name, json.loads(path.read_text())
+            continue
+        for number, line in enumerate(path.read_text().splitlines(), start=1):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            service: Optional[str] = entry.get("service") if isinstance(entry, dict) else None
+            if service in GENERATORS and isinstance(entry.get("payload"), dict):
+                yield service, f"{path.name}:{number}", entry["payload"]
@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import importlib
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from benchmarks.generators import GENERATORS, REPO_ROOT, EXAMPLES_DIR, Scale, generate, seed_cases
+
+# service -> (route, request model, service function), by naming convention of models/ and services/
+def service_target(service: str) -> Tuple[str, Any, Callable[[Any], Any]]:
+    model_name = "".join(part.capitalize() for part in service.split("_")) + "Request"
+    model = getattr(importlib.import_module(f"models.{service}_model"), model_name)
+    fn = getattr(importlib.import_module(f"services.{service}_service"), f"{service}_service")
+    return "/economics/" + service.replace("_", "-"), model, fn
+
+def timings(run: Callable[[], Any], repeat: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        run()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+async def async_timings(run: Callable[[], Any], repeat: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        await run()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await run()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {
+        "median_ms": float(np.median(ms)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "min_ms": float(ms.min()),
+        "mean_ms": float(ms.mean()),
+        "stdev_ms": float(statistics.pstdev(ms)),
+        "repeat": len(samples)
+    }
+
+def bench_direct(service: str, payload: Dict[str, Any], repeat: int, warmup: int) -> Dict[str, float]:
+    _, model, fn = service_target(service)
+    request = model.model_validate(payload)
+    return summarize(timings(lambda: fn(request), repeat, warmup))
+
+async def bench_asgi(client: Any, service: str, payload: Dict[str, Any], repeat: int, warmup: int) -> Dict[str, float]:
+    route, _, _ = service_target(service)
+    body = json.dumps(payload).encode()
+
+    async def call() -> None:
+        response = await client.post(route, content=body, headers={"content-type": "application/json"})
+        if response.status_code != 200:
+            raise RuntimeError(f"{route} answered {response.status_code}: {response.text[:200]}")
+
+    return summarize(await async_timings(call, repeat, warmup))
+
+def case_key(result: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (result["service"], result["mode"], result["source"], result.get("scale"))
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def build_cases(args: argparse.Namespace) -> List[Tuple[str, str, Optional[str], Dict[str, Any]]]:
+    services = args.services or list(GENERATORS)
+    cases = []
+    if not args.no_seed:
+        for service, source, payload in seed_cases([Path(p) for p in args.seed_files]):
+            if service in services:
+                cases.append((service, source, None, payload))
+    for service in services:
+        for n in args.sizes:
+            scale = Scale(choices=n, resources=args.resources, density=args.density)
+            cases.append((service, "generated", scale.label, generate(service, scale, args.seed)))
+    return cases
+
+async def run_asgi(cases: List[Tuple[str, str, Optional[str], Dict[str, Any]]], args: argparse.Namespace) -> List[Dict[str, Any]]:
+    import httpx
+    from core.execution import executor
+    from main import app
+
+    executor.start()
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for service, source, scale, payload in cases:
+                results.append(record(service, "asgi", source, scale, await bench_asgi(client, service, payload, args.repeat, args.warmup)))
+    finally:
+        executor.shutdown()
+    return results
+
+def record(service: str, mode: str, source: str, scale: Optional[str], stats: Dict[str, float]) -> Dict[str, Any]:
+    result = {"service": service, "mode": mode, "source": source, "scale": scale, **stats}
+    print(f"{service:28s} {mode:6s} {(scale or source):28s} median {stats['median_ms']:10.3f} ms  p95 {stats['p95_ms']:10.3f} ms", file=sys.stderr)
+    return result
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path, threshold: float) -> List[Dict[str, Any]]:
+    baseline = {case_key(r): r for r in json.loads(baseline_path.read_text())["results"]}
+    regressions = []
+    for result in results:
+        base = baseline.get(case_key(result))
+        if base is None:
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] > 0 else float("inf")
+        result["baseline_median_ms"] = base["median_ms"]
+        result["ratio"] = ratio
+        if ratio > 1.0 + threshold:
+            regressions.append(result)
+    return regressions
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the economics services directly and through the ASGI app.")
+    parser.add_argument("--services", nargs="*", choices=sorted(GENERATORS), help="Services to run (default: all).")
+    parser.add_argument("--sizes", type=lambda s: [int(v) for v in s.split(",")], default=[10, 100, 1000], help="Comma-separated choice-set sizes.")
+    parser.add_argument("--resources", type=int, default=8, help="Resource count (also the usage-trace length).")
+    parser.add_argument("--density", type=float, default=0.1, help="Nonzero share of transition/demand matrices; 0 omits transition matrices.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--modes", nargs="*", choices=("direct", "asgi"), default=["direct", "asgi"])
+    parser.add_argument("--seed-files", nargs="*", default=[str(EXAMPLES_DIR), str(REPO_ROOT / "requests.jsonl")],
+                        help="json_examples-style directories/files or JSONL files of {\"service\", \"payload\"} entries.")
+    parser.add_argument("--no-seed", action="store_true", help="Only run generated inputs.")
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this path (default: stdout).")
+    parser.add_argument("--baseline", type=Path, help="Compare medians against a previous results file.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown before a case counts as a regression.")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    cases = build_cases(args)
+    results = []
+    if "direct" in args.modes:
+        for service, source, scale, payload in cases:
+            results.append(record(service, "direct", source, scale, bench_direct(service, payload, args.repeat, args.warmup)))
+    if "asgi" in args.modes:
+        results.extend(asyncio.run(run_asgi(cases, args)))
+
+    regressions = compare(results, args.baseline, args.threshold) if args.baseline else []
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "baseline": str(args.baseline) if args.baseline else None,
+            "threshold": args.threshold
+        },
+        "results": results,
+        "regressions": [case_key(r) for r in regressions]
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    else:
+        print(text)
+
+    for r in regressions:
+        print(f"REGRESSION {r['service']} {r['mode']} {r['scale'] or r['source']}: "
+              f"{r['baseline_median_ms']:.3f} ms -> {r['median_ms']:.3f} ms (x{r['ratio']:.2f})", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
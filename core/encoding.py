@@ -0,0 +1,270 @@
+import io
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import ValidationError
+
+from core.metrics import instrument
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    ARROW_AVAILABLE = True
+except Exception:
+    ARROW_AVAILABLE = False
+
+JSON = "application/json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+NPY = "application/x-npy"
+BINARY_TYPES = (ARROW_STREAM, NPY)
+NDJSON = "application/x-ndjson"
+NDJSON_CHUNK_ROWS = 2048
+NDJSON_MAX_LINE_BYTES = 1 << 20
+
+class Ragged:
+    # Variable-length rows as one flat value buffer plus per-row lengths (CSR style).
+    def __init__(self, values: np.ndarray, lengths: np.ndarray):
+        self.values = values
+        self.lengths = lengths
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return np.concatenate(([0], np.cumsum(self.lengths)))
+
+    def to_matrix(self) -> np.ndarray:
+        n = self.lengths.size
+        if n and not np.all(self.lengths == n):
+            raise HTTPException(status_code=400, detail="Matrix columns must hold one row of length n per record.")
+        return self.values.reshape(n, n)
+
+def media_type(header: Optional[str]) -> str:
+    return (header or "").split(";")[0].strip().lower()
+
+def request_format(request: Request) -> Optional[str]:
+    fmt = media_type(request.headers.get("content-type"))
+    return fmt if fmt in BINARY_TYPES else None
+
+def response_format(request: Request) -> Optional[str]:
+    best, best_q = None, 0.0
+    for part in request.headers.get("accept", "").split(","):
+        fields = [f.strip() for f in part.split(";")]
+        fmt = fields[0].lower()
+        if fmt not in BINARY_TYPES + (JSON,):
+            continue
+        q = 1.0
+        for f in fields[1:]:
+            if f.startswith("q="):
+                try:
+                    q = float(f[2:])
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = fmt, q
+    return best if best in BINARY_TYPES else None
+
+def require_arrow() -> None:
+    if not ARROW_AVAILABLE:
+        raise HTTPException(status_code=415, detail="Arrow IPC needs pyarrow, which is not installed on this server.")
+
+def decode_npy(body: bytes, names: Sequence[str]) -> Dict[str, Any]:
+    # The body is a sequence of .npy arrays in the documented order; trailing optional arrays may be omitted.
+    buf = io.BytesIO(body)
+    arrays: Dict[str, Any] = {}
+    for name in names:
+        if buf.tell() >= len(body):
+            break
+        try:
+            arrays[name] = np.load(buf, allow_pickle=False)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid .npy payload for '{name}': {exc}")
+    return arrays
+
+def decode_arrow(body: bytes) -> Dict[str, Any]:
+    require_arrow()
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid Arrow IPC stream: {exc}")
+    arrays: Dict[str, Any] = {}
+    for name in table.column_names:
+        column = table.column(name).combine_chunks()
+        if pa.types.is_list(column.type) or pa.types.is_large_list(column.type) or pa.types.is_fixed_size_list(column.type):
+            lengths = pc.list_value_length(column).fill_null(0).to_numpy()
+            arrays[name] = Ragged(column.flatten().to_numpy(zero_copy_only=False), lengths)
+        else:
+            arrays[name] = column.to_numpy(zero_copy_only=False)
+    return arrays
+
+async def read_columns(request: Request, npy_order: Sequence[str]) -> Dict[str, Any]:
+    body = await request.body()
+    if request_format(request) == NPY:
+        return decode_npy(body, npy_order)
+    return decode_arrow(body)
+
+def encode_columns(columns: Dict[str, Any], fmt: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    headers = dict(headers or {})
+    if fmt == NPY:
+        buf = io.BytesIO()
+        for values in columns.values():
+            np.save(buf, np.asarray(values), allow_pickle=False)
+        headers["X-Array-Names"] = ",".join(columns.keys())
+        return Response(content=buf.getvalue(), media_type=NPY, headers=headers)
+
+    require_arrow()
+    batch = pa.RecordBatch.from_pydict({name: pa.array(np.asarray(values)) for name, values in columns.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM, headers=headers)
+
+def column(arrays: Dict[str, Any], name: str, dtype: Any = float, required: bool = True) -> Optional[np.ndarray]:
+    values = arrays.get(name)
+    if values is None:
+        if required:
+            raise HTTPException(status_code=400, detail=f"Missing column '{name}'.")
+        return None
+    if isinstance(values, Ragged):
+        raise HTTPException(status_code=400, detail=f"Column '{name}' must not be a list column.")
+    return np.asarray(values, dtype=dtype)
+
+def matrix_column(arrays: Dict[str, Any], name: str) -> Optional[np.ndarray]:
+    # Square matrices arrive as a 2-D .npy array or as an Arrow list column with one row per record.
+    values = arrays.get(name)
+    if values is None:
+        return None
+    values = values.to_matrix() if isinstance(values, Ragged) else np.asarray(values, dtype=float)
+    if values.ndim != 2:
+        raise HTTPException(status_code=400, detail=f"Column '{name}' must be a 2-D matrix.")
+    return values.astype(float, copy=False)
+
+def query_float(request: Request, name: str, default: float) -> float:
+    try:
+        return float(request.query_params.get(name, default))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Query parameter '{name}' must be a number.")
+
+def query_int(
+    request: Request,
+    name: str,
+    default: Optional[int] = None,
+    minimum: Optional[int] = None,
+    maximum: Optional[int] = None
+) -> Optional[int]:
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Query parameter '{name}' must be an integer.")
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        bound = f"at least {minimum}" if maximum is None else f"between {minimum} and {maximum}"
+        raise HTTPException(status_code=400, detail=f"Query parameter '{name}' must be {bound}.")
+    return number
+
+BinaryHandler = Callable[[Request, Optional[str], str], Awaitable[Response]]
+
+def binary_variant(handler: BinaryHandler) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    # Attaches an array-native handler to a JSON endpoint. It is used when the body is
+    # Arrow/.npy or when the client accepts Arrow/.npy back; plain JSON keeps the pydantic route.
+    def attach(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        endpoint.binary_variant = handler
+        return endpoint
+    return attach
+
+class NegotiatedRoute(APIRoute):
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        json_handler = super().get_route_handler()
+        binary_handler: Optional[BinaryHandler] = getattr(self.endpoint, "binary_variant", None)
+        if binary_handler is None:
+            return instrument(self, json_handler)
+
+        async def handler(request: Request) -> Response:
+            in_fmt, out_fmt = request_format(request), response_format(request)
+            if in_fmt is None and out_fmt is None:
+                return await json_handler(request)
+            return await binary_handler(request, in_fmt, out_fmt or in_fmt)
+
+        return instrument(self, handler)
+
+async def json_or_columns(
+    request: Request,
+    in_fmt: Optional[str],
+    model: Any,
+    npy_order: Sequence[str]
+) -> Tuple[Optional[Any], Dict[str, Any]]:
+    # JSON bodies are still validated by the pydantic model; binary ones become column arrays.
+    if in_fmt is None:
+        try:
+            return model.model_validate_json(await request.body()), {}
+        except ValidationError as exc:
+            raise RequestValidationError(exc.errors())
+    return None, await read_columns(request, npy_order)
+
+def select_fields(fields: Optional[List[str]], available: Sequence[str]) -> List[str]:
+    if fields is None:
+        return list(available)
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}. Use any of {list(available)}.")
+    return list(dict.fromkeys(fields))
+
+def ndjson_records(
+    ids: Sequence[str],
+    columns: Dict[str, np.ndarray],
+    summary: Dict[str, Any],
+    id_field: str = "id",
+    chunk_rows: int = NDJSON_CHUNK_ROWS
+) -> Iterator[bytes]:
+    # One JSON object per row, rendered and sent chunk_rows at a time, then one summary
+    # line. Only the current chunk exists as Python objects, so the serialized response
+    # never has to be held in memory.
+    names = list(columns)
+    template = "{" + json.dumps(id_field) + ":%s" + "".join(f",{json.dumps(n)}:%r" for n in names) + "}\n"
+    quote = json.encoder.encode_basestring
+    for start in range(0, len(ids), chunk_rows):
+        stop = start + chunk_rows
+        chunk = [columns[n][start:stop] for n in names]
+        rows = zip(ids[start:stop], *(c.tolist() for c in chunk))
+        if all(np.isfinite(c).all() for c in chunk):
+            lines = [template % (quote(i), *values) for i, *values in rows]
+        else:
+            lines = [json.dumps({id_field: i, **dict(zip(names, values))}) + "\n" for i, *values in rows]
+        yield "".join(lines).encode()
+    yield (json.dumps(summary) + "\n").encode()
+
+def ndjson_response(records: Iterator[bytes]) -> StreamingResponse:
+    return StreamingResponse(records, media_type=NDJSON)
+
+async def ndjson_lines(
+    request: Request,
+    chunk_rows: int = NDJSON_CHUNK_ROWS,
+    max_line_bytes: int = NDJSON_MAX_LINE_BYTES
+) -> AsyncIterator[List[bytes]]:
+    # Reads an NDJSON request body as it arrives, chunk_rows lines at a time, so the whole
+    # body is never held at once. A line still open at the end of a part is carried over
+    # in a bytearray (amortized appends) and may not grow past max_line_bytes.
+    pending = bytearray()
+    lines: List[bytes] = []
+    async for part in request.stream():
+        *complete, rest = part.split(b"\n")
+        if complete:
+            complete[0] = bytes(pending) + complete[0]
+            pending = bytearray(rest)
+        else:
+            pending += rest
+        if len(pending) > max_line_bytes or (complete and len(complete[0]) > max_line_bytes):
+            raise HTTPException(status_code=400, detail=f"NDJSON lines may be at most {max_line_bytes} bytes.")
+        lines.extend(complete)
+        while len(lines) >= chunk_rows:
+            yield lines[:chunk_rows]
+            lines = lines[chunk_rows:]
+    if pending.strip():
+        lines.append(bytes(pending))
+    if lines:
+        yield lines
@@ -0,0 +1,180 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from core.metrics import Sample, collect_samples, record, stage
+from core.structured_logging import configure_logging, log_context, run_in_log_context
+
+LIGHT = "light"
+HEAVY = "heavy"
+
+Weight = Union[str, Callable[..., str]]
+
+def service_weight(weight: Weight) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    # Marks a service function as LIGHT (run in the threadpool) or HEAVY (run in the solver pool).
+    # The weight may also be a callable of the service arguments, for services whose
+    # cost depends on the requested mode.
+    def mark(fn: Callable[..., Any]) -> Callable[..., Any]:
+        fn.service_weight = weight
+        return fn
+    return mark
+
+def resolve_weight(fn: Callable[..., Any], *args: Any) -> str:
+    weight = getattr(fn, "service_weight", LIGHT)
+    return weight(*args) if callable(weight) else weight
+
+def preload_modules(modules: Sequence[str]) -> None:
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+
+def init_worker(modules: Sequence[str]) -> None:
+    configure_logging()
+    preload_modules(modules)
+
+def run_in_worker(context: Tuple[Optional[str], Optional[bool]], fn: Callable[..., Any], *args: Any) -> Tuple[Any, List[Sample]]:
+    # Metrics recorded in the worker go back with the result; the parent merges them
+    # into the request that submitted the call.
+    with collect_samples() as samples:
+        result = run_in_log_context(context, fn, *args)
+    return result, samples
+
+def ping() -> int:
+    return os.getpid()
+
+class ServiceExecutor:
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        timeout: float,
+        preload: Sequence[str] = (),
+        start_method: str = "spawn"
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.preload = tuple(preload)
+        self.start_method = start_method
+        self.in_flight = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return max(self.workers, 1) + self.max_queue
+
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=init_worker,
+                    initargs=(self.preload,)
+                )
+            return self._pool
+
+    def start(self) -> None:
+        # Spawn every worker up front so the first heavy requests do not pay for
+        # interpreter start-up and the numpy/cvxpy imports.
+        if self.workers > 0:
+            pool = self.pool()
+            for _ in range(self.workers):
+                pool.submit(ping)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Solver pool is saturated, retry later.",
+                    headers={"Retry-After": "1"}
+                )
+            self.in_flight += 1
+
+    def release(self, *_: Any) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with stage("compute"):
+            if resolve_weight(fn, *args) == LIGHT:
+                return await self.run_light(fn, *args)
+            return await self.run_heavy(fn, *args)
+
+    async def run_light(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # Light work still scales with the request, so it runs off the event loop and
+        # under the same timeout; the threadpool's own limit queues any excess.
+        try:
+            return await asyncio.wait_for(run_in_threadpool(fn, *args), self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"{fn.__name__} timed out after {self.timeout:g}s.")
+
+    async def run_heavy(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self.acquire()
+        in_pool = self.workers > 0
+        try:
+            if not in_pool:
+                future: "asyncio.Future[Any]" = asyncio.ensure_future(run_in_threadpool(fn, *args))
+                future.add_done_callback(self.release)
+            else:
+                pool_future: Future = self.pool().submit(run_in_worker, log_context(), fn, *args)
+                # the slot is held until the worker is actually free again, even after a timeout
+                pool_future.add_done_callback(self.release)
+                future = asyncio.wrap_future(pool_future)
+        except BrokenProcessPool:
+            self.release()
+            self.shutdown()
+            raise HTTPException(status_code=503, detail="Solver pool restarted, retry later.", headers={"Retry-After": "1"})
+        except BaseException:
+            self.release()
+            raise
+
+        try:
+            result = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"{fn.__name__} timed out after {self.timeout:g}s.")
+        except BrokenProcessPool:
+            self.shutdown()
+            raise HTTPException(status_code=503, detail="Solver pool restarted, retry later.", headers={"Retry-After": "1"})
+        if not in_pool:
+            return result
+        result, samples = result
+        record(samples)
+        return result
+
+async def run_checked(fn: Callable[..., Any], *args: Any) -> Any:
+    # For routes whose services raise ValueError only for inputs the client can fix:
+    # those answer 400, or the status_code the exception class declares (e.g. 404).
+    try:
+        return await executor.run(fn, *args)
+    except ValueError as exc:
+        raise HTTPException(status_code=getattr(exc, "status_code", 400), detail=str(exc))
+
+def default_workers() -> int:
+    return min(4, os.cpu_count() or 1)
+
+executor = ServiceExecutor(
+    workers=int(os.getenv("ECONOMICS_POOL_WORKERS", default_workers())),
+    max_queue=int(os.getenv("ECONOMICS_POOL_MAX_QUEUE", "32")),
+    timeout=float(os.getenv("ECONOMICS_SERVICE_TIMEOUT", "30")),
+    preload=os.getenv("ECONOMICS_POOL_PRELOAD", "numpy,scipy.special,scipy.sparse,cvxpy").split(","),
+    start_method=os.getenv("ECONOMICS_POOL_START_METHOD", "spawn")
+)
@@ -0,0 +1,191 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(float(4 ** k) for k in range(14))
+
+Labels = Tuple[str, ...]
+# (kind, name, value) as recorded by stage() / observe_sizes(); kinds are "stage", "solver" and "size".
+Sample = Tuple[str, str, float]
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Labels, value: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Labels, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{format_labels(names, labels + (format_value(bound),))} {format_value(cumulative)}")
+                lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {format_value(series[-1])}")
+                lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {format_value(cumulative)}")
+        return lines
+
+REQUEST_SECONDS = Histogram(
+    "economics_request_duration_seconds", "Time spent in the route handler.", ("route", "method", "status"), LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "economics_stage_duration_seconds", "Time per request stage (validation, compute, serialization and service-defined stages).", ("route", "stage"), LATENCY_BUCKETS
+)
+SOLVER_CALLS = Counter("economics_solver_calls_total", "Solver invocations.", ("route", "solver"))
+SOLVER_SECONDS = Counter("economics_solver_seconds_total", "Time spent in solver invocations.", ("route", "solver"))
+INPUT_SIZE = Histogram("economics_input_size", "Problem sizes reported by the services.", ("route", "dimension"), SIZE_BUCKETS)
+
+REGISTRY = (REQUEST_SECONDS, STAGE_SECONDS, SOLVER_CALLS, SOLVER_SECONDS, INPUT_SIZE)
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+class RequestMetrics:
+    # Samples recorded while serving one request, flushed with the route label when it
+    # completes. Spans keep the first start and last end of each stage in this process.
+    def __init__(self):
+        self.samples: List[Sample] = []
+        self.spans: Dict[str, Tuple[float, float]] = {}
+
+    def span(self, name: str, start: float, end: float) -> None:
+        previous = self.spans.get(name)
+        self.spans[name] = (min(start, previous[0]), max(end, previous[1])) if previous else (start, end)
+
+request_metrics_var: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+def flush(samples: Sequence[Sample], route: str) -> None:
+    for kind, name, value in samples:
+        if kind == "stage":
+            STAGE_SECONDS.observe((route, name), value)
+        elif kind == "solver":
+            SOLVER_CALLS.inc((route, name))
+            SOLVER_SECONDS.inc((route, name), value)
+        elif kind == "size":
+            INPUT_SIZE.observe((route, name), value)
+
+def record(samples: Sequence[Sample]) -> None:
+    current = request_metrics_var.get()
+    if current is None:
+        flush(samples, "")
+    else:
+        current.samples.extend(samples)
+
+@contextmanager
+def stage(name: str, solver: Optional[str] = None) -> Iterator[None]:
+    # Times a block as a named stage of the current request; with solver set it also
+    # counts as one call of that solver.
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        samples: List[Sample] = [("stage", name, end - start)]
+        if solver is not None:
+            samples.append(("solver", solver, end - start))
+        record(samples)
+        current = request_metrics_var.get()
+        if current is not None:
+            current.span(name, start, end)
+
+def observe_sizes(**sizes: Any) -> None:
+    record([("size", name, float(value)) for name, value in sizes.items() if value is not None])
+
+@contextmanager
+def collect_samples() -> Iterator[List[Sample]]:
+    # Used in pool workers: samples are returned to the parent alongside the result.
+    current = RequestMetrics()
+    token = request_metrics_var.set(current)
+    try:
+        yield current.samples
+    finally:
+        request_metrics_var.reset(token)
+
+def error_status(exc: Exception) -> int:
+    if isinstance(exc, HTTPException):
+        return exc.status_code
+    if isinstance(exc, RequestValidationError):
+        return 422
+    return 500
+
+def instrument(route: APIRoute, handler: Callable[[Request], Awaitable[Response]]) -> Callable[[Request], Awaitable[Response]]:
+    # Validation is everything before the first compute stage (body read, parsing, pydantic),
+    # serialization everything after the last one (response model, rendering).
+    async def instrumented(request: Request) -> Response:
+        current = RequestMetrics()
+        token = request_metrics_var.set(current)
+        status = 500
+        start = time.perf_counter()
+        try:
+            response = await handler(request)
+            status = response.status_code
+            return response
+        except Exception as exc:
+            status = error_status(exc)
+            raise
+        finally:
+            end = time.perf_counter()
+            request_metrics_var.reset(token)
+            compute = current.spans.get("compute")
+            if compute is not None:
+                current.samples.append(("stage", "validation", compute[0] - start))
+                current.samples.append(("stage", "serialization", end - compute[1]))
+            flush(current.samples, route.path)
+            REQUEST_SECONDS.observe((route.path, request.method, str(status)), end - start)
+
+    return instrumented
+
+class InstrumentedRoute(APIRoute):
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        return instrument(self, super().get_route_handler())
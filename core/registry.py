@@ -0,0 +1,125 @@
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.execution import LIGHT
+
+startup_logger = logging.getLogger("economics.startup")
+
+# Service modules by short name; these are what pull in cvxpy and scipy.
+SERVICE_MODULES: Dict[str, str] = {
+    "aggregate_weighted_choice": "services.aggregate_weighted_choice_service",
+    "bounded_rationality": "services.bounded_rationality_service",
+    "compute_utility": "services.compute_utility_service",
+    "efficiency_ranking": "services.efficiency_ranking_service",
+    "incentive_alignment": "services.incentive_alignment_service",
+    "markov": "services.markov",
+    "opportunity_cost": "services.opportunity_cost_service",
+    "payoff_weighted_aggregation": "services.payoff_weighted_aggregation_service",
+    "risk_assessment": "services.risk_assessment_service",
+    "scarcity_constraint": "services.scarcity_constraint_service",
+}
+
+WARMUP = os.getenv("ECONOMICS_WARMUP", "all")
+
+_imports: Dict[str, Dict[str, Any]] = {}
+_import_lock = threading.Lock()
+
+def import_service(module: str) -> Any:
+    # Imports a service module and records what its first import cost. Dependencies shared
+    # by several services are charged to whichever of them is imported first. Python's own
+    # per-module import locks make concurrent imports safe, so no lock is held around them.
+    if module in _imports:
+        return sys.modules[module]
+    before = set(sys.modules)
+    start = time.perf_counter()
+    loaded = importlib.import_module(module)
+    seconds = time.perf_counter() - start
+    added = set(sys.modules) - before
+    entry = {
+        "seconds": round(seconds, 4),
+        "modules": len(added),
+        "packages": sorted({m.split(".")[0] for m in added} - {"core", "models", "services"}),
+        "thread": threading.current_thread().name
+    }
+    with _import_lock:
+        if module in _imports:
+            return loaded
+        _imports[module] = entry
+    startup_logger.info("service import", extra={"fields": {"module": module, **entry}})
+    return loaded
+
+class LazyService:
+    # A service function referenced by module and name. Routers hold these so that the
+    # app starts without importing the numeric stack; the module is imported on first use.
+    def __init__(self, module: str, name: str):
+        self.module = module
+        self.__name__ = name
+        self._fn: Optional[Callable[..., Any]] = None
+
+    def load(self) -> Callable[..., Any]:
+        if self._fn is None:
+            self._fn = getattr(import_service(self.module), self.__name__)
+        return self._fn
+
+    @property
+    def service_weight(self) -> Any:
+        return getattr(self.load(), "service_weight", LIGHT)
+
+    def __call__(self, *args: Any) -> Any:
+        return self.load()(*args)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # pool workers get the reference and import the module themselves
+        return LazyService, (self.module, self.__name__)
+
+def lazy(module: str, *names: str) -> Tuple[LazyService, ...]:
+    return tuple(LazyService(module, name) for name in names)
+
+def warmup_modules(spec: str) -> List[str]:
+    spec = spec.strip().lower()
+    if spec in ("", "none", "0", "false"):
+        return []
+    if spec == "all":
+        return list(SERVICE_MODULES.values())
+    names = [name.strip() for name in spec.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SERVICE_MODULES]
+    if unknown:
+        raise ValueError(f"Unknown services in ECONOMICS_WARMUP: {unknown}. Use 'all', 'none' or any of {list(SERVICE_MODULES)}.")
+    return [SERVICE_MODULES[name] for name in names]
+
+def warm_up(spec: str = WARMUP) -> Optional[threading.Thread]:
+    # Imports the configured service modules on a background thread, so start-up does not
+    # wait for them; a request that needs a module first just imports it itself.
+    modules = warmup_modules(spec)
+    if not modules:
+        return None
+
+    def run() -> None:
+        start = time.perf_counter()
+        for module in modules:
+            try:
+                import_service(module)
+            except Exception:
+                startup_logger.exception("service import failed", extra={"fields": {"module": module}})
+        startup_logger.info("warm-up finished", extra={"fields": {"seconds": round(time.perf_counter() - start, 4), "modules": len(modules)}})
+
+    thread = threading.Thread(target=run, name="economics-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def import_report() -> Dict[str, Any]:
+    with _import_lock:
+        imported = dict(_imports)
+    return {
+        "warmup": WARMUP,
+        "services": {
+            name: imported.get(module, {"seconds": None, "imported": module in sys.modules})
+            for name, module in SERVICE_MODULES.items()
+        },
+        "total_seconds": round(sum(entry["seconds"] for entry in imported.values()), 4)
+    }
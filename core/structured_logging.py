@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import queue
+import random
+import reprlib
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from core.metrics import observe_sizes
+
+LOGGER_NAME = "economics"
+access_logger = logging.getLogger(f"{LOGGER_NAME}.access")
+service_logger = logging.getLogger(f"{LOGGER_NAME}.services")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+sampled_var: ContextVar[Optional[bool]] = ContextVar("log_sampled", default=None)
+
+def parse_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for part in spec.split(","):
+        name, _, rate = part.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+LOG_LEVEL = os.getenv("ECONOMICS_LOG_LEVEL", "INFO").upper()
+DEFAULT_SAMPLE_RATE = float(os.getenv("ECONOMICS_LOG_SAMPLE_RATE", "1.0"))
+SAMPLE_RATES = parse_rates(os.getenv("ECONOMICS_LOG_SAMPLE_RATES", ""))
+MAX_ITEMS = int(os.getenv("ECONOMICS_LOG_MAX_ITEMS", "8"))
+MAX_CHARS = int(os.getenv("ECONOMICS_LOG_MAX_CHARS", "2000"))
+
+class SummaryRepr(reprlib.Repr):
+    # reprlib bounds containers and strings, but falls back to the full repr() for
+    # anything else; models and arrays are unpacked or described instead.
+    def __init__(self, max_items: int, max_chars: int):
+        super().__init__()
+        self.maxlevel = 4
+        self.maxdict = self.maxlist = self.maxtuple = self.maxset = max_items
+        self.maxstring = self.maxother = max(max_chars // 10, 40)
+        self.max_chars = max_chars
+
+    def repr1(self, x: Any, level: int) -> str:
+        if isinstance(x, BaseModel):
+            return f"{type(x).__name__}({self.repr_dict(dict(x), level)})"
+        if isinstance(x, np.ndarray):
+            return f"ndarray(shape={x.shape}, dtype={x.dtype})"
+        return super().repr1(x, level)
+
+    def repr(self, x: Any) -> str:
+        text = super().repr(x)
+        return text if len(text) <= self.max_chars else text[:self.max_chars - 3] + "..."
+
+summary_repr = SummaryRepr(MAX_ITEMS, MAX_CHARS)
+
+def summarize(value: Any) -> str:
+    return summary_repr.repr(value)
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "pid": record.process
+        }
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+class ContextQueueHandler(QueueHandler):
+    # The request id is read here, on the emitting thread, because the listener
+    # thread that formats the record has no access to the request's context.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return super().prepare(record)
+
+_listener: Optional[QueueListener] = None
+_configure_lock = threading.Lock()
+
+def configure_logging(level: str = LOG_LEVEL, stream: Any = None) -> None:
+    # Records are handed to a queue on the hot path; a listener thread formats and writes them.
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter())
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(level)
+        logger.handlers = [ContextQueueHandler(records)]
+        logger.propagate = False
+        _listener = QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+
+def shutdown_logging() -> None:
+    global _listener
+    with _configure_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+def endpoint_name(path: str) -> str:
+    return path.rsplit("/economics/", 1)[-1].strip("/")
+
+def sample_rate(endpoint: str) -> float:
+    return SAMPLE_RATES.get(endpoint, DEFAULT_SAMPLE_RATE)
+
+def is_sampled() -> bool:
+    sampled = sampled_var.get()
+    if sampled is None:
+        return random.random() < DEFAULT_SAMPLE_RATE
+    return sampled
+
+def log_context() -> Tuple[Optional[str], Optional[bool]]:
+    return request_id_var.get(), sampled_var.get()
+
+def run_in_log_context(context: Tuple[Optional[str], Optional[bool]], fn: Callable[..., Any], *args: Any) -> Any:
+    # Pool workers do not inherit context variables; the caller's are passed along explicitly.
+    request_id, sampled = context
+    request_token, sampled_token = request_id_var.set(request_id), sampled_var.set(sampled)
+    try:
+        return fn(*args)
+    finally:
+        request_id_var.reset(request_token)
+        sampled_var.reset(sampled_token)
+
+def log_result(service: str, result: Any, **sizes: Any) -> None:
+    # Sizes always feed the input-size metrics. INFO carries a bounded summary for
+    # sampled requests; the full result only at DEBUG.
+    observe_sizes(**sizes)
+    if service_logger.isEnabledFor(logging.DEBUG):
+        service_logger.debug(service, extra={"fields": {"service": service, "sizes": sizes, "result": repr(result)}})
+    elif service_logger.isEnabledFor(logging.INFO) and is_sampled():
+        service_logger.info(service, extra={"fields": {"service": service, "sizes": sizes, "summary": summarize(result)}})
+
+class RequestLoggingMiddleware:
+    # Plain ASGI middleware: assigns the request id, decides sampling once per request
+    # and writes one access record with latency and payload sizes.
+    def __init__(self, app: Callable[..., Any]):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[..., Any], send: Callable[..., Any]) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex
+        endpoint = endpoint_name(scope["path"])
+        request_token = request_id_var.set(request_id)
+        sampled_token = sampled_var.set(random.random() < sample_rate(endpoint))
+        state = {"status": 500, "response_bytes": 0}
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", request_id.encode("latin-1"))]
+            elif message["type"] == "http.response.body":
+                state["response_bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if state["status"] >= 500 or sampled_var.get():
+                access_logger.info("request", extra={"fields": {
+                    "method": scope.get("method"),
+                    "endpoint": endpoint,
+                    "status": state["status"],
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+                    "request_bytes": int(headers.get(b"content-length", b"0") or 0),
+                    "response_bytes": state["response_bytes"]
+                }})
+            request_id_var.reset(request_token)
+            sampled_var.reset(sampled_token)
@@ -1,19 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from core.execution import executor
+from core.metrics import render_metrics
+from core.registry import import_report, warm_up
+from core.structured_logging import RequestLoggingMiddleware, configure_logging, shutdown_logging
+
 from routers import (
     aggregate_weighted_choice_router,
     bounded_rationality_router,
     compute_utility_router,
     efficiency_ranking_router,
     incentive_alignment_router,
+    markov_router,
     opportunity_cost_router,
     payoff_weighted_aggregation_router,
     risk_assessment_router,
     scarcity_constraint_router,
 )
 
-app = FastAPI(title="Economics API",version = "1.0.0",root_path="/mobius-economic-science",root_path_in_servers=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    executor.start()
+    warm_up()
+    yield
+    executor.shutdown()
+    shutdown_logging()
+
+app = FastAPI(title="Economics API",version = "1.0.0",root_path="/mobius-economic-science",root_path_in_servers=True,lifespan=lifespan)
 
 # CORS Middleware for local development
 app.add_middleware(
@@ -23,16 +40,26 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestLoggingMiddleware)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Economics API"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/startup", include_in_schema=False)
+def startup_report():
+    return import_report()
+
 app.include_router(aggregate_weighted_choice_router.router, prefix="/economics")
 app.include_router(bounded_rationality_router.router, prefix="/economics")
 app.include_router(compute_utility_router.router, prefix="/economics")
 app.include_router(efficiency_ranking_router.router, prefix="/economics")
 app.include_router(incentive_alignment_router.router, prefix="/economics")
+app.include_router(markov_router.router, prefix="/economics")
 app.include_router(opportunity_cost_router.router, prefix="/economics")
 app.include_router(payoff_weighted_aggregation_router.router, prefix="/economics")
 app.include_router(risk_assessment_router.router, prefix="/economics")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 class AgentEconomicMetrics(BaseModel):
     benefit: float
@@ -7,11 +7,44 @@ class AgentEconomicMetrics(BaseModel):
     capability: float
     tokenFlow: float
 
+class AggregateState(BaseModel):
+    count: int = Field(0, description="Agents accumulated.")
+    total_benefit: float = 0.0
+    total_cost: float = 0.0
+    total_capability: float = 0.0
+    total_tokenFlow: float = 0.0
+    weighted_benefit: float = Field(0.0, description="Sum of capability x benefit.")
+    weighted_cost: float = Field(0.0, description="Sum of capability x cost.")
+    weighted_capability: float = Field(0.0, description="Sum of capability squared.")
+    weighted_tokenFlow: float = Field(0.0, description="Sum of capability x tokenFlow.")
+
 class AggregateWeightedChoiceRequest(BaseModel):
     economic_values: Dict[str, AgentEconomicMetrics] = Field(..., description="Dictionary of agent economic metrics, e.g., {agent_name: {'benefit': float, 'cost': float, 'capability': float, 'tokenFlow': float}}")
+    state: Optional[AggregateState] = Field(None, description="Partial state from earlier chunks (the 'state' of a previous response) to continue from.")
+    include_contributions: bool = Field(False, description="Echo economic_values back as agent_contributions.")
+    capability_weighted: bool = Field(False, description="Also report the capability-weighted score and averages.")
+
+class AggregateMergeRequest(BaseModel):
+    states: List[AggregateState] = Field(..., description="Partial states from chunks, workers or nodes, merged in any order.")
+    capability_weighted: bool = Field(False, description="Also report the capability-weighted score and averages.")
 
 class AggregateWeightedChoiceResponse(BaseModel):
     group_decision_score: float
     avg_capability: float
     avg_tokenFlow: float
-    agent_contributions: Dict[str, AgentEconomicMetrics]
+    agent_contributions: Optional[Dict[str, AgentEconomicMetrics]] = None
+    weighted_decision_score: Optional[float] = Field(None, description="Decision score with each agent's benefit and cost weighted by its capability.")
+    weighted_avg_capability: Optional[float] = None
+    weighted_avg_tokenFlow: Optional[float] = None
+    state: Optional[AggregateState] = Field(None, description="Running totals; send back as 'state' with the next chunk, or merge with others.")
+
+class AggregateWeightedChoiceBatchRequest(BaseModel):
+    items: List[AggregateWeightedChoiceRequest] = Field(..., description="Requests evaluated together; same-shaped items are stacked and computed in one vectorized pass.")
+
+class AggregateWeightedChoiceBatchItem(BaseModel):
+    index: int
+    result: Optional[AggregateWeightedChoiceResponse] = None
+    error: Optional[str] = None
+
+class AggregateWeightedChoiceBatchResponse(BaseModel):
+    results: List[AggregateWeightedChoiceBatchItem]
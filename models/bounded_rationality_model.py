@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, confloat
 from typing import List, Dict, Any, Optional
 
 class BoundedRationalityRequest(BaseModel):
@@ -8,9 +8,33 @@ class BoundedRationalityRequest(BaseModel):
     decision_tree: Optional[Dict[str, Any]] = Field(None, description="Optional structure describing ordering / branches.")
     mode: str = Field("satisficing", description="Mode: 'satisficing' | 'simulate' | 'bayes'.")
     aspiration: Optional[float] = Field(None, description="Payoff threshold for satisficing. If None, set to median payoff.")
-    sample_budget: int = Field(5, description="Number of candidate evaluations allowed.")
+    sample_budget: int = Field(5, le=100_000, description="Number of candidate evaluations allowed.")
     random_seed: Optional[int] = Field(None, description="Optional seed for reproducibility.")
+    bayes_backend: str = Field("native", description="'bayes' mode engine: 'native' (built-in bandit search) | 'ax' (Ax experiment; needs ax-platform).")
+    bayes_policy: str = Field("thompson", description="'bayes' mode, native backend: 'thompson' (Thompson sampling) | 'ucb' (upper confidence bound).")
+    payoff_noise: float = Field(0.0, description="'bayes' mode, native backend: standard deviation of the noise on each evaluated payoff.")
+    replications: Optional[int] = Field(None, ge=1, le=1_000_000, description="'simulate' mode: also run this many independent replications (at most 1000000) and return the distribution of their outcomes.")
+    payoff_quantiles: List[confloat(ge=0, le=1)] = Field([0.05, 0.25, 0.5, 0.75, 0.95], description="Quantile levels of the selected payoff reported for replications.")
+
+class SimulationSummary(BaseModel):
+    replications: int
+    choice_frequencies: Dict[str, float] = Field(..., description="Share of replications selecting each choice (choices never selected are omitted).")
+    payoff_mean: float
+    payoff_std: float
+    payoff_quantiles: Dict[str, float] = Field(..., description="Selected-payoff quantiles keyed by level.")
 
 class BoundedRationalityResponse(BaseModel):
     simplified_choice: Optional[str]
-    heuristic_trace: List[Dict[str, Any]]
+    heuristic_trace: List[Dict[str, Any]] = Field(..., description="Evaluations in order. Native Bayes searches longer than 256 evaluations list each evaluated choice once, with its evaluation count and mean observed payoff.")
+    simulation: Optional[SimulationSummary] = None
+
+class BoundedRationalityBatchRequest(BaseModel):
+    items: List[BoundedRationalityRequest] = Field(..., description="Requests evaluated together; same-shaped items are stacked and computed in one vectorized pass.")
+
+class BoundedRationalityBatchItem(BaseModel):
+    index: int
+    result: Optional[BoundedRationalityResponse] = None
+    error: Optional[str] = None
+
+class BoundedRationalityBatchResponse(BaseModel):
+    results: List[BoundedRationalityBatchItem]
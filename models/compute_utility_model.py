@@ -1,24 +1,32 @@
 from pydantic import BaseModel, Field
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Literal, Optional, Tuple
 
 class Outcome(BaseModel):
     id: str
     value: float
     # Add other attributes that might be in an outcome, e.g., attention_cost
     attention_cost: Optional[float] = None
+    features: Optional[Dict[str, float]] = Field(None, description="Additional numeric attributes, e.g. {'quality': 0.8}. Declared fields take precedence over features of the same name.")
 
-class ComputeUtilityRequest(BaseModel):
+class ComputeUtilityInputs(BaseModel):
     agent_preferences: Dict[str, float] = Field(..., description="Dictionary of agent preferences for different outcome attributes.")
-    outcome_set: List[Outcome] = Field(..., description="List of outcomes, each with an 'id' and other attributes.")
+    outcome_set: List[Outcome] = Field([], description="List of outcomes, each with an 'id' and other attributes.")
+    outcome_ids: Optional[List[str]] = Field(None, description="Columnar form: outcome ids, one per feature_matrix row. Used instead of outcome_set.")
+    feature_names: Optional[List[str]] = Field(None, description="Columnar form: attribute name of each feature_matrix column (may include 'value' and 'attention_cost').")
+    feature_matrix: Optional[List[List[float]]] = Field(None, description="Columnar form: outcomes x features values.")
     normalize: bool = True
     normalization_method: str = Field("minmax", description="'minmax' or 'zscore'.")
     attention_attr: Optional[str] = Field(None, description="Attribute to use for attention cost (e.g., 'attention_cost').")
     attention_budget: Optional[float] = Field(None, description="Budget for attention.")
     attention_cost_coeff: float = 1.0
     softmax_temp: float = 1.0
-    satisficing_threshold: Optional[float] = Field(None, description="Threshold for satisficing.")
     apply_attention: bool = True
 
+class ComputeUtilityRequest(ComputeUtilityInputs):
+    satisficing_threshold: Optional[float] = Field(None, description="Threshold for satisficing.")
+    format: Literal["json", "ndjson"] = Field("json", description="Response format: 'json' | 'ndjson' (application/x-ndjson: one {'id', <fields>} line per outcome, then a {'choice', 'count'} summary line).")
+    fields: Optional[List[str]] = Field(None, description="ndjson only: per-outcome fields to emit, any of 'raw', 'penalized', 'normalized', 'probabilities' (default: all).")
+
 class Choice(BaseModel):
     id: str
     score: float
@@ -29,3 +37,36 @@ class ComputeUtilityResponse(BaseModel):
     normalized: Dict[str, float]
     probabilities: Dict[str, float]
     choice: Choice
+
+class ComputeUtilityBatchRequest(BaseModel):
+    items: List[ComputeUtilityRequest] = Field(..., description="Requests evaluated together; same-shaped items are stacked and computed in one vectorized pass.")
+
+class ComputeUtilityBatchItem(BaseModel):
+    index: int
+    result: Optional[ComputeUtilityResponse] = None
+    error: Optional[str] = None
+
+class ComputeUtilityBatchResponse(BaseModel):
+    results: List[ComputeUtilityBatchItem]
+
+class SweepSetting(BaseModel):
+    softmax_temp: Optional[float] = None
+    attention_budget: Optional[float] = None
+    attention_cost_coeff: Optional[float] = None
+
+class ComputeUtilitySweepRequest(ComputeUtilityInputs):
+    grid: Optional[Dict[str, List[Optional[float]]]] = Field(None, description="Values per swept parameter ('softmax_temp', 'attention_budget', 'attention_cost_coeff'); every combination is evaluated, the last parameter varying fastest.")
+    settings: Optional[List[SweepSetting]] = Field(None, description="Explicit parameter settings, used instead of grid. Parameters a setting leaves out take the request's value.")
+    summarize: bool = Field(False, description="Omit the per-setting normalized and probability tables; each result keeps its choice and the chosen outcome's probability.")
+
+class SweepResult(BaseModel):
+    setting: SweepSetting
+    choice: Choice
+    choice_probability: float
+    normalized: Optional[Dict[str, float]] = None
+    probabilities: Optional[Dict[str, float]] = None
+
+class ComputeUtilitySweepResponse(BaseModel):
+    raw: Dict[str, float]
+    results: List[SweepResult]
+    choice_counts: Dict[str, int] = Field(..., description="Number of settings under which each outcome is chosen.")
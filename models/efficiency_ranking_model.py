@@ -1,12 +1,52 @@
 from pydantic import BaseModel, Field
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Literal, Optional
+
+class UsageStats(BaseModel):
+    count: int = Field(..., description="Number of usage samples seen.")
+    total: float = Field(..., description="Sum of the usage samples.")
+    xlogx: float = Field(..., description="Sum of x * log(x) over the usage samples.")
 
 class EfficiencyRankingRequest(BaseModel):
     candidate_set: List[str] = Field(..., description="List of candidate options.")
-    usage_trace: Dict[str, List[float]] = Field(..., description="Dictionary mapping each candidate to its usage history/probabilities.")
+    usage_trace: Dict[str, List[float]] = Field({}, description="Dictionary mapping each candidate to its usage history/probabilities (with session_id or incremental: new samples only).")
     payoff_vector: Dict[str, float] = Field(..., description="Dictionary mapping each candidate to expected payoff.")
+    session_id: Optional[str] = Field(None, description="Rank from the usage sums stored for this session; usage_trace samples are appended to it first.")
+    incremental: bool = Field(False, description="Treat usage_trace as new samples only, added to usage_stats; the response returns the updated usage_stats for the next call.")
+    usage_stats: Optional[Dict[str, UsageStats]] = Field(None, description="Running usage sums per candidate from a previous incremental call.")
+    top_k: Optional[int] = Field(None, ge=1, description="Only rank the k most efficient candidates; efficiency_scores then covers just those.")
+    format: Literal["json", "ndjson"] = Field("json", description="Response format: 'json' | 'ndjson' (application/x-ndjson: one {'candidate', <fields>} line per candidate in ranked order, then a {'preferred_variant', 'count'} summary line).")
+    fields: Optional[List[str]] = Field(None, description="ndjson only: per-candidate fields to emit, any of 'efficiency_score', 'entropy', 'payoff' (default: all).")
 
 class EfficiencyRankingResponse(BaseModel):
     ranked_list: List[str]
     preferred_variant: Optional[str]
     efficiency_scores: Dict[str, float]
+    usage_stats: Optional[Dict[str, UsageStats]] = None
+
+class EfficiencyRankingBatchRequest(BaseModel):
+    items: List[EfficiencyRankingRequest] = Field(..., description="Requests evaluated together; same-shaped items are stacked and computed in one vectorized pass.")
+
+class EfficiencyRankingBatchItem(BaseModel):
+    index: int
+    result: Optional[EfficiencyRankingResponse] = None
+    error: Optional[str] = None
+
+class EfficiencyRankingBatchResponse(BaseModel):
+    results: List[EfficiencyRankingBatchItem]
+
+class UsageAppendRequest(BaseModel):
+    usage_trace: Dict[str, List[float]] = Field(..., description="New usage samples per candidate, appended to the session's running sums.")
+
+class UsageAppendResponse(BaseModel):
+    session_id: str
+    candidates: int
+    samples: int
+
+class TraceStoreStats(BaseModel):
+    sessions: int
+    candidates: int
+    bytes: int
+    expirations: int
+    evictions: int
+    ttl_seconds: float
+    max_sessions: int
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, confloat
 from typing import Dict, List, Any, Optional
 
 class IncentiveAlignmentRequest(BaseModel):
@@ -6,8 +6,22 @@ class IncentiveAlignmentRequest(BaseModel):
     payoff_matrix: Dict[str, float] = Field(..., description="Agent-specific payoffs per choice.")
     global_target: Optional[float] = Field(None, description="Optional global payoff goal to align with.")
     epsilon: float = Field(1e-3, description="Small relaxation for constraints.")
+    solver: str = Field("analytic", description="Solver: 'analytic' (exact vertex solution of the simplex LP) | 'cvxpy'. Formulations with entropy_reg or choice_caps always use cvxpy.")
+    entropy_reg: float = Field(0.0, description="Entropy regularization weight; > 0 spreads the strategy over near-optimal choices.")
+    choice_caps: Optional[Dict[str, confloat(ge=0)]] = Field(None, description="Optional per-choice upper bound on strategy weight (non-negative). Missing choices default to 1.0; the caps must allow a total weight of 1.")
 
 class IncentiveAlignmentResponse(BaseModel):
     updated_strategy: Dict[str, float]
     expected_payoff: float
     target_satisfied: bool
+
+class IncentiveAlignmentBatchRequest(BaseModel):
+    items: List[IncentiveAlignmentRequest] = Field(..., description="Requests evaluated together; same-shaped items are stacked and computed in one vectorized pass.")
+
+class IncentiveAlignmentBatchItem(BaseModel):
+    index: int
+    result: Optional[IncentiveAlignmentResponse] = None
+    error: Optional[str] = None
+
+class IncentiveAlignmentBatchResponse(BaseModel):
+    results: List[IncentiveAlignmentBatchItem]
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+# Longest finite horizon accepted by the Markov-weighted services.
+HORIZON_MAX = 1_000_000_000
+
+class SparseMatrix(BaseModel):
+    shape: List[int] = Field(..., description="Matrix shape [n_rows, n_cols].")
+    rows: List[int] = Field(..., description="Row index of each stored entry.")
+    cols: List[int] = Field(..., description="Column index of each stored entry.")
+    values: List[float] = Field(..., description="Value of each stored entry; duplicates are summed.")
+
+class MarkovCacheStats(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+    max_entries: int
+    max_bytes: int
+    powers: Optional["MarkovCacheStats"] = Field(None, description="The same counters for the cache of matrix powers used by finite horizons.")
+
+MarkovCacheStats.model_rebuild()
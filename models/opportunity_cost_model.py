@@ -1,10 +1,30 @@
 from pydantic import BaseModel, Field
+from models.markov_model import SparseMatrix, HORIZON_MAX
 from typing import Dict, List, Any, Optional
 
 class OpportunityCostRequest(BaseModel):
     choice_set: List[str] = Field(..., description="List of choice names.")
     payoff_matrix: Dict[str, float] = Field(..., description="Dictionary of payoffs per choice.")
     P: Optional[List[List[float]]] = Field(None, description="Optional Markov transition matrix.")
+    P_sparse: Optional[SparseMatrix] = Field(None, description="Optional Markov transition matrix in COO form, for large state spaces. Ignored when P is given.")
+    horizon: Optional[int] = Field(None, ge=1, le=HORIZON_MAX, description="With a transition matrix: weigh payoffs by the mean state distribution over this many steps from initial_distribution, instead of the stationary distribution.")
+    initial_distribution: Optional[Dict[str, float]] = Field(None, description="Start weights per choice for horizon (normalized; default uniform). Rejected without horizon.")
+    top_k: Optional[int] = Field(None, ge=1, description="Only return the k best alternatives (largest payoff gain) per choice.")
+    rows: Optional[List[str]] = Field(None, description="Only return the profile rows for these choices.")
+    format: str = Field("nested", description="Response format: 'nested' (trade_off_profile dict) | 'columnar' (choices + payoffs; clients rebuild payoff_j - payoff_i) | 'binary' (float32 rows x choices matrix, application/octet-stream).")
 
 class OpportunityCostResponse(BaseModel):
-    trade_off_profile: Dict[str, Dict[str, float]]
+    trade_off_profile: Optional[Dict[str, Dict[str, float]]] = None
+    choices: Optional[List[str]] = None
+    payoffs: Optional[List[float]] = None
+
+class OpportunityCostBatchRequest(BaseModel):
+    items: List[OpportunityCostRequest] = Field(..., description="Requests evaluated together; same-shaped items are stacked and computed in one vectorized pass.")
+
+class OpportunityCostBatchItem(BaseModel):
+    index: int
+    result: Optional[OpportunityCostResponse] = None
+    error: Optional[str] = None
+
+class OpportunityCostBatchResponse(BaseModel):
+    results: List[OpportunityCostBatchItem]
@@ -1,11 +1,46 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 class PayoffWeightedAggregationRequest(BaseModel):
-    proposal_map: Dict[str, Any] = Field(..., description="Map of proposals, e.g., {option_name: value}")
-    payoff_gradients: Dict[str, float] = Field(..., description="Map of payoff gradients (weights) per proposal, e.g., {option_name: weight}")
+    proposal_map: Dict[str, Any] = Field({}, description="Map of proposals, e.g., {option_name: value}")
+    payoff_gradients: Dict[str, float] = Field({}, description="Map of payoff gradients (weights) per proposal, e.g., {option_name: weight}; proposals without one weigh 1.0.")
+    proposal_ids: Optional[List[str]] = Field(None, description="Typed form: proposal names, one per amounts entry. Used instead of proposal_map.")
+    amounts: Optional[List[float]] = Field(None, description="Typed form: proposal amounts.")
+    gradients: Optional[List[float]] = Field(None, description="Typed form: weight per proposal (default: payoff_gradients, else 1.0).")
 
 class PayoffWeightedAggregationResponse(BaseModel):
     winning_pattern: str
     consensus_dsl: Dict[str, float]
     weighted_scores: Dict[str, float]
+
+class PayoffPartialRequest(PayoffWeightedAggregationRequest):
+    include_scores: bool = Field(True, description="Return the shard's weighted scores; combine needs them from every shard to build consensus_dsl.")
+
+class PayoffPartial(BaseModel):
+    count: int = Field(..., description="Proposals in the shard.")
+    total: float = Field(..., description="Sum of the shard's weighted scores.")
+    winning_pattern: str = Field(..., description="The shard's highest-scoring proposal ('' if empty).")
+    winning_score: Optional[float] = None
+    weighted_scores: Optional[Dict[str, float]] = None
+
+class PayoffCombineRequest(BaseModel):
+    partials: List[PayoffPartial] = Field(..., description="Partial results of disjoint shards; ties between shards go to the earlier one.")
+
+class PayoffCombineResponse(BaseModel):
+    winning_pattern: str
+    winning_score: Optional[float] = None
+    total: float
+    count: int
+    consensus_dsl: Optional[Dict[str, float]] = Field(None, description="Only when every partial carries its weighted_scores.")
+    weighted_scores: Optional[Dict[str, float]] = None
+
+class PayoffWeightedAggregationBatchRequest(BaseModel):
+    items: List[PayoffWeightedAggregationRequest] = Field(..., description="Requests evaluated together; same-shaped items are stacked and computed in one vectorized pass.")
+
+class PayoffWeightedAggregationBatchItem(BaseModel):
+    index: int
+    result: Optional[PayoffWeightedAggregationResponse] = None
+    error: Optional[str] = None
+
+class PayoffWeightedAggregationBatchResponse(BaseModel):
+    results: List[PayoffWeightedAggregationBatchItem]
@@ -1,16 +1,45 @@
 from pydantic import BaseModel, Field
+from models.markov_model import SparseMatrix, HORIZON_MAX
 from typing import Dict, List, Any, Optional
 
+class PayoffDistribution(BaseModel):
+    mean: Optional[float] = Field(None, description="Mean payoff (default: the choice's payoff_matrix value).")
+    sd: float = Field(0.0, description="Standard deviation of a normal payoff.")
+    samples: Optional[List[float]] = Field(None, description="Empirical payoff samples, drawn from with replacement; used instead of mean/sd.")
+
 class RiskAssessmentRequest(BaseModel):
     choice_set: List[str] = Field(..., description="List of choice names.")
     payoff_matrix: Dict[str, float] = Field(..., description="Dictionary of payoffs per choice.")
     prob_matrix: Optional[List[List[float]]] = Field(None, description="Optional transition/probability matrix (Markov).")
-    confidence: float = Field(0.95, description="Confidence level for interval.")
+    prob_matrix_sparse: Optional[SparseMatrix] = Field(None, description="Optional transition matrix in COO form, for large state spaces. Ignored when prob_matrix is given.")
+    confidence: float = Field(0.95, gt=0, lt=1, description="Confidence level for interval, strictly between 0 and 1.")
+    mode: str = Field("analytic", description="'analytic' (one interval from the spread of payoffs across choices) | 'simulation' (per-choice VaR, CVaR and quantile intervals from simulated paths).")
+    payoff_distributions: Dict[str, PayoffDistribution] = Field({}, description="'simulation' mode: payoff distribution per choice; choices without one pay their payoff_matrix value.")
+    horizon: Optional[int] = Field(None, ge=1, le=HORIZON_MAX, description="Steps. 'analytic' mode with a transition matrix: weigh payoffs by the mean state distribution over the horizon from initial_distribution instead of the stationary distribution. 'simulation' mode: steps per path (default 1); a path starts at its choice, collects a payoff at every state it visits and moves by prob_matrix (or stays put without one).")
+    initial_distribution: Optional[Dict[str, float]] = Field(None, description="'analytic' mode with horizon: start weights per choice (normalized; default uniform). Rejected without horizon.")
+    paths: Optional[int] = Field(None, description="'simulation' mode: paths per choice (default: ECONOMICS_RISK_PATHS).")
+    chunk_size: Optional[int] = Field(None, description="'simulation' mode: paths per choice simulated at once (default: ECONOMICS_RISK_CHUNK_PATHS); bounds the working memory.")
+    random_seed: Optional[int] = Field(None, description="'simulation' mode: optional seed for reproducibility.")
 
 class RiskMetrics(BaseModel):
     ExpectedValue: float
     ConfidenceInterval: float
     RiskAdjustedValue: float
+    VaR: Optional[float] = Field(None, description="'simulation' mode: the (1 - confidence) quantile of the simulated payoff.")
+    CVaR: Optional[float] = Field(None, description="'simulation' mode: mean simulated payoff at or below VaR.")
+    LowerQuantile: Optional[float] = Field(None, description="'simulation' mode: the (1 - confidence) / 2 quantile of the simulated payoff.")
+    UpperQuantile: Optional[float] = Field(None, description="'simulation' mode: the (1 + confidence) / 2 quantile of the simulated payoff.")
 
 class RiskAssessmentResponse(BaseModel):
     risk_profile: Dict[str, RiskMetrics]
+
+class RiskAssessmentBatchRequest(BaseModel):
+    items: List[RiskAssessmentRequest] = Field(..., description="Requests evaluated together; same-shaped items are stacked and computed in one vectorized pass.")
+
+class RiskAssessmentBatchItem(BaseModel):
+    index: int
+    result: Optional[RiskAssessmentResponse] = None
+    error: Optional[str] = None
+
+class RiskAssessmentBatchResponse(BaseModel):
+    results: List[RiskAssessmentBatchItem]
@@ -1,12 +1,29 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Literal, Optional
 
 class ScarcityConstraintRequest(BaseModel):
     resource_pool: Dict[str, float] = Field(..., description="Available resources, e.g., {'resourceA': 100.0}")
     demand_vector: Dict[str, Dict[str, float]] = Field(..., description="Demands for resources per option, e.g., {'option1': {'resourceA': 10.0}}")
+    solver: Literal["vectorized", "cvxpy"] = Field("vectorized", description="Solver: 'vectorized' (closed form over all options at once) | 'cvxpy' (one LP per option).")
+    mode: Literal["independent", "joint"] = Field("independent", description="Mode: 'independent' (each option against the whole pool) | 'joint' (one LP allocating the pool across all options).")
+    payoff_weights: Optional[Dict[str, float]] = Field(None, description="Joint mode only: payoff per option used as LP objective weights. Missing options default to 1.0.")
 
 class ScarcityConstraintResponse(BaseModel):
     constraint_set: Dict[str, bool]
     feasibility_map: Dict[str, float]
     infeasible_options: List[str]
     binding_constraints: Dict[str, List[str]]
+    joint_allocation: Optional[Dict[str, float]] = None
+    shadow_prices: Optional[Dict[str, float]] = None
+    joint_objective: Optional[float] = None
+
+class ScarcityConstraintBatchRequest(BaseModel):
+    items: List[ScarcityConstraintRequest] = Field(..., description="Requests evaluated together; same-shaped items are stacked and computed in one vectorized pass.")
+
+class ScarcityConstraintBatchItem(BaseModel):
+    index: int
+    result: Optional[ScarcityConstraintResponse] = None
+    error: Optional[str] = None
+
+class ScarcityConstraintBatchResponse(BaseModel):
+    results: List[ScarcityConstraintBatchItem]
@@ -1,9 +1,34 @@
-from fastapi import APIRouter
-from models.aggregate_weighted_choice_model import AggregateWeightedChoiceRequest, AggregateWeightedChoiceResponse
-from services.aggregate_weighted_choice_service import aggregate_weighted_choice_service
+from fastapi import APIRouter, Request
+from core.encoding import ndjson_lines
+from core.execution import executor, run_checked
+from core.metrics import InstrumentedRoute
+from core.registry import lazy
+from models.aggregate_weighted_choice_model import AggregateWeightedChoiceRequest, AggregateWeightedChoiceResponse, AggregateWeightedChoiceBatchRequest, AggregateWeightedChoiceBatchResponse, AggregateMergeRequest, AggregateState
 
-router = APIRouter()
+aggregate_weighted_choice_service, aggregate_weighted_choice_batch_service, aggregate_lines_service, aggregate_state_service, aggregate_merge_service = lazy(
+    "services.aggregate_weighted_choice_service", "aggregate_weighted_choice_service", "aggregate_weighted_choice_batch_service",
+    "aggregate_lines_service", "aggregate_state_service", "aggregate_merge_service"
+)
 
-@router.post("/aggregate-weighted-choice", response_model=AggregateWeightedChoiceResponse)
-def aggregate_weighted_choice(request: AggregateWeightedChoiceRequest):
-    return aggregate_weighted_choice_service(request)
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.post("/aggregate-weighted-choice", response_model=AggregateWeightedChoiceResponse, response_model_exclude_unset=True)
+async def aggregate_weighted_choice(request: AggregateWeightedChoiceRequest):
+    return await executor.run(aggregate_weighted_choice_service, request)
+
+@router.post("/aggregate-weighted-choice/stream", response_model=AggregateWeightedChoiceResponse, response_model_exclude_unset=True)
+async def aggregate_weighted_choice_stream(http_request: Request, capability_weighted: bool = False):
+    # NDJSON body, one agent per line; only the running totals are kept between chunks.
+    state = AggregateState()
+    async for lines in ndjson_lines(http_request):
+        # malformed lines are the client's input, not a server failure
+        state = await run_checked(aggregate_lines_service, state, lines)
+    return await executor.run(aggregate_state_service, state, capability_weighted)
+
+@router.post("/aggregate-weighted-choice/merge", response_model=AggregateWeightedChoiceResponse, response_model_exclude_unset=True)
+async def aggregate_weighted_choice_merge(request: AggregateMergeRequest):
+    return await executor.run(aggregate_merge_service, request)
+
+@router.post("/aggregate-weighted-choice/batch", response_model=AggregateWeightedChoiceBatchResponse, response_model_exclude_unset=True)
+async def aggregate_weighted_choice_batch(request: AggregateWeightedChoiceBatchRequest):
+    return await executor.run(aggregate_weighted_choice_batch_service, request)
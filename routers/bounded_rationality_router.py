@@ -1,9 +1,19 @@
 from fastapi import APIRouter
-from models.bounded_rationality_model import BoundedRationalityRequest, BoundedRationalityResponse
-from services.bounded_rationality_service import bounded_rationality_service
+from core.execution import executor, run_checked
+from core.metrics import InstrumentedRoute
+from core.registry import lazy
+from models.bounded_rationality_model import BoundedRationalityRequest, BoundedRationalityResponse, BoundedRationalityBatchRequest, BoundedRationalityBatchResponse
 
-router = APIRouter()
+bounded_rationality_service, bounded_rationality_batch_service = lazy(
+    "services.bounded_rationality_service", "bounded_rationality_service", "bounded_rationality_batch_service"
+)
 
-@router.post("/bounded-rationality", response_model=BoundedRationalityResponse)
-def bounded_rationality(request: BoundedRationalityRequest):
-    return bounded_rationality_service(request)
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.post("/bounded-rationality", response_model=BoundedRationalityResponse, response_model_exclude_unset=True)
+async def bounded_rationality(request: BoundedRationalityRequest):
+    return await run_checked(bounded_rationality_service, request)
+
+@router.post("/bounded-rationality/batch", response_model=BoundedRationalityBatchResponse, response_model_exclude_unset=True)
+async def bounded_rationality_batch(request: BoundedRationalityBatchRequest):
+    return await executor.run(bounded_rationality_batch_service, request)
@@ -1,9 +1,28 @@
 from fastapi import APIRouter
-from models.compute_utility_model import ComputeUtilityRequest, ComputeUtilityResponse
-from services.compute_utility_service import compute_utility_service
+from core.encoding import ndjson_records, ndjson_response
+from core.execution import executor, run_checked
+from core.metrics import InstrumentedRoute
+from core.registry import lazy
+from models.compute_utility_model import ComputeUtilityRequest, ComputeUtilityResponse, ComputeUtilityBatchRequest, ComputeUtilityBatchResponse, ComputeUtilitySweepRequest, ComputeUtilitySweepResponse
 
-router = APIRouter()
+compute_utility_service, compute_utility_stream_service, compute_utility_batch_service, compute_utility_sweep_service = lazy(
+    "services.compute_utility_service", "compute_utility_service", "compute_utility_stream_service", "compute_utility_batch_service",
+    "compute_utility_sweep_service"
+)
+
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.post("/compute-utility", response_model=ComputeUtilityResponse)
-def compute_utility(request: ComputeUtilityRequest):
-    return compute_utility_service(request)
+async def compute_utility(request: ComputeUtilityRequest):
+    if request.format == "ndjson":
+        result = await run_checked(compute_utility_stream_service, request)
+        return ndjson_response(ndjson_records(result["ids"], result["columns"], result["summary"]))
+    return await run_checked(compute_utility_service, request)
+
+@router.post("/compute-utility/batch", response_model=ComputeUtilityBatchResponse)
+async def compute_utility_batch(request: ComputeUtilityBatchRequest):
+    return await executor.run(compute_utility_batch_service, request)
+
+@router.post("/compute-utility/sweep", response_model=ComputeUtilitySweepResponse, response_model_exclude_unset=True)
+async def compute_utility_sweep(request: ComputeUtilitySweepRequest):
+    return await run_checked(compute_utility_sweep_service, request)
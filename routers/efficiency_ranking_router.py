@@ -1,9 +1,63 @@
-from fastapi import APIRouter
-from models.efficiency_ranking_model import EfficiencyRankingRequest, EfficiencyRankingResponse
-from services.efficiency_ranking_service import efficiency_ranking_service
+from typing import Optional
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request, Response
+from core.encoding import NegotiatedRoute, Ragged, binary_variant, json_or_columns, column, query_int, encode_columns, ndjson_records, ndjson_response
+from core.execution import executor, run_checked
+from core.registry import lazy
+from models.efficiency_ranking_model import EfficiencyRankingRequest, EfficiencyRankingResponse, EfficiencyRankingBatchRequest, EfficiencyRankingBatchResponse, UsageAppendRequest, UsageAppendResponse, TraceStoreStats
+from services.trace_store import trace_store
 
-router = APIRouter()
+efficiency_ranking_service, efficiency_ranking_stream_service, efficiency_ranking_array_service, efficiency_ranking_batch_service, usage_append_service = lazy(
+    "services.efficiency_ranking_service", "efficiency_ranking_service", "efficiency_ranking_stream_service", "efficiency_ranking_array_service", "efficiency_ranking_batch_service", "usage_append_service"
+)
 
-@router.post("/efficiency-ranking", response_model=EfficiencyRankingResponse)
-def efficiency_ranking(request: EfficiencyRankingRequest):
-    return efficiency_ranking_service(request)
+router = APIRouter(route_class=NegotiatedRoute)
+
+EFFICIENCY_NPY_ORDER = ("candidate", "payoff", "usage_values", "usage_lengths")
+
+async def efficiency_ranking_binary(http_request: Request, in_fmt: Optional[str], out_fmt: str) -> Response:
+    request, arrays = await json_or_columns(http_request, in_fmt, EfficiencyRankingRequest, EFFICIENCY_NPY_ORDER)
+    if request is not None:
+        if request.session_id is not None or request.incremental:
+            raise HTTPException(status_code=400, detail="Session and incremental rankings are answered as JSON only.")
+        top_k = request.top_k
+        candidates = np.array(request.candidate_set)
+        payoffs = np.array([request.payoff_vector.get(c, 0.0) for c in request.candidate_set], dtype=float)
+        traces = [request.usage_trace.get(c, [1.0]) for c in request.candidate_set]
+        usage = Ragged(np.array([u for t in traces for u in t], dtype=float), np.array([len(t) for t in traces]))
+    else:
+        top_k = query_int(http_request, "top_k", minimum=1)
+        payoffs = column(arrays, "payoff")
+        candidates = arrays.get("candidate", np.arange(payoffs.size))
+        usage = arrays.get("usage_trace")
+        if usage is None:
+            usage = Ragged(column(arrays, "usage_values"), column(arrays, "usage_lengths", dtype=np.intp))
+        elif not isinstance(usage, Ragged):
+            raise HTTPException(status_code=400, detail="Column 'usage_trace' must be a list column.")
+    result = await executor.run(efficiency_ranking_array_service, payoffs, usage.values, usage.lengths, top_k)
+    return encode_columns({"candidate": np.asarray(candidates)[result["order"]], "efficiency_score": result["efficiency_score"]}, out_fmt)
+
+@router.post("/efficiency-ranking", response_model=EfficiencyRankingResponse, response_model_exclude_unset=True)
+@binary_variant(efficiency_ranking_binary)
+async def efficiency_ranking(request: EfficiencyRankingRequest):
+    if request.format == "ndjson":
+        result = await run_checked(efficiency_ranking_stream_service, request)
+        return ndjson_response(ndjson_records(result["ids"], result["columns"], result["summary"], id_field="candidate"))
+    return await run_checked(efficiency_ranking_service, request)
+
+@router.post("/efficiency-ranking/batch", response_model=EfficiencyRankingBatchResponse, response_model_exclude_unset=True)
+async def efficiency_ranking_batch(request: EfficiencyRankingBatchRequest):
+    return await executor.run(efficiency_ranking_batch_service, request)
+
+@router.post("/efficiency-ranking/sessions/{session_id}", response_model=UsageAppendResponse)
+async def efficiency_usage_append(session_id: str, request: UsageAppendRequest):
+    return await run_checked(usage_append_service, session_id, request)
+
+@router.delete("/efficiency-ranking/sessions/{session_id}", status_code=204)
+async def efficiency_session_drop(session_id: str):
+    if not trace_store.drop(session_id):
+        raise HTTPException(status_code=404, detail="Unknown session_id.")
+
+@router.get("/efficiency-ranking/session-stats", response_model=TraceStoreStats)
+async def efficiency_session_stats():
+    return trace_store.stats()
@@ -1,9 +1,19 @@
 from fastapi import APIRouter
-from models.incentive_alignment_model import IncentiveAlignmentRequest, IncentiveAlignmentResponse
-from services.incentive_alignment_service import incentive_alignment_service
+from core.execution import executor, run_checked
+from core.metrics import InstrumentedRoute
+from core.registry import lazy
+from models.incentive_alignment_model import IncentiveAlignmentRequest, IncentiveAlignmentResponse, IncentiveAlignmentBatchRequest, IncentiveAlignmentBatchResponse
 
-router = APIRouter()
+incentive_alignment_service, incentive_alignment_batch_service = lazy(
+    "services.incentive_alignment_service", "incentive_alignment_service", "incentive_alignment_batch_service"
+)
+
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.post("/incentive-alignment", response_model=IncentiveAlignmentResponse)
-def incentive_alignment(request: IncentiveAlignmentRequest):
-    return incentive_alignment_service(request)
+async def incentive_alignment(request: IncentiveAlignmentRequest):
+    return await run_checked(incentive_alignment_service, request)
+
+@router.post("/incentive-alignment/batch", response_model=IncentiveAlignmentBatchResponse)
+async def incentive_alignment_batch(request: IncentiveAlignmentBatchRequest):
+    return await executor.run(incentive_alignment_batch_service, request)
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from core.metrics import InstrumentedRoute
+from core.registry import LazyService
+from models.markov_model import MarkovCacheStats
+
+cache_stats = LazyService("services.markov", "cache_stats")
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.get("/markov/cache-stats", response_model=MarkovCacheStats, response_model_exclude_none=True)
+async def markov_cache_stats():
+    return cache_stats()
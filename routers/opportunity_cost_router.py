@@ -1,9 +1,55 @@
-from fastapi import APIRouter
-from models.opportunity_cost_model import OpportunityCostRequest, OpportunityCostResponse
-from services.opportunity_cost_service import opportunity_cost_service
+from typing import Optional
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request, Response
+from core.encoding import NegotiatedRoute, binary_variant, json_or_columns, column, matrix_column, query_int, encode_columns
+from core.execution import executor, run_checked
+from core.registry import lazy
+from models.markov_model import HORIZON_MAX
+from models.opportunity_cost_model import OpportunityCostRequest, OpportunityCostResponse, OpportunityCostBatchRequest, OpportunityCostBatchResponse
 
-router = APIRouter()
+opportunity_cost_service, opportunity_cost_matrix_service, opportunity_cost_array_service, opportunity_cost_batch_service, request_transition_matrix = lazy(
+    "services.opportunity_cost_service", "opportunity_cost_service", "opportunity_cost_matrix_service", "opportunity_cost_array_service", "opportunity_cost_batch_service", "request_transition_matrix"
+)
+(initial_distribution,) = lazy("services.markov", "initial_distribution")
 
-@router.post("/opportunity-cost", response_model=OpportunityCostResponse)
-def opportunity_cost(request: OpportunityCostRequest):
-    return opportunity_cost_service(request)
+router = APIRouter(route_class=NegotiatedRoute)
+
+OPPORTUNITY_NPY_ORDER = ("choice", "payoff", "P", "initial")
+
+async def opportunity_cost_binary(http_request: Request, in_fmt: Optional[str], out_fmt: str) -> Response:
+    request, arrays = await json_or_columns(http_request, in_fmt, OpportunityCostRequest, OPPORTUNITY_NPY_ORDER)
+    if request is not None:
+        choices = np.array(request.choice_set)
+        payoffs = np.array([request.payoff_matrix.get(c, 0.0) for c in request.choice_set], dtype=float)
+        horizon = request.horizon
+        try:
+            P = request_transition_matrix(request)
+            initial = initial_distribution(request.choice_set, request.initial_distribution, request.horizon)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    else:
+        payoffs = column(arrays, "payoff")
+        choices = arrays.get("choice", np.arange(payoffs.size))
+        P = matrix_column(arrays, "P")
+        horizon = query_int(http_request, "horizon", minimum=1, maximum=HORIZON_MAX)
+        initial = column(arrays, "initial", required=False)
+        if initial is not None and horizon is None:
+            raise HTTPException(status_code=400, detail="The 'initial' column needs a horizon query parameter.")
+    result = await run_checked(opportunity_cost_array_service, payoffs, P, horizon, initial)
+    return encode_columns({"choice": choices, **result}, out_fmt)
+
+@router.post("/opportunity-cost", response_model=OpportunityCostResponse, response_model_exclude_none=True)
+@binary_variant(opportunity_cost_binary)
+async def opportunity_cost(request: OpportunityCostRequest):
+    if request.format == "binary":
+        matrix = await run_checked(opportunity_cost_matrix_service, request)
+        return Response(
+            content=matrix.astype("<f4", copy=False).tobytes(),
+            media_type="application/octet-stream",
+            headers={"X-Matrix-Shape": f"{matrix.shape[0]},{matrix.shape[1]}", "X-Matrix-Dtype": "<f4"}
+        )
+    return await run_checked(opportunity_cost_service, request)
+
+@router.post("/opportunity-cost/batch", response_model=OpportunityCostBatchResponse, response_model_exclude_none=True)
+async def opportunity_cost_batch(request: OpportunityCostBatchRequest):
+    return await executor.run(opportunity_cost_batch_service, request)
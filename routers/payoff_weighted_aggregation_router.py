@@ -1,9 +1,28 @@
 from fastapi import APIRouter
-from models.payoff_weighted_aggregation_model import PayoffWeightedAggregationRequest, PayoffWeightedAggregationResponse
-from services.payoff_weighted_aggregation_service import payoff_weighted_aggregation_service
+from core.execution import executor, run_checked
+from core.metrics import InstrumentedRoute
+from core.registry import lazy
+from models.payoff_weighted_aggregation_model import PayoffWeightedAggregationRequest, PayoffWeightedAggregationResponse, PayoffWeightedAggregationBatchRequest, PayoffWeightedAggregationBatchResponse, PayoffPartialRequest, PayoffPartial, PayoffCombineRequest, PayoffCombineResponse
 
-router = APIRouter()
+payoff_weighted_aggregation_service, payoff_weighted_aggregation_batch_service, payoff_weighted_partial_service, payoff_weighted_combine_service = lazy(
+    "services.payoff_weighted_aggregation_service", "payoff_weighted_aggregation_service", "payoff_weighted_aggregation_batch_service",
+    "payoff_weighted_partial_service", "payoff_weighted_combine_service"
+)
+
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.post("/payoff-weighted-aggregation", response_model=PayoffWeightedAggregationResponse)
-def payoff_weighted_aggregation(request: PayoffWeightedAggregationRequest):
-    return payoff_weighted_aggregation_service(request)
+async def payoff_weighted_aggregation(request: PayoffWeightedAggregationRequest):
+    return await run_checked(payoff_weighted_aggregation_service, request)
+
+@router.post("/payoff-weighted-aggregation/partial", response_model=PayoffPartial, response_model_exclude_unset=True)
+async def payoff_weighted_aggregation_partial(request: PayoffPartialRequest):
+    return await run_checked(payoff_weighted_partial_service, request)
+
+@router.post("/payoff-weighted-aggregation/combine", response_model=PayoffCombineResponse, response_model_exclude_unset=True)
+async def payoff_weighted_aggregation_combine(request: PayoffCombineRequest):
+    return await run_checked(payoff_weighted_combine_service, request)
+
+@router.post("/payoff-weighted-aggregation/batch", response_model=PayoffWeightedAggregationBatchResponse)
+async def payoff_weighted_aggregation_batch(request: PayoffWeightedAggregationBatchRequest):
+    return await executor.run(payoff_weighted_aggregation_batch_service, request)
@@ -1,9 +1,54 @@
-from fastapi import APIRouter
-from models.risk_assessment_model import RiskAssessmentRequest, RiskAssessmentResponse
-from services.risk_assessment_service import risk_assessment_service
+from typing import Optional
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request, Response
+from core.encoding import NegotiatedRoute, binary_variant, json_or_columns, column, matrix_column, query_float, query_int, encode_columns
+from core.execution import executor, run_checked
+from core.registry import lazy
+from models.markov_model import HORIZON_MAX
+from models.risk_assessment_model import RiskAssessmentRequest, RiskAssessmentResponse, RiskAssessmentBatchRequest, RiskAssessmentBatchResponse
 
-router = APIRouter()
+risk_assessment_service, risk_assessment_array_service, risk_assessment_batch_service, request_prob_matrix = lazy(
+    "services.risk_assessment_service", "risk_assessment_service", "risk_assessment_array_service", "risk_assessment_batch_service", "request_prob_matrix"
+)
+(initial_distribution,) = lazy("services.markov", "initial_distribution")
 
-@router.post("/risk-assessment", response_model=RiskAssessmentResponse)
-def risk_assessment(request: RiskAssessmentRequest):
-    return risk_assessment_service(request)
+router = APIRouter(route_class=NegotiatedRoute)
+
+RISK_NPY_ORDER = ("choice", "payoff", "prob_matrix", "initial")
+
+async def risk_assessment_binary(http_request: Request, in_fmt: Optional[str], out_fmt: str) -> Response:
+    request, arrays = await json_or_columns(http_request, in_fmt, RiskAssessmentRequest, RISK_NPY_ORDER)
+    if request is not None:
+        if request.mode != "analytic":
+            raise HTTPException(status_code=400, detail="Simulation results are answered as JSON only.")
+        choices = np.array(request.choice_set)
+        payoffs = np.array([request.payoff_matrix.get(c, 0.0) for c in request.choice_set], dtype=float)
+        confidence = request.confidence
+        horizon = request.horizon
+        try:
+            prob_matrix = request_prob_matrix(request)
+            initial = initial_distribution(request.choice_set, request.initial_distribution, request.horizon)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    else:
+        payoffs = column(arrays, "payoff")
+        choices = arrays.get("choice", np.arange(payoffs.size))
+        prob_matrix = matrix_column(arrays, "prob_matrix")
+        confidence = query_float(http_request, "confidence", 0.95)
+        if not 0 < confidence < 1:
+            raise HTTPException(status_code=400, detail="Query parameter 'confidence' must be between 0 and 1.")
+        horizon = query_int(http_request, "horizon", minimum=1, maximum=HORIZON_MAX)
+        initial = column(arrays, "initial", required=False)
+        if initial is not None and horizon is None:
+            raise HTTPException(status_code=400, detail="The 'initial' column needs a horizon query parameter.")
+    result = await run_checked(risk_assessment_array_service, payoffs, prob_matrix, confidence, horizon, initial)
+    return encode_columns({"choice": choices, **result}, out_fmt)
+
+@router.post("/risk-assessment", response_model=RiskAssessmentResponse, response_model_exclude_unset=True)
+@binary_variant(risk_assessment_binary)
+async def risk_assessment(request: RiskAssessmentRequest):
+    return await run_checked(risk_assessment_service, request)
+
+@router.post("/risk-assessment/batch", response_model=RiskAssessmentBatchResponse, response_model_exclude_unset=True)
+async def risk_assessment_batch(request: RiskAssessmentBatchRequest):
+    return await executor.run(risk_assessment_batch_service, request)
@@ -1,9 +1,19 @@
 from fastapi import APIRouter
-from models.scarcity_constraint_model import ScarcityConstraintRequest, ScarcityConstraintResponse
-from services.scarcity_constraint_service import scarcity_constraint_service
+from core.execution import executor
+from core.metrics import InstrumentedRoute
+from core.registry import lazy
+from models.scarcity_constraint_model import ScarcityConstraintRequest, ScarcityConstraintResponse, ScarcityConstraintBatchRequest, ScarcityConstraintBatchResponse
 
-router = APIRouter()
+scarcity_constraint_service, scarcity_constraint_batch_service = lazy(
+    "services.scarcity_constraint_service", "scarcity_constraint_service", "scarcity_constraint_batch_service"
+)
 
-@router.post("/scarcity-constraint", response_model=ScarcityConstraintResponse)
-def scarcity_constraint(request: ScarcityConstraintRequest):
-    return scarcity_constraint_service(request)
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.post("/scarcity-constraint", response_model=ScarcityConstraintResponse, response_model_exclude_none=True)
+async def scarcity_constraint(request: ScarcityConstraintRequest):
+    return await executor.run(scarcity_constraint_service, request)
+
+@router.post("/scarcity-constraint/batch", response_model=ScarcityConstraintBatchResponse)
+async def scarcity_constraint_batch(request: ScarcityConstraintBatchRequest):
+    return await executor.run(scarcity_constraint_batch_service, request)
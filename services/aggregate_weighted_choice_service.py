@@ -1,30 +1,150 @@
-from models.aggregate_weighted_choice_model import AggregateWeightedChoiceRequest, AggregateWeightedChoiceResponse, AgentEconomicMetrics
-from typing import List, Dict, Any
+from models.aggregate_weighted_choice_model import AggregateWeightedChoiceRequest, AggregateWeightedChoiceResponse, AgentEconomicMetrics, AggregateWeightedChoiceBatchRequest, AggregateWeightedChoiceBatchResponse, AggregateWeightedChoiceBatchItem, AggregateState, AggregateMergeRequest
+from services.batching import run_batch, batch_items
+from core.execution import service_weight, LIGHT, HEAVY
+from core.structured_logging import log_result
+import json
+import numpy as np
+from typing import List, Dict, Any, Hashable, Iterable, Optional
 
-def aggregate_weighted_choice_service(request: AggregateWeightedChoiceRequest) -> AggregateWeightedChoiceResponse:
-    economic_values = request.economic_values
-
-    if not economic_values:
-        return AggregateWeightedChoiceResponse(
-            group_decision_score=0.0,
-            avg_capability=0.0,
-            avg_tokenFlow=0.0,
-            agent_contributions={}
+METRICS = ("benefit", "cost", "capability", "tokenFlow")
+CAPABILITY = METRICS.index("capability")
+
+class WeightedChoiceAccumulator:
+    # Running totals of the agent metrics, plain and weighted by capability. Chunks can be
+    # added in any order and accumulators merged, so partial states from separate requests,
+    # workers or nodes combine into the same result as one pass over all agents.
+    def __init__(self, state: Optional[AggregateState] = None):
+        self.count = 0
+        self.totals = np.zeros(len(METRICS))
+        self.weighted = np.zeros(len(METRICS))
+        if state is not None:
+            self.merge(state)
+
+    def add(self, metrics: np.ndarray) -> "WeightedChoiceAccumulator":
+        # metrics: agents x METRICS
+        self.count += metrics.shape[0]
+        self.totals += metrics.sum(axis=0)
+        self.weighted += metrics[:, CAPABILITY] @ metrics
+        return self
+
+    def merge(self, state: AggregateState) -> "WeightedChoiceAccumulator":
+        self.count += state.count
+        self.totals += [getattr(state, f"total_{m}") for m in METRICS]
+        self.weighted += [getattr(state, f"weighted_{m}") for m in METRICS]
+        return self
+
+    def state(self) -> AggregateState:
+        return AggregateState(
+            count=self.count,
+            **{f"total_{m}": float(v) for m, v in zip(METRICS, self.totals)},
+            **{f"weighted_{m}": float(v) for m, v in zip(METRICS, self.weighted)}
         )
 
-    total_benefit = sum(v.benefit for v in economic_values.values())
-    total_cost = sum(v.cost for v in economic_values.values())
-    total_capability = sum(v.capability for v in economic_values.values())
-    total_tokenFlow = sum(v.tokenFlow for v in economic_values.values())
-    n_agents = len(economic_values)
-
-    group_decision_score = (total_benefit - total_cost) / max(total_benefit + total_cost, 1e-6)
-    avg_capability = total_capability / n_agents
-    avg_tokenFlow = total_tokenFlow / n_agents
-
-    return AggregateWeightedChoiceResponse(
-        group_decision_score=group_decision_score,
-        avg_capability=avg_capability,
-        avg_tokenFlow=avg_tokenFlow,
-        agent_contributions=economic_values
+    def result(self, capability_weighted: bool = False) -> Dict[str, Any]:
+        if self.count == 0:
+            result = {"group_decision_score": 0.0, "avg_capability": 0.0, "avg_tokenFlow": 0.0}
+            if capability_weighted:
+                result.update(weighted_decision_score=0.0, weighted_avg_capability=0.0, weighted_avg_tokenFlow=0.0)
+            return result
+        benefit, cost, capability, token_flow = self.totals.tolist()
+        result = {
+            "group_decision_score": (benefit - cost) / max(benefit + cost, 1e-6),
+            "avg_capability": capability / self.count,
+            "avg_tokenFlow": token_flow / self.count
+        }
+        if capability_weighted:
+            w_benefit, w_cost, w_capability, w_token_flow = self.weighted.tolist()
+            result.update(
+                weighted_decision_score=(w_benefit - w_cost) / max(w_benefit + w_cost, 1e-6),
+                weighted_avg_capability=w_capability / capability if capability else 0.0,
+                weighted_avg_tokenFlow=w_token_flow / capability if capability else 0.0
+            )
+        return result
+
+def metrics_matrix(economic_values: Dict[str, AgentEconomicMetrics]) -> np.ndarray:
+    return np.array(
+        [(v.benefit, v.cost, v.capability, v.tokenFlow) for v in economic_values.values()], dtype=float
+    ).reshape(len(economic_values), len(METRICS))
+
+def aggregate_response(accumulator: WeightedChoiceAccumulator, request: AggregateWeightedChoiceRequest) -> AggregateWeightedChoiceResponse:
+    response = AggregateWeightedChoiceResponse(**accumulator.result(request.capability_weighted), state=accumulator.state())
+    if request.include_contributions:
+        response.agent_contributions = request.economic_values
+    return response
+
+@service_weight(LIGHT)
+def aggregate_weighted_choice_service(request: AggregateWeightedChoiceRequest) -> AggregateWeightedChoiceResponse:
+    accumulator = WeightedChoiceAccumulator(request.state).add(metrics_matrix(request.economic_values))
+    log_result("aggregate_weighted_choice", accumulator.totals, agents=len(request.economic_values))
+    return aggregate_response(accumulator, request)
+
+def agent_line_metrics(lines: Iterable[bytes]) -> np.ndarray:
+    # One agent per line: {"benefit": ..., "cost": ..., "capability": ..., "tokenFlow": ...},
+    # optionally with other keys (e.g. a name), or an economic_values entry {name: {...}}.
+    rows = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            agent = json.loads(line)
+        except ValueError as exc:
+            raise ValueError(f"Invalid JSON line ({exc}): {line[:200]!r}.")
+        if isinstance(agent, dict) and len(agent) == 1 and "benefit" not in agent:
+            agent = next(iter(agent.values()))
+        try:
+            rows.append((agent["benefit"], agent["cost"], agent["capability"], agent["tokenFlow"]))
+        except (KeyError, TypeError):
+            raise ValueError(f"Each line must be an agent with {', '.join(METRICS)}; got {line[:200]!r}.")
+    try:
+        return np.array(rows, dtype=float).reshape(len(rows), len(METRICS))
+    except (TypeError, ValueError):
+        raise ValueError(f"Agent metrics {', '.join(METRICS)} must be numbers.")
+
+@service_weight(LIGHT)
+def aggregate_lines_service(state: AggregateState, lines: List[bytes]) -> AggregateState:
+    # One chunk of an NDJSON body: the router threads the state from chunk to chunk.
+    return WeightedChoiceAccumulator(state).add(agent_line_metrics(lines)).state()
+
+@service_weight(LIGHT)
+def aggregate_state_service(state: AggregateState, capability_weighted: bool = False) -> AggregateWeightedChoiceResponse:
+    accumulator = WeightedChoiceAccumulator(state)
+    log_result("aggregate_weighted_choice_stream", accumulator.totals, agents=accumulator.count)
+    return AggregateWeightedChoiceResponse(**accumulator.result(capability_weighted), state=accumulator.state())
+
+@service_weight(LIGHT)
+def aggregate_merge_service(request: AggregateMergeRequest) -> AggregateWeightedChoiceResponse:
+    accumulator = WeightedChoiceAccumulator()
+    for state in request.states:
+        accumulator.merge(state)
+    log_result("aggregate_weighted_choice_merge", accumulator.totals, partials=len(request.states), agents=accumulator.count)
+    return AggregateWeightedChoiceResponse(**accumulator.result(request.capability_weighted), state=accumulator.state())
+
+def aggregate_weighted_choice_batch_key(request: AggregateWeightedChoiceRequest) -> Hashable:
+    return len(request.economic_values)
+
+def aggregate_weighted_choice_kernel(requests: List[AggregateWeightedChoiceRequest]) -> List[AggregateWeightedChoiceResponse]:
+    n_agents = len(requests[0].economic_values)
+    if n_agents == 0:
+        return [aggregate_weighted_choice_service(r) for r in requests]
+
+    metrics = np.array(
+        [[(v.benefit, v.cost, v.capability, v.tokenFlow) for v in r.economic_values.values()] for r in requests],
+        dtype=float
     )
+    totals = metrics.sum(axis=1)
+    weighted = np.einsum("ba,bam->bm", metrics[:, :, CAPABILITY], metrics)
+
+    responses = []
+    for b, r in enumerate(requests):
+        accumulator = WeightedChoiceAccumulator(r.state)
+        accumulator.count += n_agents
+        accumulator.totals += totals[b]
+        accumulator.weighted += weighted[b]
+        responses.append(aggregate_response(accumulator, r))
+    return responses
+
+@service_weight(HEAVY)
+def aggregate_weighted_choice_batch_service(request: AggregateWeightedChoiceBatchRequest) -> AggregateWeightedChoiceBatchResponse:
+    outcomes = run_batch(request.items, aggregate_weighted_choice_batch_key, aggregate_weighted_choice_kernel)
+    log_result("aggregate_weighted_choice_batch", outcomes, items=len(outcomes), errors=sum(e is not None for _, e in outcomes))
+    return AggregateWeightedChoiceBatchResponse(results=batch_items(outcomes, AggregateWeightedChoiceBatchItem))
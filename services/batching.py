@@ -0,0 +1,55 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+BatchOutcome = Tuple[Optional[Any], Optional[str]]
+
+def format_error(exc: Exception) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+def group_indices(items: Sequence[Any], key: Callable[[Any], Hashable]) -> Dict[Hashable, List[int]]:
+    groups: Dict[Hashable, List[int]] = {}
+    for i, item in enumerate(items):
+        try:
+            k = key(item)
+        except Exception:
+            # unkeyable items are isolated so the kernel reports their error on their own
+            k = ("__ungrouped__", i)
+        groups.setdefault(k, []).append(i)
+    return groups
+
+def run_batch(
+    items: Sequence[Any],
+    key: Callable[[Any], Optional[Hashable]],
+    kernel: Callable[[List[Any]], List[Any]],
+    fallback: Optional[Callable[[Any], Any]] = None
+) -> List[BatchOutcome]:
+    # Items sharing a key are stacked and evaluated by one kernel call. If a group
+    # fails, its items are re-run one by one so only the offending items report errors.
+    # Items keyed None cannot be stacked and go through the single-request fallback.
+    outcomes: List[BatchOutcome] = [(None, None)] * len(items)
+    for k, indices in group_indices(items, key).items():
+        if k is None and fallback is not None:
+            for i in indices:
+                try:
+                    outcomes[i] = (fallback(items[i]), None)
+                except Exception as exc:
+                    outcomes[i] = (None, format_error(exc))
+            continue
+        group = [items[i] for i in indices]
+        try:
+            results = kernel(group)
+        except Exception as exc:
+            if len(indices) == 1:
+                outcomes[indices[0]] = (None, format_error(exc))
+                continue
+            for i in indices:
+                try:
+                    outcomes[i] = (kernel([items[i]])[0], None)
+                except Exception as item_exc:
+                    outcomes[i] = (None, format_error(item_exc))
+            continue
+        for i, result in zip(indices, results):
+            outcomes[i] = (result, None)
+    return outcomes
+
+def batch_items(outcomes: List[BatchOutcome], item_cls: Callable[..., Any]) -> List[Any]:
+    return [item_cls(index=i, result=result, error=error) for i, (result, error) in enumerate(outcomes)]
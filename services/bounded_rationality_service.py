@@ -1,13 +1,89 @@
-from models.bounded_rationality_model import BoundedRationalityRequest, BoundedRationalityResponse
+from models.bounded_rationality_model import BoundedRationalityRequest, BoundedRationalityResponse, BoundedRationalityBatchRequest, BoundedRationalityBatchResponse, BoundedRationalityBatchItem, SimulationSummary
+from services.batching import run_batch, batch_items
+from core.execution import service_weight, LIGHT, HEAVY
+from core.structured_logging import log_result
+from services.selection import top_k_indices, first_at_least
+import os
 import numpy as np
-import random
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Hashable
 
-try:
-    from ax.service.managed_loop import optimize as ax_optimize
-    AX_AVAILABLE = True
-except Exception:
-    AX_AVAILABLE = False
+BAYES_POLICIES = ("thompson", "ucb")
+# Native Bayes searches up to this many evaluations run in the threadpool; longer ones go to the pool.
+BAYES_INLINE_STEPS = int(os.getenv("ECONOMICS_BAYES_INLINE_STEPS", "256"))
+# Longer searches report one trace entry per evaluated choice instead of one per evaluation.
+BAYES_TRACE_STEPS = 256
+# Simulate requests with more replications than this go to the pool.
+SIMULATE_INLINE_REPLICATIONS = int(os.getenv("ECONOMICS_SIMULATE_INLINE_REPLICATIONS", "100000"))
+
+class MissingBackendError(ValueError):
+    status_code = 501
+
+def bandit_search(
+    payoffs: np.ndarray,
+    trials: int,
+    policy: str,
+    noise: float,
+    rng: np.random.Generator
+) -> Tuple[List[int], List[float], np.ndarray]:
+    # Sequential search over the choices as arms with independent normal posteriors.
+    # Evaluations observe payoff + N(0, noise^2); without noise an evaluated arm is known
+    # exactly and is never evaluated again. The prior is fitted to the evaluations so far
+    # (mean and spread of the evaluated arms). Returns the evaluated arms, the observed
+    # values and the final posterior means.
+    n = payoffs.size
+    counts = np.zeros(n)
+    sums = np.zeros(n)
+    arms: List[int] = []
+    observed: List[float] = []
+    steps = min(trials, n) if noise <= 0 else trials
+    for step in range(1, steps + 1):
+        seen = counts > 0
+        arm_means = sums[seen] / counts[seen]
+        prior_mean = arm_means.mean() if arm_means.size else 0.0
+        prior_sd = arm_means.std() if arm_means.size > 1 else 0.0
+        prior_sd = prior_sd if prior_sd > 0 else max(noise, abs(prior_mean), 1.0)
+        if noise > 0:
+            precision = 1.0 / prior_sd ** 2 + counts / noise ** 2
+            mean = (prior_mean / prior_sd ** 2 + sums / noise ** 2) / precision
+            sd = 1.0 / np.sqrt(precision)
+        else:
+            mean = np.where(seen, sums / np.maximum(counts, 1.0), prior_mean)
+            sd = np.where(seen, 0.0, prior_sd)
+        if policy == "thompson":
+            score = mean + sd * rng.standard_normal(n)
+        else:
+            score = mean + np.sqrt(2.0 * np.log(step + 1.0)) * sd
+        if noise <= 0:
+            score[seen] = -np.inf
+        arm = int(np.argmax(score))
+        value = float(payoffs[arm] + (noise * rng.standard_normal() if noise > 0 else 0.0))
+        counts[arm] += 1
+        sums[arm] += value
+        arms.append(arm)
+        observed.append(value)
+    posterior = np.where(counts > 0, sums / np.maximum(counts, 1.0), -np.inf)
+    return arms, observed, posterior
+
+def sample_best_of_budget(payoffs: np.ndarray, budget: int, replications: int, rng: np.random.Generator) -> np.ndarray:
+    # Index of the choice picked by each of `replications` simulate runs: the best payoff
+    # among `budget` choices drawn without replacement, ties going to whichever of them was
+    # drawn first. Only the best rank among the drawn choices matters, and it has a closed-form
+    # distribution, P(best rank >= k) = C(n - k, b) / C(n, b), so it is sampled by inverse CDF
+    # instead of materializing a replications x n matrix of permutations.
+    n = payoffs.size
+    b = min(budget, n)
+    order = np.argsort(-payoffs, kind="stable")
+    k = np.arange(n - b + 1)
+    survival = np.concatenate(([1.0], np.cumprod((n - k[:-1] - b) / (n - k[:-1]))))
+    cdf = 1.0 - np.append(survival[1:], 0.0)
+    best_rank = np.minimum(np.searchsorted(cdf, rng.random(replications), side="right"), n - b)
+    # Among equal payoffs every member is equally likely to have been drawn first.
+    ranked = payoffs[order]
+    starts = np.flatnonzero(np.r_[True, ranked[1:] != ranked[:-1]])
+    sizes = np.diff(np.r_[starts, n])
+    group = np.searchsorted(starts, best_rank, side="right") - 1
+    pick = starts[group] + (rng.random(replications) * sizes[group]).astype(np.intp)
+    return order[pick]
 
 class BoundedAgent:
     def __init__(self):
@@ -24,6 +100,11 @@ class BoundedAgent:
         aspiration: Optional[float] = None,
         sample_budget: int = 5,
         random_seed: Optional[int] = None,
+        replications: Optional[int] = None,
+        payoff_quantiles: Tuple[float, ...] = (0.05, 0.25, 0.5, 0.75, 0.95),
+        bayes_backend: str = "native",
+        bayes_policy: str = "thompson",
+        payoff_noise: float = 0.0,
     ) -> Dict[str, Any]:
         rng = np.random.RandomState(random_seed)
         max_evals = int(agent_capacity.get("max_evals", sample_budget))
@@ -44,25 +125,23 @@ class BoundedAgent:
             })
 
         if mode == "satisficing":
-            order = []
+            # Only the first `budget` choices in evaluation order are ever looked at.
             if decision_tree and isinstance(decision_tree.get("order"), list):
-                order = [c for c in decision_tree["order"] if c in choice_set]
-                order += [c for c in choice_set if c not in order]
+                members = set(choice_set)
+                order = [c for c in decision_tree["order"] if c in members]
+                listed = set(order)
+                order += [c for c in choice_set if c not in listed]
+                order = order[:max(budget, 0)]
             else:
-                order = sorted(choice_set, key=lambda c: payoff_matrix.get(c, 0.0), reverse=True)
+                order = [choice_set[i] for i in top_k_indices(payoffs_arr, max(budget, 0))]
 
-            selected = None
-            eval_count = 0
-            for rank, choice in enumerate(order):
-                if eval_count >= budget:
-                    break
-                pf = payoff_matrix.get(choice, 0.0)
-                note = "meets aspiration" if pf >= aspiration else "below aspiration"
-                record(choice, pf, rank + 1, note)
-                eval_count += 1
-                if pf >= aspiration:
-                    selected = choice
-                    break
+            ranked = np.array([payoff_matrix.get(c, 0.0) for c in order], dtype=float)
+            hit = first_at_least(ranked, aspiration)
+            evaluated = len(order) if hit is None else hit + 1
+            for rank, choice in enumerate(order[:evaluated]):
+                note = "meets aspiration" if rank == hit else "below aspiration"
+                record(choice, ranked[rank], rank + 1, note)
+            selected = order[hit] if hit is not None else None
 
             if selected is None:
                 if len(trace) > 0:
@@ -93,45 +172,114 @@ class BoundedAgent:
                     t["note"] += " | chosen"
             self.simplified_choice = selected
             self.heuristic_trace = trace
-            return {"SimplifiedChoice": selected, "HeuristicTrace": trace}
+            result = {"SimplifiedChoice": selected, "HeuristicTrace": trace}
+            if replications:
+                result["Simulation"] = self.simulateReplications(
+                    choice_set, payoffs_arr, budget, replications, payoff_quantiles, random_seed
+                )
+            return result
 
         elif mode == "bayes":
-            if not AX_AVAILABLE:
-                return self.boundedRationality(choice_set, payoff_matrix, agent_capacity, decision_tree,
-                                              mode="simulate", aspiration=aspiration,
-                                              sample_budget=sample_budget, random_seed=random_seed)
-            domain = [{"name": "choice", "type": "choice", "values": choice_set}]
-            def evaluation_func(params):
-                choice = params["choice"]
-                return {"payoff": float(payoff_matrix.get(choice, 0.0))}
-
             trials = min(budget, max(1, int(agent_capacity.get("max_evals", sample_budget))))
-            best = None
-            best_val = -np.inf
-            try:
-                best_parameters, values, experiment, model = ax_optimize(
-                    parameters=domain,
-                    evaluation_function=evaluation_func,
-                    total_trials=trials,
-                )
-                best_choice = best_parameters["choice"]
-                selected = best_choice
-                for i, c in enumerate(choice_set[:trials]):
-                    record(c, payoff_matrix.get(c, 0.0), i + 1, "bayes-trial (approx)")
-                for t in trace:
-                    if t["choice"] == selected:
-                        t["note"] += " | chosen"
-                self.simplified_choice = selected
-                self.heuristic_trace = trace
-                return {"SimplifiedChoice": selected, "HeuristicTrace": trace}
-            except Exception:
-                return self.boundedRationality(choice_set, payoff_matrix, agent_capacity, decision_tree,
-                                              mode="simulate", aspiration=aspiration,
-                                              sample_budget=sample_budget, random_seed=random_seed)
+            if bayes_backend == "ax":
+                return self.axSearch(choice_set, payoff_matrix, trials)
+            if bayes_backend != "native":
+                raise ValueError("Unknown bayes_backend. Use 'native' or 'ax'.")
+            if bayes_policy not in BAYES_POLICIES:
+                raise ValueError("Unknown bayes_policy. Use 'thompson' or 'ucb'.")
+            if not choice_set or trials <= 0:
+                raise ValueError("Nothing to search: bayes mode needs choices and a positive sample_budget.")
+            arms, observed, posterior = bandit_search(
+                payoffs_arr.astype(float), trials, bayes_policy, payoff_noise, np.random.default_rng(random_seed)
+            )
+            selected = choice_set[int(np.argmax(posterior))]
+            if len(arms) <= BAYES_TRACE_STEPS:
+                for rank, (arm, value) in enumerate(zip(arms, observed)):
+                    record(choice_set[arm], value, rank + 1, f"bayes-trial ({bayes_policy})")
+            else:
+                evaluated, first, counts = np.unique(arms, return_index=True, return_counts=True)
+                sums = np.bincount(arms, weights=observed, minlength=len(choice_set))
+                for i in np.argsort(first):
+                    arm = evaluated[i]
+                    record(choice_set[arm], sums[arm] / counts[i], first[i] + 1, f"bayes-trials ({bayes_policy}) x{counts[i]}, mean payoff")
+            for t in trace:
+                if t["choice"] == selected:
+                    t["note"] += " | chosen"
+            self.simplified_choice = selected
+            self.heuristic_trace = trace
+            return {"SimplifiedChoice": selected, "HeuristicTrace": trace}
 
         else:
             raise ValueError("Unknown mode. Use 'satisficing', 'simulate', or 'bayes'.")
 
+    def axSearch(self, choice_set: List[str], payoff_matrix: Dict[str, float], trials: int) -> Dict[str, Any]:
+        # Opt-in backend: a full Ax experiment per request.
+        try:
+            from ax.service.managed_loop import optimize as ax_optimize
+        except ImportError:
+            raise MissingBackendError("bayes_backend 'ax' needs ax-platform, which is not installed on this server.")
+        trace: List[Dict[str, Any]] = []
+
+        def evaluation_func(params):
+            choice = params["choice"]
+            payoff = float(payoff_matrix.get(choice, 0.0))
+            trace.append({"choice": choice, "payoff": payoff, "evaluated_at_rank": len(trace) + 1, "note": "bayes-trial (ax)"})
+            return {"payoff": payoff}
+
+        best_parameters, _, _, _ = ax_optimize(
+            parameters=[{"name": "choice", "type": "choice", "values": choice_set}],
+            evaluation_function=evaluation_func,
+            total_trials=trials,
+        )
+        selected = best_parameters["choice"]
+        for t in trace:
+            if t["choice"] == selected:
+                t["note"] += " | chosen"
+        self.simplified_choice = selected
+        self.heuristic_trace = trace
+        return {"SimplifiedChoice": selected, "HeuristicTrace": trace}
+
+    def simulateReplications(
+        self,
+        choice_set: List[str],
+        payoffs: np.ndarray,
+        budget: int,
+        replications: int,
+        payoff_quantiles: Tuple[float, ...],
+        random_seed: Optional[int] = None
+    ) -> Dict[str, Any]:
+        if replications < 0:
+            raise ValueError("replications must be non-negative.")
+        picked = sample_best_of_budget(payoffs.astype(float), budget, replications, np.random.default_rng(random_seed))
+        counts = np.bincount(picked, minlength=len(choice_set))
+        frequencies: Dict[str, float] = {}
+        for i in np.flatnonzero(counts).tolist():
+            frequencies[choice_set[i]] = frequencies.get(choice_set[i], 0.0) + counts[i] / replications
+        selected = payoffs[picked]
+        levels = [float(q) for q in payoff_quantiles]
+        return {
+            "Replications": replications,
+            "ChoiceFrequencies": frequencies,
+            "PayoffMean": float(selected.mean()),
+            "PayoffStd": float(selected.std()),
+            "PayoffQuantiles": dict(zip(map(str, levels), np.quantile(selected, levels).tolist()))
+        }
+
+def bayes_steps(request: BoundedRationalityRequest) -> int:
+    # Evaluations bandit_search will make for this request.
+    trials = min(int(request.agent_capacity.get("max_evals", request.sample_budget)), request.sample_budget)
+    return min(trials, len(request.choice_set)) if request.payoff_noise <= 0 else trials
+
+def bounded_rationality_weight(request: BoundedRationalityRequest) -> str:
+    if request.mode == "simulate":
+        return HEAVY if (request.replications or 0) > SIMULATE_INLINE_REPLICATIONS else LIGHT
+    if request.mode != "bayes":
+        return LIGHT
+    if request.bayes_backend == "ax" or bayes_steps(request) > BAYES_INLINE_STEPS:
+        return HEAVY
+    return LIGHT
+
+@service_weight(bounded_rationality_weight)
 def bounded_rationality_service(request: BoundedRationalityRequest) -> BoundedRationalityResponse:
     agent = BoundedAgent()
     result = agent.boundedRationality(
@@ -142,11 +290,66 @@ def bounded_rationality_service(request: BoundedRationalityRequest) -> BoundedRa
         mode=request.mode,
         aspiration=request.aspiration,
         sample_budget=request.sample_budget,
-        random_seed=request.random_seed
+        random_seed=request.random_seed,
+        replications=request.replications,
+        payoff_quantiles=tuple(request.payoff_quantiles),
+        bayes_backend=request.bayes_backend,
+        bayes_policy=request.bayes_policy,
+        payoff_noise=request.payoff_noise
     )
 
-    print(f"Bounded Rationality: {result}")
+    log_result("bounded_rationality", result, choices=len(request.choice_set), replications=request.replications)
+    simulation = result.get("Simulation")
+    extra = {} if simulation is None else {"simulation": SimulationSummary(
+        replications=simulation["Replications"],
+        choice_frequencies=simulation["ChoiceFrequencies"],
+        payoff_mean=simulation["PayoffMean"],
+        payoff_std=simulation["PayoffStd"],
+        payoff_quantiles=simulation["PayoffQuantiles"]
+    )}
     return BoundedRationalityResponse(
         simplified_choice=result["SimplifiedChoice"],
-        heuristic_trace=result["HeuristicTrace"]
+        heuristic_trace=result["HeuristicTrace"],
+        **extra
     )
+
+def bounded_rationality_batch_key(request: BoundedRationalityRequest) -> Optional[Hashable]:
+    # Only payoff-ordered satisficing is deterministic in the inputs alone; seeded
+    # simulation and Bayes search keep their per-request RNG streams.
+    tree = request.decision_tree
+    if request.mode != "satisficing" or (tree and isinstance(tree.get("order"), list)) or not request.choice_set:
+        return None
+    return len(request.choice_set)
+
+def bounded_rationality_kernel(requests: List[BoundedRationalityRequest]) -> List[BoundedRationalityResponse]:
+    payoffs = np.array([[r.payoff_matrix.get(c, 0.0) for c in r.choice_set] for r in requests], dtype=float)
+    aspiration = np.array([np.nan if r.aspiration is None else r.aspiration for r in requests], dtype=float)
+    aspiration = np.where(np.isnan(aspiration), np.median(payoffs, axis=1), aspiration)
+    budgets = [min(int(r.agent_capacity.get("max_evals", r.sample_budget)), r.sample_budget) for r in requests]
+
+    responses = []
+    for b, r in enumerate(requests):
+        budget = budgets[b]
+        order = top_k_indices(payoffs[b], max(budget, 1))
+        ranked = payoffs[b, order]
+        top = r.choice_set[order[0]]
+        if budget <= 0:
+            trace = [{"choice": top, "payoff": float(ranked[0]), "evaluated_at_rank": 0, "note": "chosen (fallback)"}]
+        elif ranked[0] >= aspiration[b]:
+            trace = [{"choice": top, "payoff": float(ranked[0]), "evaluated_at_rank": 1, "note": "meets aspiration"}]
+        else:
+            trace = [
+                {"choice": r.choice_set[i], "payoff": pf, "evaluated_at_rank": rank + 1, "note": "below aspiration"}
+                for rank, (i, pf) in enumerate(zip(order.tolist(), ranked.tolist()))
+            ]
+            for t in trace:
+                if t["choice"] == top:
+                    t["note"] += " | chosen (best evaluated)"
+        responses.append(BoundedRationalityResponse(simplified_choice=top, heuristic_trace=trace))
+    return responses
+
+@service_weight(HEAVY)
+def bounded_rationality_batch_service(request: BoundedRationalityBatchRequest) -> BoundedRationalityBatchResponse:
+    outcomes = run_batch(request.items, bounded_rationality_batch_key, bounded_rationality_kernel, bounded_rationality_service)
+    log_result("bounded_rationality_batch", outcomes, items=len(outcomes), errors=sum(e is not None for _, e in outcomes))
+    return BoundedRationalityBatchResponse(results=batch_items(outcomes, BoundedRationalityBatchItem))
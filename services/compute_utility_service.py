@@ -1,6 +1,127 @@
-from models.compute_utility_model import ComputeUtilityRequest, ComputeUtilityResponse, Outcome, Choice
+from models.compute_utility_model import ComputeUtilityInputs, ComputeUtilityRequest, ComputeUtilityResponse, Outcome, Choice, ComputeUtilityBatchRequest, ComputeUtilityBatchResponse, ComputeUtilityBatchItem, ComputeUtilitySweepRequest, ComputeUtilitySweepResponse, SweepResult, SweepSetting
+from services.batching import run_batch, batch_items
+from core.execution import service_weight, LIGHT, HEAVY
+from core.structured_logging import log_result
+from core.encoding import select_fields
 import numpy as np
-from typing import Dict, List, Any, Optional, Tuple
+from itertools import chain, product
+from operator import itemgetter
+from typing import Dict, List, Any, Optional, Tuple, Hashable, Union
+
+OUTCOME_ATTRIBUTES = ("value", "attention_cost")
+
+def attention_penalty(attention: np.ndarray, budget: np.ndarray, coeff: np.ndarray) -> np.ndarray:
+    exceed = np.maximum(0.0, attention - budget)
+    return (attention * coeff) + (exceed * coeff)
+
+def normalize_rows(vals: np.ndarray, method: str, eps: float = 1e-9) -> np.ndarray:
+    if method == "minmax":
+        mn = vals.min(axis=-1, keepdims=True)
+        mx = vals.max(axis=-1, keepdims=True)
+        flat = np.abs(mx - mn) < eps
+        return np.where(flat, 0.5, (vals - mn) / np.where(flat, 1.0, mx - mn))
+    elif method == "zscore":
+        mu = vals.mean(axis=-1, keepdims=True)
+        sd = vals.std(axis=-1, keepdims=True)
+        flat = sd < eps
+        return np.where(flat, 0.0, (vals - mu) / np.where(flat, 1.0, sd))
+    raise ValueError("Unknown normalization method")
+
+def softmax_rows(vals: np.ndarray, temp: np.ndarray, eps: float = 1e-9) -> np.ndarray:
+    temp = np.maximum(eps, temp)
+    shifted = vals - vals.max(axis=-1, keepdims=True)
+    exps = np.exp(shifted / temp)
+    return exps / (exps.sum(axis=-1, keepdims=True) + eps)
+
+class OutcomeMatrix:
+    # Outcomes as one outcomes x attributes float matrix; NaN marks a missing value.
+    # Only the attributes a request refers to are extracted, each once, into a column.
+    def __init__(self, ids: List[str], attributes: Tuple[str, ...], values: np.ndarray):
+        self.ids = ids
+        self.attributes = attributes
+        self.values = values
+        self.missing = np.isnan(values)
+        self.filled = np.where(self.missing, 0.0, values)
+        # attributes no outcome has at all, as opposed to ones missing on some outcomes
+        self.unknown = {
+            attr for j, attr in enumerate(attributes)
+            if attr not in OUTCOME_ATTRIBUTES and self.missing[:, j].all()
+        }
+
+    @classmethod
+    def from_outcomes(cls, outcome_set: List[Outcome], attributes: Tuple[str, ...] = OUTCOME_ATTRIBUTES) -> "OutcomeMatrix":
+        ids = [o.id for o in outcome_set]
+        n = len(ids)
+        values = np.full((n, len(attributes)), np.nan)
+        features = [o.features for o in outcome_set] if len(attributes) > len(OUTCOME_ATTRIBUTES) else []
+        if not any(features):
+            features = []
+        for j, attr in enumerate(attributes):
+            # a float array conversion maps None to NaN
+            if attr in OUTCOME_ATTRIBUTES:
+                values[:, j] = np.array([getattr(o, attr) for o in outcome_set], dtype=float)
+        columns = [j for j, attr in enumerate(attributes) if attr not in OUTCOME_ATTRIBUTES]
+        if features and columns:
+            names = [attributes[j] for j in columns]
+            try:
+                # common case: every outcome has every referenced feature; one C-level lookup per outcome
+                get = itemgetter(*names) if len(names) > 1 else (lambda f, key=names[0]: (f[key],))
+                flat = np.fromiter(chain.from_iterable(map(get, features)), dtype=float, count=n * len(names))
+                values[:, columns] = flat.reshape(n, len(names))
+            except (KeyError, TypeError):
+                for j, attr in zip(columns, names):
+                    values[:, j] = np.array([None if f is None else f.get(attr) for f in features], dtype=float)
+        if len(set(ids)) != n:
+            ids, values = dedupe(ids, values)
+        return cls(ids, attributes, values)
+
+    @classmethod
+    def from_columns(
+        cls,
+        ids: List[str],
+        feature_names: List[str],
+        feature_matrix: List[List[float]],
+        attributes: Tuple[str, ...] = OUTCOME_ATTRIBUTES
+    ) -> "OutcomeMatrix":
+        matrix = np.array(feature_matrix, dtype=float).reshape(len(feature_matrix), -1) if feature_matrix else np.empty((0, len(feature_names)))
+        if matrix.shape != (len(ids), len(feature_names)):
+            raise ValueError("feature_matrix must have one row per outcome id and one column per feature name")
+        index = {name: j for j, name in enumerate(feature_names)}
+        values = np.full((len(ids), len(attributes)), np.nan)
+        for j, attr in enumerate(attributes):
+            if attr in index:
+                values[:, j] = matrix[:, index[attr]]
+        ids = list(ids)
+        if len(set(ids)) != len(ids):
+            ids, values = dedupe(ids, values)
+        return cls(ids, attributes, values)
+
+    def column(self, attr: str) -> Optional[np.ndarray]:
+        if attr not in self.attributes or attr in self.unknown:
+            return None
+        return self.values[:, self.attributes.index(attr)]
+
+def dedupe(ids: List[str], values: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    # results are keyed by id: keep each id's last outcome, in first-seen order
+    last = dict(zip(ids, range(len(ids))))
+    return list(last), values[np.fromiter(last.values(), dtype=np.intp, count=len(last))]
+
+def request_attributes(agent_preferences: Dict[str, float], attention_attr: Optional[str]) -> Tuple[str, ...]:
+    attributes = dict.fromkeys(OUTCOME_ATTRIBUTES)
+    attributes.update(dict.fromkeys(agent_preferences))
+    if attention_attr:
+        attributes[attention_attr] = None
+    return tuple(attributes)
+
+def request_outcomes(request: ComputeUtilityInputs) -> OutcomeMatrix:
+    attributes = request_attributes(request.agent_preferences, request.attention_attr)
+    if request.feature_matrix is not None:
+        if request.outcome_set:
+            raise ValueError("Use either outcome_set or the columnar outcome_ids/feature_names/feature_matrix form, not both.")
+        if request.outcome_ids is None or request.feature_names is None:
+            raise ValueError("feature_matrix needs outcome_ids and feature_names.")
+        return OutcomeMatrix.from_columns(request.outcome_ids, request.feature_names, request.feature_matrix, attributes)
+    return OutcomeMatrix.from_outcomes(request.outcome_set, attributes)
 
 class ComputeUtility:
     def __init__(
@@ -23,87 +144,60 @@ class ComputeUtility:
         self.satisficing_threshold = satisficing_threshold
         self.eps = eps
 
-    def compute_raw(self, agent_preferences: Dict[str, float], outcome_set: List[Outcome]) -> Dict[str, float]:
-        raw = {}
-        for o in outcome_set:
-            oid = o.id
-            u = 0.0
-            for attr, w in agent_preferences.items():
-                if hasattr(o, attr) and getattr(o, attr) is not None:
-                    try:
-                        val = float(getattr(o, attr))
-                        u += w * val
-                    except Exception:
-                        continue
-            raw[oid] = u
-        return raw
-
-    def apply_attention_cost(self, raw_scores: Dict[str, float], outcome_set: List[Outcome]) -> Dict[str, float]:
+    def compute_raw(self, agent_preferences: Dict[str, float], outcomes: OutcomeMatrix) -> np.ndarray:
+        # preferences on attributes outcomes do not have contribute nothing, as do missing values
+        weights = np.array([agent_preferences.get(attr, 0.0) for attr in outcomes.attributes], dtype=float)
+        return outcomes.filled @ weights
+
+    def apply_attention_cost(self, raw_scores: np.ndarray, outcomes: OutcomeMatrix) -> np.ndarray:
         if not self.attention_attr:
             return raw_scores
-        penalized = {}
-        att_map = {o.id: float(getattr(o, self.attention_attr, 0.0)) for o in outcome_set}
-        for oid, u in raw_scores.items():
-            att_use = att_map.get(oid, 0.0)
-            budget = self.attention_budget if self.attention_budget is not None else float("inf")
-            exceed = max(0.0, att_use - budget)
-            penalty = (att_use * self.attention_cost_coeff) + (exceed * self.attention_cost_coeff)
-            penalized[oid] = u - penalty
-        return penalized
-
-    def normalize_scores(self, scores: Dict[str, float]) -> Dict[str, float]:
-        oids = list(scores.keys())
-        vals = np.array([scores[k] for k in oids], dtype=float)
-        if self.normalization_method == "minmax":
-            mn, mx = vals.min(), vals.max()
-            if abs(mx - mn) < self.eps:
-                normed = np.full_like(vals, 0.5)
-            else:
-                normed = (vals - mn) / (mx - mn)
-        elif self.normalization_method == "zscore":
-            mu, sd = vals.mean(), vals.std()
-            if sd < self.eps:
-                normed = np.full_like(vals, 0.0)
-            else:
-                normed = (vals - mu) / sd
+        attention = outcomes.column(self.attention_attr)
+        if attention is None:
+            return raw_scores.copy()
+        if np.isnan(attention).any():
+            raise TypeError("Attention attribute is missing on some outcomes.")
+        budget = self.attention_budget if self.attention_budget is not None else np.inf
+        return raw_scores - attention_penalty(attention, budget, self.attention_cost_coeff)
+
+    def normalize_scores(self, scores: np.ndarray) -> np.ndarray:
+        return normalize_rows(scores, self.normalization_method, self.eps)
+
+    def to_probabilities(self, scores: np.ndarray) -> np.ndarray:
+        return softmax_rows(scores, float(self.softmax_temp), self.eps)
+
+    def choose_satisficing(self, normalized_scores: np.ndarray) -> Tuple[int, float]:
+        if normalized_scores.size == 0:
+            raise ValueError("No scores to choose from.")
+        # Scanning in descending order, the first score above the threshold is the maximum
+        # itself, and the fallback without one is the maximum too; ties keep input order.
+        best = int(np.argmax(normalized_scores))
+        return best, float(normalized_scores[best])
+
+    def run(self, agent_preferences: Dict[str, float], outcome_set: Union[List[Outcome], OutcomeMatrix], apply_attention: bool = True) -> Dict[str, Any]:
+        if isinstance(outcome_set, OutcomeMatrix):
+            outcomes = outcome_set
         else:
-            raise ValueError("Unknown normalization method")
-        return {oid: float(v) for oid, v in zip(oids, normed)}
-
-    def to_probabilities(self, scores: Dict[str, float]) -> Dict[str, float]:
-        oids = list(scores.keys())
-        vals = np.array([scores[k] for k in oids], dtype=float)
-        temp = max(self.eps, float(self.softmax_temp))
-        shifted = vals - vals.max()
-        exps = np.exp(shifted / temp)
-        probs = exps / (exps.sum() + self.eps)
-        return {oid: float(p) for oid, p in zip(oids, probs)}
-
-    def choose_satisficing(self, normalized_scores: Dict[str, float]) -> Tuple[str, float]:
-        if not normalized_scores:
+            outcomes = OutcomeMatrix.from_outcomes(outcome_set, request_attributes(agent_preferences, self.attention_attr))
+        if not outcomes.ids:
             raise ValueError("No scores to choose from.")
-        items = sorted(normalized_scores.items(), key=lambda kv: kv[1], reverse=True)
-        if self.satisficing_threshold is not None:
-            for oid, sc in items:
-                if sc >= self.satisficing_threshold:
-                    return oid, sc
-        return items[0]
-
-    def run(self, agent_preferences: Dict[str, float], outcome_set: List[Outcome], apply_attention: bool = True) -> Dict[str, Any]:
-        raw = self.compute_raw(agent_preferences, outcome_set)
-        penalized = self.apply_attention_cost(raw, outcome_set) if (apply_attention and self.attention_attr) else raw.copy()
+        raw = self.compute_raw(agent_preferences, outcomes)
+        penalized = self.apply_attention_cost(raw, outcomes) if (apply_attention and self.attention_attr) else raw.copy()
         normalized = self.normalize_scores(penalized) if self.normalize else penalized
         probs = self.to_probabilities(penalized)
-        chosen_id, chosen_score = self.choose_satisficing(normalized)
+        chosen, chosen_score = self.choose_satisficing(normalized)
         return {
+            "ids": outcomes.ids,
             "raw": raw,
             "penalized": penalized,
             "normalized": normalized,
             "probabilities": probs,
-            "choice": {"id": chosen_id, "score": chosen_score}
+            "choice": {"id": outcomes.ids[chosen], "score": chosen_score}
         }
 
-def compute_utility_service(request: ComputeUtilityRequest) -> ComputeUtilityResponse:
+STREAM_FIELDS = ("raw", "penalized", "normalized", "probabilities")
+
+def compute_utility_arrays(request: ComputeUtilityRequest) -> Dict[str, Any]:
     utility_computer = ComputeUtility(
         normalize=request.normalize,
         normalization_method=request.normalization_method,
@@ -114,17 +208,184 @@ def compute_utility_service(request: ComputeUtilityRequest) -> ComputeUtilityRes
         satisficing_threshold=request.satisficing_threshold
     )
 
-    result = utility_computer.run(
+    return utility_computer.run(
         agent_preferences=request.agent_preferences,
-        outcome_set=request.outcome_set,
+        outcome_set=request_outcomes(request),
         apply_attention=request.apply_attention
     )
 
-    print(f"Computed Utility: {result}")
+@service_weight(LIGHT)
+def compute_utility_service(request: ComputeUtilityRequest) -> ComputeUtilityResponse:
+    result = compute_utility_arrays(request)
+
+    log_result("compute_utility", result, outcomes=len(result["ids"]), attributes=len(request.agent_preferences))
+    ids = result["ids"]
     return ComputeUtilityResponse(
-        raw=result["raw"],
-        penalized=result["penalized"],
-        normalized=result["normalized"],
-        probabilities=result["probabilities"],
+        raw=dict(zip(ids, result["raw"].tolist())),
+        penalized=dict(zip(ids, result["penalized"].tolist())),
+        normalized=dict(zip(ids, result["normalized"].tolist())),
+        probabilities=dict(zip(ids, result["probabilities"].tolist())),
         choice=Choice(**result["choice"])
     )
+
+@service_weight(LIGHT)
+def compute_utility_stream_service(request: ComputeUtilityRequest) -> Dict[str, Any]:
+    # Normalization and the softmax need every score, so the columns are computed in full;
+    # the router streams them out row by row instead of building per-outcome dicts.
+    fields = select_fields(request.fields, STREAM_FIELDS)
+    result = compute_utility_arrays(request)
+    log_result("compute_utility_stream", result, outcomes=len(result["ids"]), attributes=len(request.agent_preferences))
+    return {
+        "ids": result["ids"],
+        "columns": {f: result[f] for f in fields},
+        "summary": {"choice": result["choice"], "count": len(result["ids"])}
+    }
+
+def compute_utility_batch_key(request: ComputeUtilityRequest) -> Optional[Hashable]:
+    # the stacked kernel only knows the declared attributes
+    if request.feature_matrix is not None or any(o.features for o in request.outcome_set):
+        return None
+    ids = [o.id for o in request.outcome_set]
+    if len(set(ids)) != len(ids):
+        return None
+    attention = bool(request.apply_attention and request.attention_attr)
+    return (len(ids), request.normalize, request.normalization_method, attention)
+
+def compute_utility_kernel(requests: List[ComputeUtilityRequest]) -> List[ComputeUtilityResponse]:
+    first = requests[0]
+    B, n = len(requests), len(first.outcome_set)
+    if n == 0:
+        raise ValueError("No scores to choose from.")
+
+    values = np.array([[o.value for o in r.outcome_set] for r in requests], dtype=float)
+    costs = np.array(
+        [[np.nan if o.attention_cost is None else o.attention_cost for o in r.outcome_set] for r in requests],
+        dtype=float
+    )
+    columns = {"value": values, "attention_cost": costs}
+    weights = {
+        attr: np.array([r.agent_preferences.get(attr, 0.0) for r in requests], dtype=float)[:, None]
+        for attr in OUTCOME_ATTRIBUTES
+    }
+    raw = sum(weights[attr] * np.nan_to_num(columns[attr], nan=0.0) for attr in OUTCOME_ATTRIBUTES)
+
+    if first.apply_attention and first.attention_attr:
+        attention = np.zeros((B, n))
+        for b, r in enumerate(requests):
+            if r.attention_attr in columns:
+                attention[b] = columns[r.attention_attr][b]
+        if np.isnan(attention).any():
+            raise TypeError("Attention attribute is missing on some outcomes.")
+        budget = np.array([np.inf if r.attention_budget is None else r.attention_budget for r in requests])[:, None]
+        coeff = np.array([r.attention_cost_coeff for r in requests], dtype=float)[:, None]
+        penalized = raw - attention_penalty(attention, budget, coeff)
+    else:
+        penalized = raw.copy()
+
+    normalized = normalize_rows(penalized, first.normalization_method) if first.normalize else penalized
+    temp = np.array([r.softmax_temp for r in requests], dtype=float)[:, None]
+    probs = softmax_rows(penalized, temp)
+    # the first score above the satisficing threshold in descending order is always the maximum
+    chosen = np.argmax(normalized, axis=1)
+
+    responses = []
+    for b, r in enumerate(requests):
+        ids = [o.id for o in r.outcome_set]
+        responses.append(ComputeUtilityResponse(
+            raw=dict(zip(ids, raw[b].tolist())),
+            penalized=dict(zip(ids, penalized[b].tolist())),
+            normalized=dict(zip(ids, normalized[b].tolist())),
+            probabilities=dict(zip(ids, probs[b].tolist())),
+            choice=Choice(id=ids[chosen[b]], score=float(normalized[b, chosen[b]]))
+        ))
+    return responses
+
+@service_weight(HEAVY)
+def compute_utility_batch_service(request: ComputeUtilityBatchRequest) -> ComputeUtilityBatchResponse:
+    outcomes = run_batch(request.items, compute_utility_batch_key, compute_utility_kernel, compute_utility_service)
+    log_result("compute_utility_batch", outcomes, items=len(outcomes), errors=sum(e is not None for _, e in outcomes))
+    return ComputeUtilityBatchResponse(results=batch_items(outcomes, ComputeUtilityBatchItem))
+
+SWEEP_PARAMETERS = ("softmax_temp", "attention_budget", "attention_cost_coeff")
+SWEEP_MAX_SETTINGS = 10000
+
+def sweep_settings(request: ComputeUtilitySweepRequest) -> List[Dict[str, Optional[float]]]:
+    base = {name: getattr(request, name) for name in SWEEP_PARAMETERS}
+    if (request.grid is None) == (request.settings is None):
+        raise ValueError("Give exactly one of grid or settings.")
+    if request.grid is not None:
+        unknown = [name for name in request.grid if name not in SWEEP_PARAMETERS]
+        if unknown:
+            raise ValueError(f"Unknown sweep parameters {unknown}. Use any of {list(SWEEP_PARAMETERS)}.")
+        count = int(np.prod([len(values) for values in request.grid.values()]))
+        if count > SWEEP_MAX_SETTINGS:
+            raise ValueError(f"The grid has {count} settings; at most {SWEEP_MAX_SETTINGS} are allowed per sweep.")
+        names = list(request.grid)
+        settings = [{**base, **dict(zip(names, values))} for values in product(*request.grid.values())]
+    else:
+        if len(request.settings) > SWEEP_MAX_SETTINGS:
+            raise ValueError(f"At most {SWEEP_MAX_SETTINGS} settings are allowed per sweep.")
+        # a parameter set to null explicitly (e.g. no attention budget) overrides the request's value
+        settings = [{**base, **s.model_dump(include=s.model_fields_set)} for s in request.settings]
+    for setting in settings:
+        if setting["softmax_temp"] is None or setting["attention_cost_coeff"] is None:
+            raise ValueError("softmax_temp and attention_cost_coeff cannot be null.")
+    return settings
+
+def sweep_arrays(request: ComputeUtilitySweepRequest, settings: List[Dict[str, Optional[float]]]) -> Dict[str, Any]:
+    # Raw utilities do not depend on the swept parameters and are computed once; the
+    # penalty, normalization and softmax run on a settings x outcomes matrix.
+    outcomes = request_outcomes(request)
+    if not outcomes.ids:
+        raise ValueError("No scores to choose from.")
+    computer = ComputeUtility(
+        normalize=request.normalize,
+        normalization_method=request.normalization_method,
+        attention_attr=request.attention_attr
+    )
+    raw = computer.compute_raw(request.agent_preferences, outcomes)
+    penalized = np.broadcast_to(raw, (len(settings), raw.size))
+    attention = outcomes.column(request.attention_attr) if (request.apply_attention and request.attention_attr) else None
+    if attention is not None:
+        if np.isnan(attention).any():
+            raise TypeError("Attention attribute is missing on some outcomes.")
+        budget = np.array([np.inf if s["attention_budget"] is None else s["attention_budget"] for s in settings])[:, None]
+        coeff = np.array([s["attention_cost_coeff"] for s in settings], dtype=float)[:, None]
+        penalized = raw - attention_penalty(attention, budget, coeff)
+    normalized = normalize_rows(penalized, request.normalization_method) if request.normalize else penalized
+    temp = np.array([s["softmax_temp"] for s in settings], dtype=float)[:, None]
+    probs = softmax_rows(penalized, temp)
+    # as in choose_satisficing, the choice is the maximum whatever the threshold, so the
+    # threshold is not a sweep parameter
+    chosen = np.argmax(normalized, axis=1)
+    return {"ids": outcomes.ids, "raw": raw, "normalized": normalized, "probabilities": probs, "chosen": chosen}
+
+@service_weight(HEAVY)
+def compute_utility_sweep_service(request: ComputeUtilitySweepRequest) -> ComputeUtilitySweepResponse:
+    settings = sweep_settings(request)
+    result = sweep_arrays(request, settings)
+    ids, chosen = result["ids"], result["chosen"]
+    rows = np.arange(len(settings))
+    normalized, probs = result["normalized"], result["probabilities"]
+    chosen_scores = normalized[rows, chosen].tolist()
+    chosen_probs = probs[rows, chosen].tolist()
+    counts = np.bincount(chosen, minlength=len(ids))
+
+    results = []
+    for k, setting in enumerate(settings):
+        item = SweepResult(
+            setting=SweepSetting(**setting),
+            choice=Choice(id=ids[chosen[k]], score=chosen_scores[k]),
+            choice_probability=chosen_probs[k]
+        )
+        if not request.summarize:
+            item.normalized = dict(zip(ids, normalized[k].tolist()))
+            item.probabilities = dict(zip(ids, probs[k].tolist()))
+        results.append(item)
+
+    log_result("compute_utility_sweep", result, outcomes=len(ids), settings=len(settings))
+    return ComputeUtilitySweepResponse(
+        raw=dict(zip(ids, result["raw"].tolist())),
+        results=results,
+        choice_counts={ids[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+    )
@@ -1,8 +1,85 @@
-from models.efficiency_ranking_model import EfficiencyRankingRequest, EfficiencyRankingResponse
+from models.efficiency_ranking_model import EfficiencyRankingRequest, EfficiencyRankingResponse, EfficiencyRankingBatchRequest, EfficiencyRankingBatchResponse, EfficiencyRankingBatchItem, UsageAppendRequest, UsageAppendResponse
+from services.batching import run_batch, batch_items
+from core.execution import service_weight, LIGHT, HEAVY
+from core.structured_logging import log_result
+from core.encoding import select_fields
+from services.selection import top_k_indices
+from services.trace_store import trace_store
 import numpy as np
-import pandas as pd
-from scipy.stats import entropy
-from typing import Dict, List, Any, Optional
+from itertools import chain
+from scipy.special import entr
+from typing import Dict, List, Any, Optional, Hashable, Tuple
+
+def segment_sums(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    # Per-trace sums over the flat concatenation of traces (CSR layout: `lengths` gives
+    # each trace's extent). A trailing zero keeps every start offset in range; empty
+    # traces, where reduceat would return the next element, sum to zero.
+    starts = np.cumsum(lengths) - lengths
+    sums = np.add.reduceat(np.append(values, 0.0), starts) if lengths.size else np.zeros(0)
+    return np.where(lengths > 0, sums, 0.0)
+
+def pack_traces(traces: List[List[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    lengths = np.fromiter((len(t) for t in traces), dtype=np.intp, count=len(traces))
+    flat = np.fromiter(chain.from_iterable(traces), dtype=float, count=int(lengths.sum()))
+    return flat, lengths
+
+def usage_entropy(flat: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    total = segment_sums(flat, lengths)
+    positive = total > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prob = flat / np.repeat(np.where(positive, total, 1.0), lengths)
+        ent = segment_sums(entr(prob), lengths)
+    return np.where(positive, ent, np.log(np.maximum(lengths, 1)))
+
+def usage_sums(flat: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Sufficient statistics of a trace: sample count, sum S and sum x log x (T).
+    # They add up across appended samples, and the entropy is log S - T / S.
+    if (flat < 0).any():
+        raise ValueError("Incremental usage samples must be non-negative.")
+    return lengths.astype(float), segment_sums(flat, lengths), -segment_sums(entr(flat), lengths)
+
+def sums_entropy(count: np.ndarray, total: np.ndarray, xlogx: np.ndarray) -> np.ndarray:
+    positive = total > 0
+    safe = np.where(positive, total, 1.0)
+    return np.where(positive, np.log(safe) - xlogx / safe, np.log(np.maximum(count, 1.0)))
+
+def append_usage(session_id: str, candidates: List[str], usage_trace: Dict[str, List[float]]) -> int:
+    flat, lengths = pack_traces([usage_trace[c] for c in candidates])
+    trace_store.append(session_id, candidates, np.column_stack(usage_sums(flat, lengths)))
+    return int(lengths.sum())
+
+def candidate_entropies(
+    candidates: List[str],
+    usage_trace: Dict[str, List[float]],
+    usage_stats: Optional[Dict[str, Dict[str, float]]] = None,
+    incremental: bool = False,
+    session_id: Optional[str] = None
+) -> Tuple[np.ndarray, Optional[Dict[str, Dict[str, float]]]]:
+    # Full traces: one flat array and one segmented reduction for all candidates. Incremental:
+    # usage_trace holds only new samples, added to the running sums in usage_stats; the
+    # updated sums are returned alongside. Session: new samples are added to the sums held
+    # by the trace store. A candidate without samples scores like [1.0].
+    if session_id is not None:
+        if incremental:
+            raise ValueError("Use either session_id or incremental usage_stats, not both.")
+        if usage_trace:
+            append_usage(session_id, list(usage_trace), usage_trace)
+        return sums_entropy(*trace_store.sums(session_id, candidates)), None
+    if not incremental:
+        flat, lengths = pack_traces([usage_trace.get(c, [1.0]) for c in candidates])
+        return usage_entropy(flat, lengths), None
+    prior = usage_stats or {}
+    previous = np.array([
+        [prior[c]["count"], prior[c]["total"], prior[c]["xlogx"]] if c in prior else [0.0, 0.0, 0.0]
+        for c in candidates
+    ], dtype=float).reshape(len(candidates), 3)
+    flat, lengths = pack_traces([usage_trace.get(c, []) for c in candidates])
+    count, total, xlogx = (previous[:, i] + delta for i, delta in enumerate(usage_sums(flat, lengths)))
+    updated = {
+        c: {"count": int(n), "total": t, "xlogx": x}
+        for c, n, t, x in zip(candidates, count.tolist(), total.tolist(), xlogx.tolist())
+    }
+    return sums_entropy(count, total, xlogx), {**prior, **updated}
 
 class EfficiencyRanker:
     def __init__(self):
@@ -13,18 +90,21 @@ class EfficiencyRanker:
         self,
         candidate_set: List[str],
         usage_trace: Dict[str, List[float]],
-        payoff_vector: Dict[str, float]
+        payoff_vector: Dict[str, float],
+        top_k: Optional[int] = None,
+        usage_stats: Optional[Dict[str, Dict[str, float]]] = None,
+        incremental: bool = False,
+        session_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        efficiency_scores = {}
-        for candidate in candidate_set:
-            usage = np.array(usage_trace.get(candidate, [1.0]))
-            prob_usage = usage / usage.sum() if usage.sum() > 0 else np.ones_like(usage) / len(usage)
-            ent = entropy(prob_usage)
-            payoff = payoff_vector.get(candidate, 0.0)
-            denom = max(float(ent), 1e-3)
-            efficiency_scores[candidate] = payoff / denom
-
-        ranked_list = sorted(efficiency_scores, key=lambda x: efficiency_scores[x], reverse=True)
+        candidates = list(dict.fromkeys(candidate_set))
+        ent, stats = candidate_entropies(candidates, usage_trace, usage_stats, incremental, session_id)
+        payoffs = np.array([payoff_vector.get(c, 0.0) for c in candidates], dtype=float)
+        scores = payoffs / np.maximum(ent, 1e-3)
+        efficiency_scores = dict(zip(candidates, scores.tolist()))
+
+        ranked_list = [candidates[i] for i in top_k_indices(scores, top_k)]
+        if top_k is not None:
+            efficiency_scores = {c: efficiency_scores[c] for c in ranked_list}
         preferred_variant = ranked_list[0] if ranked_list else None
 
         self.ranked_list = ranked_list
@@ -33,20 +113,105 @@ class EfficiencyRanker:
         return {
             "RankedList": ranked_list,
             "PreferredVariant": preferred_variant,
-            "EfficiencyScores": {k: float(v) for k,v in efficiency_scores.items()}
+            "EfficiencyScores": efficiency_scores,
+            "UsageStats": stats
         }
 
+@service_weight(LIGHT)
 def efficiency_ranking_service(request: EfficiencyRankingRequest) -> EfficiencyRankingResponse:
     ranker = EfficiencyRanker()
     result = ranker.efficiencyRanking(
         candidate_set=request.candidate_set,
         usage_trace=request.usage_trace,
-        payoff_vector=request.payoff_vector
+        payoff_vector=request.payoff_vector,
+        top_k=request.top_k,
+        usage_stats={c: stats.model_dump() for c, stats in (request.usage_stats or {}).items()},
+        incremental=request.incremental,
+        session_id=request.session_id
     )
 
-    print(f"Efficiency Ranking: {result}")
+    log_result("efficiency_ranking", result, candidates=len(request.candidate_set))
+    # usage_stats is only set (and rendered) for incremental requests
+    extra = {"usage_stats": result["UsageStats"]} if request.incremental else {}
     return EfficiencyRankingResponse(
         ranked_list=result["RankedList"],
         preferred_variant=result["PreferredVariant"],
-        efficiency_scores=result["EfficiencyScores"]
+        efficiency_scores=result["EfficiencyScores"],
+        **extra
     )
+
+@service_weight(LIGHT)
+def efficiency_ranking_array_service(
+    payoffs: np.ndarray,
+    usage_values: np.ndarray,
+    usage_lengths: np.ndarray,
+    top_k: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    lengths = np.asarray(usage_lengths, dtype=np.intp)
+    if lengths.size != payoffs.size or lengths.sum() != usage_values.size:
+        raise ValueError("usage trace lengths must match the candidates and the flat usage values")
+    scores = payoffs / np.maximum(usage_entropy(np.asarray(usage_values, dtype=float), lengths), 1e-3)
+    order = top_k_indices(scores, top_k)
+    log_result("efficiency_ranking_arrays", scores, candidates=payoffs.size, usage_values=lengths.sum())
+    return {"order": order, "efficiency_score": scores[order]}
+
+STREAM_FIELDS = ("efficiency_score", "entropy", "payoff")
+
+@service_weight(LIGHT)
+def efficiency_ranking_stream_service(request: EfficiencyRankingRequest) -> Dict[str, Any]:
+    fields = select_fields(request.fields, STREAM_FIELDS)
+    if request.incremental:
+        raise ValueError("ndjson responses do not carry usage_stats; use format 'json' for incremental traces.")
+    # scores are keyed by candidate, so a repeated candidate is ranked once
+    candidates = list(dict.fromkeys(request.candidate_set))
+    ent, _ = candidate_entropies(candidates, request.usage_trace, session_id=request.session_id)
+    payoffs = np.array([request.payoff_vector.get(c, 0.0) for c in candidates], dtype=float)
+    scores = payoffs / np.maximum(ent, 1e-3)
+    order = top_k_indices(scores, request.top_k)
+    columns = {"efficiency_score": scores[order], "entropy": ent[order], "payoff": payoffs[order]}
+    log_result("efficiency_ranking_stream", scores, candidates=len(candidates))
+    return {
+        "ids": [candidates[i] for i in order],
+        "columns": {f: columns[f] for f in fields},
+        "summary": {"preferred_variant": candidates[order[0]] if order.size else None, "count": len(order)}
+    }
+
+def efficiency_ranking_batch_key(request: EfficiencyRankingRequest) -> Optional[Hashable]:
+    if request.incremental or request.session_id is not None or len(set(request.candidate_set)) != len(request.candidate_set):
+        return None
+    return (len(request.candidate_set), request.top_k)
+
+def efficiency_ranking_kernel(requests: List[EfficiencyRankingRequest]) -> List[EfficiencyRankingResponse]:
+    B, n = len(requests), len(requests[0].candidate_set)
+    traces = [r.usage_trace.get(c, [1.0]) for r in requests for c in r.candidate_set]
+    flat, lengths = pack_traces(traces)
+    ent = usage_entropy(flat, lengths).reshape(B, n)
+    payoffs = np.array([[r.payoff_vector.get(c, 0.0) for c in r.candidate_set] for r in requests], dtype=float).reshape(B, n)
+    scores = payoffs / np.maximum(ent, 1e-3)
+    top_k = requests[0].top_k
+
+    responses = []
+    for b, r in enumerate(requests):
+        order = top_k_indices(scores[b], top_k)
+        ranked_list = [r.candidate_set[i] for i in order]
+        kept = order if top_k is not None else np.arange(n)
+        responses.append(EfficiencyRankingResponse(
+            ranked_list=ranked_list,
+            preferred_variant=ranked_list[0] if ranked_list else None,
+            efficiency_scores=dict(zip([r.candidate_set[i] for i in kept], scores[b, kept].tolist()))
+        ))
+    return responses
+
+@service_weight(LIGHT)
+def usage_append_service(session_id: str, request: UsageAppendRequest) -> UsageAppendResponse:
+    candidates = list(request.usage_trace)
+    samples = append_usage(session_id, candidates, request.usage_trace)
+    log_result("efficiency_usage_append", samples, candidates=len(candidates), samples=samples)
+    return UsageAppendResponse(session_id=session_id, candidates=len(candidates), samples=samples)
+
+# Sessions live in the serving process, so batches that use them are not sent to the pool.
+@service_weight(lambda request: LIGHT if any(item.session_id is not None for item in request.items) else HEAVY)
+def efficiency_ranking_batch_service(request: EfficiencyRankingBatchRequest) -> EfficiencyRankingBatchResponse:
+    outcomes = run_batch(request.items, efficiency_ranking_batch_key, efficiency_ranking_kernel, efficiency_ranking_service)
+    log_result("efficiency_ranking_batch", outcomes, items=len(outcomes), errors=sum(e is not None for _, e in outcomes))
+    return EfficiencyRankingBatchResponse(results=batch_items(outcomes, EfficiencyRankingBatchItem))
@@ -1,47 +1,139 @@
-from models.incentive_alignment_model import IncentiveAlignmentRequest, IncentiveAlignmentResponse
+from models.incentive_alignment_model import IncentiveAlignmentRequest, IncentiveAlignmentResponse, IncentiveAlignmentBatchRequest, IncentiveAlignmentBatchResponse, IncentiveAlignmentBatchItem
+from services.batching import run_batch, batch_items
+from core.execution import service_weight, LIGHT, HEAVY
+from core.metrics import stage
+from core.structured_logging import log_result
 import numpy as np
 import cvxpy as cp
-from typing import List, Dict, Any
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Hashable
+
+class IncentiveProblem:
+    def __init__(self, n: int, with_target: bool, with_entropy: bool):
+        self.payoffs = cp.Parameter(n)
+        self.caps = cp.Parameter(n, nonneg=True)
+        self.target = cp.Parameter()
+        self.entropy_reg = cp.Parameter(nonneg=True)
+        self.x = cp.Variable(n)
+
+        objective = self.payoffs @ self.x
+        if with_entropy:
+            objective = objective + self.entropy_reg * cp.sum(cp.entr(self.x))
+
+        constraints = [
+            self.x >= 0,
+            self.x <= self.caps,
+            cp.sum(self.x) == 1
+        ]
+        if with_target:
+            constraints.append(self.payoffs @ self.x >= self.target)
+
+        self.solver = cp.CLARABEL if with_entropy else cp.HIGHS
+        self.problem = cp.Problem(cp.Maximize(objective), constraints)
+        self.lock = threading.Lock()
+
+    def solve(self, payoffs: np.ndarray, caps: np.ndarray, target: float, entropy_reg: float) -> Optional[np.ndarray]:
+        with self.lock:
+            self.payoffs.value = payoffs
+            self.caps.value = caps
+            self.target.value = target
+            self.entropy_reg.value = entropy_reg
+            with stage("solve", solver=self.solver.lower()):
+                try:
+                    self.problem.solve(solver=self.solver, warm_start=True)
+                except cp.SolverError:
+                    return None
+            if self.problem.status not in (cp.OPTIMAL, cp.OPTIMAL_INACCURATE):
+                return None
+            return np.array(self.x.value, dtype=float)
 
 class IncentiveAgent:
+    # Parameterized problems are cached by choice-set size (and formulation), so
+    # repeated calls only update parameter values instead of re-canonicalizing.
+    max_cached_problems = 32
+    _problems: "OrderedDict[Tuple[int, bool, bool], IncentiveProblem]" = OrderedDict()
+    _problems_lock = threading.Lock()
+
     def __init__(self):
         self.updated_strategy: Dict[str, float] = {}
         self.expected_payoff: float = 0.0
 
+    @classmethod
+    def getProblem(cls, n: int, with_target: bool, with_entropy: bool) -> IncentiveProblem:
+        key = (n, with_target, with_entropy)
+        with cls._problems_lock:
+            problem = cls._problems.get(key)
+            if problem is None:
+                problem = IncentiveProblem(n, with_target, with_entropy)
+                cls._problems[key] = problem
+                while len(cls._problems) > cls.max_cached_problems:
+                    cls._problems.popitem(last=False)
+            else:
+                cls._problems.move_to_end(key)
+            return problem
+
+    def analyticStrategy(self, payoffs: np.ndarray) -> np.ndarray:
+        # max p @ x over the simplex is attained at the vertex of the best payoff
+        strategy = np.zeros(payoffs.size)
+        if payoffs.size:
+            strategy[int(np.argmax(payoffs))] = 1.0
+        return strategy
+
+    def cvxpyStrategy(
+        self,
+        payoffs: np.ndarray,
+        caps: np.ndarray,
+        global_target: Optional[float],
+        epsilon: float,
+        entropy_reg: float
+    ) -> np.ndarray:
+        n = payoffs.size
+        with_entropy = entropy_reg > 0
+        target = 0.0 if global_target is None else global_target - epsilon
+        if caps.sum() < 1.0 - 1e-9:
+            raise ValueError(f"Infeasible choice_caps: they sum to {caps.sum():g}, but the strategy weights must sum to 1.")
+
+        raw_strategy = None
+        if global_target is not None:
+            raw_strategy = self.getProblem(n, True, with_entropy).solve(payoffs, caps, target, entropy_reg)
+        if raw_strategy is None:
+            raw_strategy = self.getProblem(n, False, with_entropy).solve(payoffs, caps, target, entropy_reg)
+        if raw_strategy is None:
+            raise ValueError("Incentive alignment problem is infeasible (choice_caps must allow a total weight of 1).")
+
+        raw_strategy = np.clip(raw_strategy, 0.0, None)
+        if raw_strategy.sum() > 0:
+            return raw_strategy / raw_strategy.sum()
+        return np.ones(n) / n
+
     def incentiveAlignment(
         self,
         choice_set: List[str],
         payoff_matrix: Dict[str, float],
         global_target: float = None,
-        epsilon: float = 1e-3
+        epsilon: float = 1e-3,
+        solver: str = "analytic",
+        entropy_reg: float = 0.0,
+        choice_caps: Optional[Dict[str, float]] = None
     ) -> Dict[str, Any]:
         n = len(choice_set)
-        x = cp.Variable(n)  # decision variables for each choice
-        payoffs = np.array([payoff_matrix.get(c, 0.0) for c in choice_set])
-
-        objective = cp.Maximize(payoffs @ x)
-
-        constraints = [
-            x >= 0,
-            cp.sum(x) == 1
-        ]
-
-        if global_target is not None:
-            constraints.append(payoffs @ x >= global_target - epsilon)
+        payoffs = np.array([payoff_matrix.get(c, 0.0) for c in choice_set], dtype=float)
 
-        prob = cp.Problem(objective, constraints)
-        prob.solve(solver=cp.SCS)
+        if solver not in ("analytic", "cvxpy"):
+            raise ValueError("Unknown solver. Use 'analytic' or 'cvxpy'.")
 
-        raw_strategy = np.array([float(x.value[i]) for i in range(n)])
-        raw_strategy = np.clip(raw_strategy, 0.0, None)
-        if raw_strategy.sum() > 0:
-            normalized_strategy = raw_strategy / raw_strategy.sum()
+        if n == 0:
+            strategy = np.zeros(0)
+        elif solver == "analytic" and entropy_reg <= 0 and not choice_caps:
+            strategy = self.analyticStrategy(payoffs)
         else:
-            normalized_strategy = np.ones(n) / n
+            caps = np.array([(choice_caps or {}).get(c, 1.0) for c in choice_set], dtype=float)
+            strategy = self.cvxpyStrategy(payoffs, caps, global_target, epsilon, entropy_reg)
 
-        expected_payoff = float(payoffs @ normalized_strategy)
+        expected_payoff = float(payoffs @ strategy)
 
-        self.updated_strategy = {choice_set[i]: float(normalized_strategy[i]) for i in range(n)}
+        self.updated_strategy = dict(zip(choice_set, strategy.tolist()))
         self.expected_payoff = expected_payoff
 
         return {
@@ -50,18 +142,51 @@ class IncentiveAgent:
             "TargetSatisfied": global_target is None or expected_payoff >= global_target - epsilon
         }
 
+@service_weight(lambda request: HEAVY if request.solver == "cvxpy" or request.entropy_reg > 0 or request.choice_caps else LIGHT)
 def incentive_alignment_service(request: IncentiveAlignmentRequest) -> IncentiveAlignmentResponse:
     agent = IncentiveAgent()
     result = agent.incentiveAlignment(
         choice_set=request.choice_set,
         payoff_matrix=request.payoff_matrix,
         global_target=request.global_target,
-        epsilon=request.epsilon
+        epsilon=request.epsilon,
+        solver=request.solver,
+        entropy_reg=request.entropy_reg,
+        choice_caps=request.choice_caps
     )
 
-    print(f"Incentive Alignment: {result}")
+    log_result("incentive_alignment", result, choices=len(request.choice_set))
     return IncentiveAlignmentResponse(
         updated_strategy=result["UpdatedStrategy"],
         expected_payoff=result["ExpectedPayoff"],
         target_satisfied=result["TargetSatisfied"]
     )
+
+def incentive_alignment_batch_key(request: IncentiveAlignmentRequest) -> Optional[Hashable]:
+    if request.solver != "analytic" or request.entropy_reg > 0 or request.choice_caps or not request.choice_set:
+        return None
+    return len(request.choice_set)
+
+def incentive_alignment_kernel(requests: List[IncentiveAlignmentRequest]) -> List[IncentiveAlignmentResponse]:
+    B, n = len(requests), len(requests[0].choice_set)
+    payoffs = np.array([[r.payoff_matrix.get(c, 0.0) for c in r.choice_set] for r in requests], dtype=float)
+    best = np.argmax(payoffs, axis=1)
+    strategy = np.zeros((B, n))
+    strategy[np.arange(B), best] = 1.0
+    expected = payoffs[np.arange(B), best]
+
+    responses = []
+    for b, r in enumerate(requests):
+        expected_payoff = float(expected[b])
+        responses.append(IncentiveAlignmentResponse(
+            updated_strategy=dict(zip(r.choice_set, strategy[b].tolist())),
+            expected_payoff=expected_payoff,
+            target_satisfied=r.global_target is None or expected_payoff >= r.global_target - r.epsilon
+        ))
+    return responses
+
+@service_weight(HEAVY)
+def incentive_alignment_batch_service(request: IncentiveAlignmentBatchRequest) -> IncentiveAlignmentBatchResponse:
+    outcomes = run_batch(request.items, incentive_alignment_batch_key, incentive_alignment_kernel, incentive_alignment_service)
+    log_result("incentive_alignment_batch", outcomes, items=len(outcomes), errors=sum(e is not None for _, e in outcomes))
+    return IncentiveAlignmentBatchResponse(results=batch_items(outcomes, IncentiveAlignmentBatchItem))
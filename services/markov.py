@@ -0,0 +1,348 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import spsolve
+
+from core.metrics import stage
+
+TransitionMatrix = Union[np.ndarray, sp.spmatrix, sp.sparray]
+
+# Chains up to this many states are cheap enough to solve on the request thread.
+INLINE_MAX_STATES = int(os.getenv("ECONOMICS_MARKOV_INLINE_MAX_STATES", "512"))
+SPARSE_DIRECT_MAX_STATES = 50_000
+POWER_ITERATION_TOL = 1e-12
+POWER_ITERATION_MAX_ITER = 100_000
+# Chains up to this size use (cached) matrix powers for finite horizons.
+POWER_MAX_STATES = int(os.getenv("ECONOMICS_MARKOV_POWER_MAX_STATES", "512"))
+# Larger chains step a vector through the horizon; this bounds the stored entries it may
+# touch before giving up on a chain whose distribution has not settled.
+HORIZON_MAX_WORK = int(os.getenv("ECONOMICS_MARKOV_HORIZON_MAX_WORK", "2000000000"))
+# Finite-horizon requests estimated above this much work (see horizon_work) leave the request thread.
+HORIZON_INLINE_WORK = int(os.getenv("ECONOMICS_MARKOV_HORIZON_INLINE_WORK", "20000000"))
+
+class ArrayCache:
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            pi = self._entries.get(key)
+            if pi is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pi
+
+    def put(self, key: str, pi: np.ndarray) -> np.ndarray:
+        pi = np.array(pi, dtype=float)
+        pi.setflags(write=False)
+        if self.max_entries <= 0 or pi.nbytes > self.max_bytes:
+            return pi
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._entries[key] = pi
+            self.nbytes += pi.nbytes
+            while self._entries and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return pi
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes
+            }
+
+stationary_cache = ArrayCache(
+    max_entries=int(os.getenv("ECONOMICS_MARKOV_CACHE_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("ECONOMICS_MARKOV_CACHE_BYTES", str(64 * 1024 * 1024)))
+)
+
+# Per chain: the doubling table of horizon_distribution (see power_table).
+power_cache = ArrayCache(
+    max_entries=int(os.getenv("ECONOMICS_MARKOV_POWER_CACHE_ENTRIES", "64")),
+    max_bytes=int(os.getenv("ECONOMICS_MARKOV_POWER_CACHE_BYTES", str(128 * 1024 * 1024)))
+)
+
+def cache_stats() -> Dict[str, Any]:
+    return {**stationary_cache.stats(), "powers": power_cache.stats()}
+
+def sparse_matrix(shape, rows, cols, values) -> sp.csr_matrix:
+    return sp.csr_matrix((np.asarray(values, dtype=float), (np.asarray(rows), np.asarray(cols))), shape=tuple(shape))
+
+def as_transition_matrix(P: TransitionMatrix) -> TransitionMatrix:
+    if sp.issparse(P):
+        P = sp.csr_matrix(P, dtype=float)
+        P.sum_duplicates()
+        P.sort_indices()
+        return P
+    return np.ascontiguousarray(P, dtype=float)
+
+def matrix_key(P: TransitionMatrix) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr(P.shape).encode())
+    if sp.issparse(P):
+        digest.update(b"csr")
+        for part in (P.indptr, P.indices, P.data):
+            digest.update(np.ascontiguousarray(part).tobytes())
+    else:
+        digest.update(b"dense")
+        digest.update(P.tobytes())
+    return digest.hexdigest()
+
+def validate_stochastic(P: TransitionMatrix) -> None:
+    if P.ndim < 2 or P.shape[-1] != P.shape[-2]:
+        raise ValueError("P must be a square matrix")
+    if sp.issparse(P):
+        negative = P.data.size and P.data.min() < 0
+        row_sums = np.asarray(P.sum(axis=1)).ravel()
+    else:
+        negative = np.any(P < 0)
+        row_sums = P.sum(axis=-1)
+    if negative or not np.allclose(row_sums, 1.0):
+        raise ValueError("P must be nonnegative with rows summing to 1")
+
+def is_irreducible(P: TransitionMatrix) -> bool:
+    n_components, _ = connected_components(sp.csr_matrix(P), directed=True, connection="strong")
+    return n_components == 1
+
+def solve_irreducible(P: TransitionMatrix) -> np.ndarray:
+    # pi (P - I) = 0 with the last balance equation replaced by sum(pi) = 1.
+    n = P.shape[0]
+    b = np.zeros(n)
+    b[-1] = 1.0
+    if not sp.issparse(P):
+        A = P.T - np.eye(n)
+        A[-1, :] = 1.0
+        return np.linalg.solve(A, b)
+    if n <= SPARSE_DIRECT_MAX_STATES:
+        # Fixing the last state's mass and dropping its balance equation keeps the system
+        # sparse (a row of ones would fill in the LU factors).
+        if n == 1:
+            return np.ones(1)
+        A = (P.T - sp.identity(n, format="csr")).tocsc()
+        x = spsolve(A[:-1, :-1], -A[:-1, [-1]].toarray().ravel())
+        pi = np.append(x, 1.0)
+        return pi / pi.sum()
+    return power_iteration(P)
+
+def power_iteration(P: TransitionMatrix) -> np.ndarray:
+    # Iterate on the lazy chain (P + I) / 2: same stationary distribution, but aperiodic.
+    n = P.shape[0]
+    PT = P.T.tocsr() if sp.issparse(P) else P.T
+    pi = np.full(n, 1.0 / n)
+    for _ in range(POWER_ITERATION_MAX_ITER):
+        nxt = 0.5 * (pi + PT @ pi)
+        nxt /= nxt.sum()
+        if np.abs(nxt - pi).sum() < POWER_ITERATION_TOL:
+            return nxt
+        pi = nxt
+    return pi
+
+def irreducible_method(P: TransitionMatrix) -> str:
+    if not sp.issparse(P):
+        return "dense"
+    return "sparse_lu" if P.shape[0] <= SPARSE_DIRECT_MAX_STATES else "power_iteration"
+
+def reducible_stationary(P: TransitionMatrix) -> np.ndarray:
+    # A reducible chain has one stationary distribution per recurrent class (a strongly
+    # connected component with no edges leaving it). Keep the choice quantecon made: the class
+    # with the lowest component label, solved on its own block and zero elsewhere.
+    graph = sp.csr_matrix(P)
+    graph.eliminate_zeros()
+    _, labels = connected_components(graph, directed=True, connection="strong")
+    coo = graph.tocoo()
+    leaving = labels[coo.row] != labels[coo.col]
+    sinks = np.setdiff1d(np.unique(labels), labels[coo.row[leaving]])
+    states = np.flatnonzero(labels == sinks[0])
+    block = P[states][:, states]
+    pi = np.zeros(P.shape[0])
+    pi[states] = solve_irreducible(block)
+    return pi
+
+def solve_stationary(P: TransitionMatrix) -> np.ndarray:
+    validate_stochastic(P)
+    if P.shape[0] > 0 and is_irreducible(P):
+        with stage("stationary_solve", solver=irreducible_method(P)):
+            return solve_irreducible(P)
+    # Reducible chains may have several recurrent classes; keep the first.
+    with stage("stationary_solve", solver="recurrent_class"):
+        return reducible_stationary(P)
+
+def stationary_distribution(P: TransitionMatrix) -> np.ndarray:
+    P = as_transition_matrix(P)
+    key = matrix_key(P)
+    pi = stationary_cache.get(key)
+    if pi is None:
+        pi = stationary_cache.put(key, solve_stationary(P))
+    return pi
+
+def stationary_distributions_batch(P: np.ndarray, tol: float = 1e-9) -> np.ndarray:
+    # Solve pi (P - I) = 0, sum(pi) = 1 for a stack of chains at once. The system is
+    # nonsingular exactly when the stationary distribution is unique; chains with
+    # several recurrent classes fall back to reducible_stationary, which returns the first one.
+    P = np.ascontiguousarray(P, dtype=float)
+    validate_stochastic(P)
+    B, n, _ = P.shape
+    keys = [matrix_key(P[k]) for k in range(B)]
+    pi = np.full((B, n), np.nan)
+    missing = []
+    for k, key in enumerate(keys):
+        cached = stationary_cache.get(key)
+        if cached is None:
+            missing.append(k)
+        else:
+            pi[k] = cached
+    if not missing:
+        return pi
+
+    Pm = P[missing]
+    A = np.swapaxes(Pm, -1, -2) - np.eye(n)
+    A[:, -1, :] = 1.0
+    b = np.zeros((len(missing), n, 1))
+    b[:, -1, 0] = 1.0
+
+    solved = np.full((len(missing), n), np.nan)
+    with stage("stationary_solve", solver="dense_batched"):
+        try:
+            solved[:] = np.linalg.solve(A, b)[..., 0]
+        except np.linalg.LinAlgError:
+            for k in range(len(missing)):
+                try:
+                    solved[k] = np.linalg.solve(A[k], b[k])[:, 0]
+                except np.linalg.LinAlgError:
+                    continue
+
+    residual = np.abs(np.einsum("bi,bij->bj", solved, Pm) - solved).max(axis=-1, initial=0.0)
+    invalid = ~np.isfinite(solved).all(axis=-1) | (solved.min(axis=-1, initial=0.0) < -tol) | (residual > 1e-8)
+    for k in np.flatnonzero(invalid):
+        with stage("stationary_solve", solver="recurrent_class"):
+            solved[k] = reducible_stationary(Pm[k])
+
+    for k, row in zip(missing, solved):
+        pi[k] = stationary_cache.put(keys[k], row)
+    return pi
+
+def initial_distribution(choice_set: List[str], weights: Optional[Dict[str, float]], horizon: Optional[int]) -> Optional[np.ndarray]:
+    # Start weights keyed by choice, normalized; choices left out start with none.
+    if weights is None:
+        return None
+    if horizon is None:
+        raise ValueError("initial_distribution needs a horizon; without one the stationary distribution is used.")
+    index = {c: i for i, c in enumerate(choice_set)}
+    unknown = [c for c in weights if c not in index]
+    if unknown:
+        raise ValueError(f"initial_distribution has choices not in choice_set: {unknown[:10]}")
+    mu = np.zeros(len(choice_set))
+    for c, w in weights.items():
+        mu[index[c]] = w
+    if (mu < 0).any() or mu.sum() <= 0:
+        raise ValueError("initial_distribution must be nonnegative with a positive total.")
+    return mu / mu.sum()
+
+def power_levels(P: np.ndarray, rows: List[np.ndarray], levels: int) -> Iterator[np.ndarray]:
+    # [A_k, S_k] for k < levels: A_k = P^(2^k) and S_k = I + P + ... + P^(2^k - 1), by
+    # repeated squaring (S_{k+1} = S_k + S_k A_k), continuing from the given first rows.
+    yield from rows[:levels]
+    A, S = rows[-1] if rows else (P, np.eye(P.shape[0]))
+    if not rows:
+        yield np.stack((A, S))
+    for _ in range(max(len(rows), 1), levels):
+        A, S = A @ A, S + S @ A
+        yield np.stack((A, S))
+
+def power_table(P: np.ndarray, key: str, table: Optional[np.ndarray], levels: int) -> np.ndarray:
+    # levels x 2 x n x n table of power_levels. Longer horizons extend the cached table.
+    if table is not None and table.shape[0] >= levels:
+        return table
+    return power_cache.put(key, np.stack(list(power_levels(P, list(table) if table is not None else [], levels))))
+
+def horizon_work(n: int, nnz: int, horizon: int) -> int:
+    # Rough multiply-add count of horizon_distribution for a chain of n states with nnz
+    # stored entries, without a cached table: log T dense squarings for small chains, at
+    # most T vector-matrix products for the rest.
+    if n <= POWER_MAX_STATES and horizon > n:
+        return 2 * horizon.bit_length() * n ** 3
+    return min(horizon, HORIZON_MAX_WORK // max(nnz + n, 1)) * (nnz + n)
+
+def chain_is_heavy(n: int, nnz: int, horizon: Optional[int]) -> bool:
+    # Weight rule shared by the Markov-weighted services.
+    return n > INLINE_MAX_STATES or (horizon is not None and horizon_work(n, nnz, horizon) > HORIZON_INLINE_WORK)
+
+def horizon_distribution(P: TransitionMatrix, initial: Optional[np.ndarray], horizon: int) -> np.ndarray:
+    # Mean state distribution over steps 0 .. horizon - 1 of a chain started from `initial`
+    # (uniform by default), i.e. the expected share of the horizon spent in each state.
+    # Chains up to POWER_MAX_STATES combine the matrix powers for the set bits of the
+    # horizon (O(n^3 log T), O(n^2 log T) once cached). Other chains, and short horizons on
+    # a chain with no table yet, step the distribution one product at a time; once it stops
+    # changing (as in power_iteration) the remaining steps are added at once.
+    P = as_transition_matrix(P)
+    validate_stochastic(P)
+    n = P.shape[0]
+    if horizon < 1:
+        raise ValueError("horizon must be positive.")
+    x = np.full(n, 1.0 / n) if initial is None else np.asarray(initial, dtype=float)
+    if x.size != n:
+        raise ValueError("initial_distribution needs a transition matrix with one state per choice.")
+    occupancy = np.zeros(n)
+    levels = horizon.bit_length()
+    if n <= POWER_MAX_STATES:
+        dense = P.toarray() if sp.issparse(P) else P
+        key = matrix_key(P)
+        cached = power_cache.get(key)
+        if (cached is not None and cached.shape[0] >= levels) or horizon > n:
+            with stage("horizon_solve", solver="matrix_powers"):
+                # a table too large to cache is streamed level by level instead of stored
+                if levels * 2 * n * n * 8 <= power_cache.max_bytes:
+                    table = power_table(dense, key, cached, levels)
+                else:
+                    table = power_levels(dense, [] if cached is None else list(cached), levels)
+                for k, (A, S) in enumerate(table):
+                    if horizon >> k & 1:
+                        occupancy += x @ S
+                        x = x @ A
+            return occupancy / horizon
+    PT = P.T.tocsr() if sp.issparse(P) else P.T
+    steps = HORIZON_MAX_WORK // max((P.nnz if sp.issparse(P) else P.size) + n, 1)
+    with stage("horizon_solve", solver="vector_products"):
+        for t in range(horizon):
+            occupancy += x
+            if t + 1 == horizon:
+                break
+            if t >= steps:
+                raise ValueError(f"The chain's distribution has not settled after {steps} steps; use a shorter horizon.")
+            step = PT @ x
+            settled = np.abs(step - x).sum() < POWER_ITERATION_TOL
+            x = step
+            if settled:
+                occupancy += (horizon - t - 1) * x
+                break
+    return occupancy / horizon
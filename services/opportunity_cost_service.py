@@ -1,17 +1,34 @@
-from models.opportunity_cost_model import OpportunityCostRequest, OpportunityCostResponse
+from models.opportunity_cost_model import OpportunityCostRequest, OpportunityCostResponse, OpportunityCostBatchRequest, OpportunityCostBatchResponse, OpportunityCostBatchItem
+from services.batching import run_batch, batch_items
+from core.execution import service_weight, LIGHT, HEAVY
+from core.metrics import stage
+from core.structured_logging import log_result
+from services.selection import top_k_indices
+from services.markov import TransitionMatrix, stationary_distribution, stationary_distributions_batch, horizon_distribution, initial_distribution, sparse_matrix, chain_is_heavy
 import numpy as np
-import quantecon as qe
-from typing import List, Dict, Any
+import scipy.sparse as sp
+from typing import List, Dict, Any, Optional, Hashable
 
 class CognitiveAgent:
     def __init__(self):
         self.trade_off_profile: Dict[str, Dict[str, float]] = {}
 
-    def expectedPayoffsMarkov(self, choice_set: List[str], payoff_matrix: Dict[str, float], P: np.ndarray) -> np.ndarray:
+    def expectedPayoffsMarkov(
+        self,
+        choice_set: List[str],
+        payoff_matrix: Dict[str, float],
+        P: TransitionMatrix,
+        horizon: Optional[int] = None,
+        initial: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         n = len(choice_set)
         v = np.array([payoff_matrix.get(choice, 0.0) for choice in choice_set])
-        mc = qe.MarkovChain(P)
-        pi = np.array(mc.stationary_distributions[0]).flatten()
+        if horizon is not None:
+            with stage("horizon"):
+                pi = horizon_distribution(P, initial, horizon)
+        else:
+            with stage("stationary"):
+                pi = stationary_distribution(P)
 
         if pi.size != n:
             pi = np.full(n, 1/n)
@@ -19,35 +36,193 @@ class CognitiveAgent:
         expected_v = v * pi
         return expected_v
 
-    def opportunityCost(self, choice_set: List[str], payoff_matrix: Dict[str, float], P: np.ndarray = None) -> Dict[str, Dict[str, float]]:
+    def expectedPayoffs(
+        self,
+        choice_set: List[str],
+        payoff_matrix: Dict[str, float],
+        P: Optional[TransitionMatrix] = None,
+        horizon: Optional[int] = None,
+        initial: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         n = len(choice_set)
-        payoffs = self.expectedPayoffsMarkov(choice_set, payoff_matrix, P) if P is not None else np.array([payoff_matrix.get(choice, 0.0) for choice in choice_set])
-        payoffs = np.array(payoffs).flatten()
+        payoffs = self.expectedPayoffsMarkov(choice_set, payoff_matrix, P, horizon, initial) if P is not None else np.array([payoff_matrix.get(choice, 0.0) for choice in choice_set])
+        payoffs = np.array(payoffs, dtype=float).flatten()
 
         if payoffs.size != n:
             payoffs = np.full(n, payoffs[0] if payoffs.size == 1 else np.mean(payoffs))
+        return payoffs
 
-        trade_off = np.zeros((n, n))
-        for i in range(n):
-            for j in range(n):
-                if i != j:
-                    trade_off[i, j] = payoffs[j] - payoffs[i]
+    def rowIndices(self, choice_set: List[str], rows: Optional[List[str]] = None) -> np.ndarray:
+        if rows is None:
+            return np.arange(len(choice_set))
+        index = {c: i for i, c in enumerate(choice_set)}
+        unknown = [r for r in rows if r not in index]
+        if unknown:
+            raise ValueError(f"Unknown rows: {unknown[:10]}")
+        return np.array([index[r] for r in rows], dtype=np.intp)
 
+    def tradeOffMatrix(self, payoffs: np.ndarray, row_idx: np.ndarray) -> np.ndarray:
+        # trade_off[i, j] = payoff_j - payoff_i; the diagonal is not part of the profile
+        return payoffs[None, :] - payoffs[row_idx, None]
+
+    def topAlternatives(self, payoffs: np.ndarray, row_idx: np.ndarray, top_k: int) -> List[List[int]]:
+        # The best alternatives are the same for every row (highest payoffs), minus the
+        # row itself, so one partial selection of k + 1 candidates serves all rows.
+        if top_k <= 0:
+            return [[] for _ in row_idx]
+        candidates = top_k_indices(payoffs, top_k + 1).tolist()
+        return [[j for j in candidates if j != i][:top_k] for i in row_idx.tolist()]
+
+    def opportunityCost(
+        self,
+        choice_set: List[str],
+        payoff_matrix: Dict[str, float],
+        P: Optional[TransitionMatrix] = None,
+        top_k: Optional[int] = None,
+        rows: Optional[List[str]] = None,
+        horizon: Optional[int] = None,
+        initial: Optional[np.ndarray] = None
+    ) -> Dict[str, Dict[str, float]]:
+        payoffs = self.expectedPayoffs(choice_set, payoff_matrix, P, horizon, initial)
+        row_idx = self.rowIndices(choice_set, rows)
+
+        if top_k is not None:
+            alternatives = self.topAlternatives(payoffs, row_idx, top_k)
+            pf = payoffs.tolist()
+            self.trade_off_profile = {
+                choice_set[i]: {choice_set[j]: pf[j] - pf[i] for j in alts}
+                for i, alts in zip(row_idx.tolist(), alternatives)
+            }
+            return self.trade_off_profile
+
+        trade_off = self.tradeOffMatrix(payoffs, row_idx).tolist()
+        n = len(choice_set)
         self.trade_off_profile = {
-            choice_set[i]: {choice_set[j]: float(trade_off[i, j]) for j in range(n) if i != j}
-            for i in range(n)
+            choice_set[i]: {choice_set[j]: row[j] for j in range(n) if i != j}
+            for i, row in zip(row_idx.tolist(), trade_off)
         }
 
         return self.trade_off_profile
 
+def request_transition_matrix(request: OpportunityCostRequest) -> Optional[TransitionMatrix]:
+    if request.P:
+        return np.array(request.P)
+    if request.P_sparse is not None:
+        m = request.P_sparse
+        return sparse_matrix(m.shape, m.rows, m.cols, m.values)
+    return None
+
+def opportunity_cost_weight(request: OpportunityCostRequest) -> str:
+    if request.P:
+        n_states = len(request.P)
+        nnz = n_states * n_states
+    elif request.P_sparse is not None:
+        n_states = max(request.P_sparse.shape, default=0)
+        nnz = len(request.P_sparse.values)
+    else:
+        return LIGHT
+    return HEAVY if chain_is_heavy(n_states, nnz, request.horizon) else LIGHT
+
+@service_weight(opportunity_cost_weight)
 def opportunity_cost_service(request: OpportunityCostRequest) -> OpportunityCostResponse:
     agent = CognitiveAgent()
-    P_np = np.array(request.P) if request.P else None
+    P_np = request_transition_matrix(request)
+    initial = initial_distribution(request.choice_set, request.initial_distribution, request.horizon)
+
+    if request.format == "columnar":
+        payoffs = agent.expectedPayoffs(request.choice_set, request.payoff_matrix, P_np, request.horizon, initial)
+        log_result("opportunity_cost_columnar", payoffs, choices=len(request.choice_set))
+        return OpportunityCostResponse(choices=request.choice_set, payoffs=payoffs.tolist())
+    elif request.format != "nested":
+        raise ValueError("Unknown format. Use 'nested', 'columnar' or 'binary'.")
+
     result = agent.opportunityCost(
         choice_set=request.choice_set,
         payoff_matrix=request.payoff_matrix,
-        P=P_np
+        P=P_np,
+        top_k=request.top_k,
+        rows=request.rows,
+        horizon=request.horizon,
+        initial=initial
     )
 
-    print(f"Opportunity Cost: {result}")
+    log_result("opportunity_cost", result, choices=len(request.choice_set), rows=len(result))
     return OpportunityCostResponse(trade_off_profile=result)
+
+@service_weight(opportunity_cost_weight)
+def opportunity_cost_matrix_service(request: OpportunityCostRequest) -> np.ndarray:
+    agent = CognitiveAgent()
+    payoffs = agent.expectedPayoffs(
+        request.choice_set, request.payoff_matrix, request_transition_matrix(request),
+        request.horizon, initial_distribution(request.choice_set, request.initial_distribution, request.horizon)
+    )
+    row_idx = agent.rowIndices(request.choice_set, request.rows)
+    matrix = agent.tradeOffMatrix(payoffs.astype(np.float32), row_idx)
+    matrix[np.arange(row_idx.size), row_idx] = 0.0
+    log_result("opportunity_cost_binary", matrix, choices=len(request.choice_set), rows=matrix.shape[0])
+    return matrix
+
+def markov_array_weight(payoffs: np.ndarray, P: Optional[TransitionMatrix] = None, horizon: Optional[int] = None, *_: Any) -> str:
+    if P is None:
+        return LIGHT
+    return HEAVY if chain_is_heavy(P.shape[0], P.nnz if sp.issparse(P) else P.size, horizon) else LIGHT
+
+@service_weight(markov_array_weight)
+def opportunity_cost_array_service(
+    payoffs: np.ndarray,
+    P: Optional[TransitionMatrix] = None,
+    horizon: Optional[int] = None,
+    initial: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    n = payoffs.size
+    if P is not None:
+        if horizon is not None:
+            with stage("horizon"):
+                pi = horizon_distribution(P, initial, horizon)
+        else:
+            with stage("stationary"):
+                pi = stationary_distribution(P)
+        payoffs = payoffs * (pi if pi.size == n else np.full(n, 1/n))
+    log_result("opportunity_cost_arrays", payoffs, choices=n, states=None if P is None else P.shape[0])
+    return {"expected_payoff": payoffs}
+
+def opportunity_cost_batch_key(request: OpportunityCostRequest) -> Optional[Hashable]:
+    if request.format != "nested" or request.top_k is not None or request.rows is not None or request.horizon is not None:
+        return None
+    P = request.P
+    if not P and request.P_sparse is not None:
+        return None
+    if not P:
+        return (len(request.choice_set), None)
+    if any(len(row) != len(P) for row in P):
+        return None
+    return (len(request.choice_set), len(P))
+
+def opportunity_cost_kernel(requests: List[OpportunityCostRequest]) -> List[OpportunityCostResponse]:
+    B, n = len(requests), len(requests[0].choice_set)
+    payoffs = np.array([[r.payoff_matrix.get(c, 0.0) for c in r.choice_set] for r in requests], dtype=float).reshape(B, n)
+
+    if requests[0].P:
+        with stage("stationary"):
+            pi = stationary_distributions_batch(np.array([r.P for r in requests], dtype=float))
+        if pi.shape[1] != n:
+            pi = np.full((B, n), 1/n)
+        payoffs = payoffs * pi
+
+    trade_off = payoffs[:, None, :] - payoffs[:, :, None]
+
+    responses = []
+    for b, r in enumerate(requests):
+        rows = trade_off[b].tolist()
+        choices = r.choice_set
+        responses.append(OpportunityCostResponse(trade_off_profile={
+            choices[i]: {choices[j]: rows[i][j] for j in range(n) if i != j}
+            for i in range(n)
+        }))
+    return responses
+
+@service_weight(HEAVY)
+def opportunity_cost_batch_service(request: OpportunityCostBatchRequest) -> OpportunityCostBatchResponse:
+    outcomes = run_batch(request.items, opportunity_cost_batch_key, opportunity_cost_kernel, opportunity_cost_service)
+    log_result("opportunity_cost_batch", outcomes, items=len(outcomes), errors=sum(e is not None for _, e in outcomes))
+    return OpportunityCostBatchResponse(results=batch_items(outcomes, OpportunityCostBatchItem))
@@ -1,28 +1,148 @@
-from models.payoff_weighted_aggregation_model import PayoffWeightedAggregationRequest, PayoffWeightedAggregationResponse
-from typing import Dict, Any
+from models.payoff_weighted_aggregation_model import PayoffWeightedAggregationRequest, PayoffWeightedAggregationResponse, PayoffWeightedAggregationBatchRequest, PayoffWeightedAggregationBatchResponse, PayoffWeightedAggregationBatchItem, PayoffPartialRequest, PayoffPartial, PayoffCombineRequest, PayoffCombineResponse
+from services.batching import run_batch, batch_items
+from core.execution import service_weight, LIGHT, HEAVY
+from core.structured_logging import log_result
+import numpy as np
+from typing import Dict, Any, List, Hashable, Optional, Tuple
 
-def payoff_weighted_aggregation_service(request: PayoffWeightedAggregationRequest) -> PayoffWeightedAggregationResponse:
-    proposal_map = request.proposal_map
-    payoff_gradients = request.payoff_gradients
+def proposal_amount(v: Any) -> float:
+    if isinstance(v, dict):
+        v = v.get("amount", 0.0)
+    return float("nan") if v is None else float(v)
+
+def proposal_amounts(values: List[Any]) -> np.ndarray:
+    # Plain numbers convert in one call; only maps with {"amount": ...} entries are unpacked one by one.
+    try:
+        return np.array(values, dtype=float).reshape(len(values))
+    except (TypeError, ValueError):
+        return np.fromiter((proposal_amount(v) for v in values), dtype=float, count=len(values))
 
-    # --- Compute weighted scores ---
-    weighted_scores = {}
-    for k, v in proposal_map.items():
-        if isinstance(v, dict):
-            v = v.get("amount", 0.0)
-        weight = payoff_gradients.get(k, 1.0)
-        weighted_scores[k] = float(v) * float(weight)
+def check_finite(ids: List[str], amounts: np.ndarray, weights: np.ndarray) -> None:
+    # null converts to NaN above; NaN or infinite scores would make consensus and winner meaningless
+    for name, values in (("amounts", amounts), ("weights", weights)):
+        bad = np.flatnonzero(~np.isfinite(values))
+        if bad.size:
+            raise ValueError(f"Proposal {name} must be finite numbers, not null, NaN or infinite; see {ids[bad[0]]!r}.")
 
-    # --- Normalize to probabilities (consensus) ---
-    total = sum(weighted_scores.values())
-    consensus = {k: (v / total if total > 0 else 0.0) for k, v in weighted_scores.items()}
+def proposal_arrays(request: PayoffWeightedAggregationRequest) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    # Proposal names, amounts and weights as typed arrays, from either request form.
+    gradients = request.payoff_gradients
+    if request.amounts is not None:
+        if request.proposal_map:
+            raise ValueError("Use either proposal_map or the typed proposal_ids/amounts form, not both.")
+        ids = request.proposal_ids
+        if ids is None or len(ids) != len(request.amounts):
+            raise ValueError("amounts needs proposal_ids of the same length.")
+        if len(set(ids)) != len(ids):
+            raise ValueError("proposal_ids must be unique.")
+        amounts = np.asarray(request.amounts, dtype=float)
+        if request.gradients is not None:
+            if len(request.gradients) != len(ids):
+                raise ValueError("gradients must have one weight per proposal.")
+            weights = np.asarray(request.gradients, dtype=float)
+        else:
+            weights = np.fromiter((gradients.get(k, 1.0) for k in ids), dtype=float, count=len(ids))
+        check_finite(ids, amounts, weights)
+        return ids, amounts, weights
+    ids = list(request.proposal_map)
+    amounts = proposal_amounts(list(request.proposal_map.values()))
+    weights = np.fromiter((gradients.get(k, 1.0) for k in ids), dtype=float, count=len(ids))
+    check_finite(ids, amounts, weights)
+    return ids, amounts, weights
 
-    # --- Find winning pattern ---
-    winning_pattern = max(weighted_scores, key=weighted_scores.get) if weighted_scores else ""
+def consensus_shares(scores: np.ndarray, total: float) -> np.ndarray:
+    return scores / total if total > 0 else np.zeros_like(scores)
+
+@service_weight(LIGHT)
+def payoff_weighted_aggregation_service(request: PayoffWeightedAggregationRequest) -> PayoffWeightedAggregationResponse:
+    ids, amounts, weights = proposal_arrays(request)
+    scores = amounts * weights
+    total = float(scores.sum())
+    consensus = dict(zip(ids, consensus_shares(scores, total).tolist()))
+    weighted_scores = dict(zip(ids, scores.tolist()))
+    winning_pattern = ids[int(np.argmax(scores))] if ids else ""
 
-    print(f"Payoff Weighted Aggregation: Winning Pattern={winning_pattern}, Consensus={consensus}, Weighted Scores={weighted_scores}")
+    log_result("payoff_weighted_aggregation", {"winning_pattern": winning_pattern, "consensus": consensus, "weighted_scores": weighted_scores}, proposals=len(ids))
     return PayoffWeightedAggregationResponse(
         winning_pattern=winning_pattern,
         consensus_dsl=consensus,
         weighted_scores=weighted_scores
     )
+
+@service_weight(LIGHT)
+def payoff_weighted_partial_service(request: PayoffPartialRequest) -> PayoffPartial:
+    # One shard's share of the aggregation: its total and local winner, which is all
+    # combine needs for the global winner, plus the scores consensus_dsl is built from.
+    ids, amounts, weights = proposal_arrays(request)
+    scores = amounts * weights
+    best: Optional[int] = int(np.argmax(scores)) if ids else None
+    partial = PayoffPartial(
+        count=len(ids),
+        total=float(scores.sum()),
+        winning_pattern=ids[best] if best is not None else "",
+        winning_score=float(scores[best]) if best is not None else None
+    )
+    if request.include_scores:
+        partial.weighted_scores = dict(zip(ids, scores.tolist()))
+    log_result("payoff_weighted_partial", partial, proposals=len(ids))
+    return partial
+
+@service_weight(LIGHT)
+def payoff_weighted_combine_service(request: PayoffCombineRequest) -> PayoffCombineResponse:
+    partials = request.partials
+    total = float(sum(p.total for p in partials))
+    winners = [p for p in partials if p.winning_score is not None]
+    best = max(winners, key=lambda p: p.winning_score) if winners else None
+    response = PayoffCombineResponse(
+        winning_pattern=best.winning_pattern if best is not None else "",
+        winning_score=best.winning_score if best is not None else None,
+        total=total,
+        count=sum(p.count for p in partials)
+    )
+    if all(p.weighted_scores is not None for p in partials):
+        weighted_scores: Dict[str, float] = {}
+        for p in partials:
+            overlap = weighted_scores.keys() & p.weighted_scores.keys()
+            if overlap:
+                raise ValueError(f"Proposals appear in more than one partial: {sorted(overlap)[:10]}")
+            weighted_scores.update(p.weighted_scores)
+        scores = np.fromiter(weighted_scores.values(), dtype=float, count=len(weighted_scores))
+        response.weighted_scores = weighted_scores
+        response.consensus_dsl = dict(zip(weighted_scores, consensus_shares(scores, total).tolist()))
+    log_result("payoff_weighted_combine", response.winning_pattern, partials=len(partials), proposals=response.count)
+    return response
+
+def payoff_weighted_aggregation_batch_key(request: PayoffWeightedAggregationRequest) -> Optional[Hashable]:
+    if request.amounts is not None:
+        return None
+    return len(request.proposal_map)
+
+def payoff_weighted_aggregation_kernel(requests: List[PayoffWeightedAggregationRequest]) -> List[PayoffWeightedAggregationResponse]:
+    B, n = len(requests), len(requests[0].proposal_map)
+    if n == 0:
+        return [PayoffWeightedAggregationResponse(winning_pattern="", consensus_dsl={}, weighted_scores={}) for _ in requests]
+
+    amounts = np.stack([proposal_amounts(list(r.proposal_map.values())) for r in requests])
+    weights = np.array([[float(r.payoff_gradients.get(k, 1.0)) for k in r.proposal_map] for r in requests], dtype=float)
+    for r, a, w in zip(requests, amounts, weights):
+        check_finite(list(r.proposal_map), a, w)
+    scores = amounts * weights
+    total = scores.sum(axis=1, keepdims=True)
+    consensus = np.where(total > 0, scores / np.where(total > 0, total, 1.0), 0.0)
+    winners = np.argmax(scores, axis=1)
+
+    responses = []
+    for b, r in enumerate(requests):
+        keys = list(r.proposal_map.keys())
+        responses.append(PayoffWeightedAggregationResponse(
+            winning_pattern=keys[winners[b]],
+            consensus_dsl=dict(zip(keys, consensus[b].tolist())),
+            weighted_scores=dict(zip(keys, scores[b].tolist()))
+        ))
+    return responses
+
+@service_weight(HEAVY)
+def payoff_weighted_aggregation_batch_service(request: PayoffWeightedAggregationBatchRequest) -> PayoffWeightedAggregationBatchResponse:
+    outcomes = run_batch(request.items, payoff_weighted_aggregation_batch_key, payoff_weighted_aggregation_kernel, payoff_weighted_aggregation_service)
+    log_result("payoff_weighted_aggregation_batch", outcomes, items=len(outcomes), errors=sum(e is not None for _, e in outcomes))
+    return PayoffWeightedAggregationBatchResponse(results=batch_items(outcomes, PayoffWeightedAggregationBatchItem))
@@ -1,26 +1,155 @@
-from models.risk_assessment_model import RiskAssessmentRequest, RiskAssessmentResponse, RiskMetrics
+from models.risk_assessment_model import RiskAssessmentRequest, RiskAssessmentResponse, RiskMetrics, RiskAssessmentBatchRequest, RiskAssessmentBatchResponse, RiskAssessmentBatchItem, PayoffDistribution
+from services.batching import run_batch, batch_items
+from core.execution import service_weight, LIGHT, HEAVY
+from core.metrics import stage
+from core.structured_logging import log_result
+from services.markov import TransitionMatrix, stationary_distribution, stationary_distributions_batch, horizon_distribution, initial_distribution, sparse_matrix, validate_stochastic, chain_is_heavy
+import os
 import numpy as np
-from typing import Dict, List, Any
-from scipy.stats import norm
-import quantecon as qe
+import scipy.sparse as sp
+from typing import Callable, Dict, List, Any, Optional, Hashable, Tuple
+from scipy.special import ndtri
+
+RISK_PATHS = int(os.getenv("ECONOMICS_RISK_PATHS", "10000"))
+RISK_CHUNK_PATHS = int(os.getenv("ECONOMICS_RISK_CHUNK_PATHS", "1000"))
+# choices x paths; the simulated totals are kept for the quantiles
+RISK_MAX_SAMPLES = int(os.getenv("ECONOMICS_RISK_MAX_SAMPLES", "20000000"))
+# choices x paths x horizon payoff draws per request
+RISK_MAX_DRAWS = int(os.getenv("ECONOMICS_RISK_MAX_DRAWS", "500000000"))
+
+class PayoffSampler:
+    # Per-choice payoff distributions as arrays indexed by state: normal (mean, sd) for
+    # most choices, resampling from a padded samples matrix for the empirical ones.
+    def __init__(self, choice_set: List[str], payoffs: np.ndarray, distributions: Dict[str, PayoffDistribution]):
+        unknown = [c for c in distributions if c not in set(choice_set)]
+        if unknown:
+            raise ValueError(f"payoff_distributions has choices not in choice_set: {unknown}")
+        n = len(choice_set)
+        self.mean = payoffs.astype(float).copy()
+        self.sd = np.zeros(n)
+        counts = np.zeros(n, dtype=np.intp)
+        empirical = {}
+        for i, choice in enumerate(choice_set):
+            spec = distributions.get(choice)
+            if spec is None:
+                continue
+            if spec.samples is not None:
+                if not spec.samples:
+                    raise ValueError(f"payoff_distributions['{choice}'].samples is empty.")
+                empirical[i] = spec.samples
+                counts[i] = len(spec.samples)
+                continue
+            if spec.sd < 0:
+                raise ValueError(f"payoff_distributions['{choice}'].sd must be nonnegative.")
+            if spec.mean is not None:
+                self.mean[i] = spec.mean
+            self.sd[i] = spec.sd
+        self.counts = counts
+        self.empirical = counts > 0
+        self.samples = np.zeros((n, max(counts.max(initial=0), 1)))
+        for i, values in empirical.items():
+            self.samples[i, :len(values)] = values
+
+    def draw(self, states: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        values = self.mean[states]
+        if self.sd.any():
+            values += self.sd[states] * rng.standard_normal(states.shape)
+        if self.empirical.any():
+            picks = (rng.random(states.shape) * self.counts[states]).astype(np.intp)
+            values = np.where(self.empirical[states], self.samples[states, picks], values)
+        return values
+
+def transition_sampler(P: TransitionMatrix) -> Callable[[np.ndarray, np.random.Generator], np.ndarray]:
+    # Inverse-CDF sampling of next states for any array of current states at once. Row r's
+    # cumulative probabilities are offset by r, so one sorted key array serves every row:
+    # the next state from r with uniform u is the first entry of row r whose key exceeds
+    # r + u. A guide table of `resolution` buckets per row gives a starting position at or
+    # just before it, so the search is a short forward scan rather than a binary search.
+    P = sp.csr_matrix(P, dtype=float)
+    P.eliminate_zeros()
+    P.sort_indices()
+    n = P.shape[0]
+    counts = np.diff(P.indptr)
+    last = P.indptr[1:] - 1
+    within = np.cumsum(P.data)
+    within -= np.repeat(np.concatenate(([0.0], within))[P.indptr[:-1]], counts)
+    within /= np.repeat(within[last], counts)
+    within[last] = 1.0
+    keys = np.repeat(np.arange(n), counts) + within
+    resolution = max(1, -(-2 * P.nnz // n))
+    guide = np.searchsorted(keys, np.arange(n * resolution) / resolution, side="right")
+    indices = P.indices
+
+    def step(states: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        target = states + rng.random(states.shape)
+        bucket = np.minimum((target * resolution).astype(np.intp), n * resolution - 1)
+        pos = np.minimum(guide[bucket], last[states])
+        ahead = np.flatnonzero(keys[pos] <= target)
+        while ahead.size:
+            pos.flat[ahead] += 1
+            ahead = ahead[keys[pos.flat[ahead]] <= target.flat[ahead]]
+        return indices[np.minimum(pos, last[states])]
+
+    return step
+
+def simulate_totals(
+    sampler: PayoffSampler,
+    step: Optional[Callable[[np.ndarray, np.random.Generator], np.ndarray]],
+    n: int,
+    horizon: int,
+    paths: int,
+    chunk_size: int,
+    rng: np.random.Generator
+) -> np.ndarray:
+    # Total payoff of every path, choices x paths. Paths start at their choice; each chunk
+    # advances choices x chunk_size states together through the horizon.
+    totals = np.empty((n, paths))
+    for start in range(0, paths, chunk_size):
+        m = min(chunk_size, paths - start)
+        states = np.broadcast_to(np.arange(n)[:, None], (n, m))
+        acc = np.zeros((n, m))
+        for t in range(horizon):
+            acc += sampler.draw(states, rng)
+            if step is not None and t + 1 < horizon:
+                states = step(states, rng)
+        totals[:, start:start + m] = acc
+    return totals
+
+def total_metrics(totals: np.ndarray, alpha: float, block_rows: int) -> Tuple[np.ndarray, ...]:
+    # Mean, alpha/2, alpha and 1 - alpha/2 quantiles and CVaR of each row of totals, a
+    # block of rows at a time. The quantiles partition each block in place (a row's values
+    # are only reordered), so the extra memory is a boolean tail mask per block.
+    n = totals.shape[0]
+    expected, lower, var, upper, cvar = (np.empty(n) for _ in range(5))
+    for start in range(0, n, block_rows):
+        rows = slice(start, start + block_rows)
+        block = totals[rows]
+        expected[rows] = block.mean(axis=1)
+        lower[rows], var[rows], upper[rows] = np.quantile(block, [alpha / 2, alpha, 1 - alpha / 2], axis=1, overwrite_input=True)
+        tail = block <= var[rows, None]
+        cvar[rows] = np.sum(block, axis=1, where=tail) / tail.sum(axis=1)
+    return expected, lower, var, upper, cvar
 
 class RiskAgent:
     def __init__(self):
         self.risk_profile: Dict[str, RiskMetrics] = {}
 
-    def riskAssessment(
+    def riskArrays(
         self,
-        choice_set: List[str],
-        payoff_matrix: Dict[str, float],
-        prob_matrix: np.ndarray = None,
-        confidence: float = 0.95
-    ) -> Dict[str, RiskMetrics]:
-        n = len(choice_set)
-        payoffs = np.array([payoff_matrix.get(choice, 0.0) for choice in choice_set])
-
+        payoffs: np.ndarray,
+        prob_matrix: Optional[TransitionMatrix] = None,
+        confidence: float = 0.95,
+        horizon: Optional[int] = None,
+        initial: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, float, np.ndarray]:
+        n = payoffs.size
         if prob_matrix is not None:
-            mc = qe.MarkovChain(prob_matrix)
-            pi = np.array(mc.stationary_distributions[0]).flatten()
+            if horizon is not None:
+                with stage("horizon"):
+                    pi = horizon_distribution(prob_matrix, initial, horizon)
+            else:
+                with stage("stationary"):
+                    pi = stationary_distribution(prob_matrix)
             if pi.size != n:
                 pi = np.full(n, 1/n)  # uniform if mismatch
             expected_payoffs = payoffs * pi
@@ -28,10 +157,24 @@ class RiskAgent:
             expected_payoffs = payoffs
 
         std_dev = np.std(expected_payoffs)
-        z_score = norm.ppf(0.5 + confidence/2)
+        z_score = ndtri(0.5 + confidence/2)
         ci = z_score * std_dev
 
         risk_adjusted = expected_payoffs - ci
+        return expected_payoffs, float(ci), risk_adjusted
+
+    def riskAssessment(
+        self,
+        choice_set: List[str],
+        payoff_matrix: Dict[str, float],
+        prob_matrix: Optional[TransitionMatrix] = None,
+        confidence: float = 0.95,
+        horizon: Optional[int] = None,
+        initial: Optional[np.ndarray] = None
+    ) -> Dict[str, RiskMetrics]:
+        n = len(choice_set)
+        payoffs = np.array([payoff_matrix.get(choice, 0.0) for choice in choice_set])
+        expected_payoffs, ci, risk_adjusted = self.riskArrays(payoffs, prob_matrix, confidence, horizon, initial)
 
         self.risk_profile = {
             choice_set[i]: RiskMetrics(
@@ -44,15 +187,182 @@ class RiskAgent:
 
         return self.risk_profile
 
+    def riskSimulation(
+        self,
+        choice_set: List[str],
+        payoff_matrix: Dict[str, float],
+        payoff_distributions: Dict[str, PayoffDistribution],
+        prob_matrix: Optional[TransitionMatrix] = None,
+        confidence: float = 0.95,
+        horizon: int = 1,
+        paths: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        random_seed: Optional[int] = None
+    ) -> Dict[str, RiskMetrics]:
+        n = len(choice_set)
+        paths = RISK_PATHS if paths is None else paths
+        chunk_size = RISK_CHUNK_PATHS if chunk_size is None else chunk_size
+        if horizon < 1 or paths < 1 or chunk_size < 1:
+            raise ValueError("horizon, paths and chunk_size must be positive.")
+        if n * paths > RISK_MAX_SAMPLES:
+            raise ValueError(f"{n} choices x {paths} paths exceeds the limit of {RISK_MAX_SAMPLES} simulated totals; lower paths.")
+        if n * paths * horizon > RISK_MAX_DRAWS:
+            raise ValueError(f"{n} choices x {paths} paths x {horizon} steps exceeds the limit of {RISK_MAX_DRAWS} payoff draws; lower paths or horizon.")
+        payoffs = np.array([payoff_matrix.get(choice, 0.0) for choice in choice_set], dtype=float)
+        sampler = PayoffSampler(choice_set, payoffs, payoff_distributions)
+        step = None
+        if prob_matrix is not None and horizon > 1:
+            validate_stochastic(prob_matrix)
+            if prob_matrix.shape[0] != n:
+                raise ValueError("prob_matrix must have one state per choice for simulation.")
+            step = transition_sampler(prob_matrix)
+
+        with stage("simulate"):
+            totals = simulate_totals(sampler, step, n, horizon, paths, chunk_size, np.random.default_rng(random_seed))
+        # blocks of about as many totals as one simulation chunk
+        expected, lower, var, upper, cvar = total_metrics(totals, 1.0 - confidence, max(1, n * chunk_size // paths))
+        half_width = (upper - lower) / 2
+
+        self.risk_profile = {
+            choice: RiskMetrics(
+                ExpectedValue=ev,
+                ConfidenceInterval=ci,
+                RiskAdjustedValue=ev - ci,
+                VaR=v,
+                CVaR=cv,
+                LowerQuantile=lo,
+                UpperQuantile=hi
+            )
+            for choice, ev, ci, v, cv, lo, hi in zip(
+                choice_set, expected.tolist(), half_width.tolist(), var.tolist(), cvar.tolist(), lower.tolist(), upper.tolist()
+            )
+        }
+        return self.risk_profile
+
+def request_prob_matrix(request: RiskAssessmentRequest) -> Optional[TransitionMatrix]:
+    if request.prob_matrix:
+        return np.array(request.prob_matrix)
+    if request.prob_matrix_sparse is not None:
+        m = request.prob_matrix_sparse
+        return sparse_matrix(m.shape, m.rows, m.cols, m.values)
+    return None
+
+def risk_assessment_weight(request: RiskAssessmentRequest) -> str:
+    if request.mode == "simulation":
+        return HEAVY
+    if request.prob_matrix:
+        n_states = len(request.prob_matrix)
+        nnz = n_states * n_states
+    elif request.prob_matrix_sparse is not None:
+        n_states = max(request.prob_matrix_sparse.shape, default=0)
+        nnz = len(request.prob_matrix_sparse.values)
+    else:
+        return LIGHT
+    return HEAVY if chain_is_heavy(n_states, nnz, request.horizon) else LIGHT
+
+@service_weight(risk_assessment_weight)
 def risk_assessment_service(request: RiskAssessmentRequest) -> RiskAssessmentResponse:
     agent = RiskAgent()
-    prob_matrix_np = np.array(request.prob_matrix) if request.prob_matrix else None
-    result = agent.riskAssessment(
-        choice_set=request.choice_set,
-        payoff_matrix=request.payoff_matrix,
-        prob_matrix=prob_matrix_np,
-        confidence=request.confidence
-    )
-
-    print(f"Risk assessment: {result}")
+    prob_matrix_np = request_prob_matrix(request)
+    if request.mode == "simulation":
+        if request.initial_distribution is not None:
+            raise ValueError("initial_distribution applies to 'analytic' mode only; simulated paths start at their choice.")
+        result = agent.riskSimulation(
+            choice_set=request.choice_set,
+            payoff_matrix=request.payoff_matrix,
+            payoff_distributions=request.payoff_distributions,
+            prob_matrix=prob_matrix_np,
+            confidence=request.confidence,
+            horizon=1 if request.horizon is None else request.horizon,
+            paths=request.paths,
+            chunk_size=request.chunk_size,
+            random_seed=request.random_seed
+        )
+    elif request.mode == "analytic":
+        result = agent.riskAssessment(
+            choice_set=request.choice_set,
+            payoff_matrix=request.payoff_matrix,
+            prob_matrix=prob_matrix_np,
+            confidence=request.confidence,
+            horizon=request.horizon,
+            initial=initial_distribution(request.choice_set, request.initial_distribution, request.horizon)
+        )
+    else:
+        raise ValueError("Unknown mode. Use 'analytic' or 'simulation'.")
+
+    log_result("risk_assessment", result, choices=len(request.choice_set), states=None if prob_matrix_np is None else prob_matrix_np.shape[0])
     return RiskAssessmentResponse(risk_profile=result)
+
+def markov_array_weight(
+    payoffs: np.ndarray,
+    prob_matrix: Optional[TransitionMatrix] = None,
+    confidence: float = 0.95,
+    horizon: Optional[int] = None,
+    *_: Any
+) -> str:
+    if prob_matrix is None:
+        return LIGHT
+    nnz = prob_matrix.nnz if sp.issparse(prob_matrix) else prob_matrix.size
+    return HEAVY if chain_is_heavy(prob_matrix.shape[0], nnz, horizon) else LIGHT
+
+@service_weight(markov_array_weight)
+def risk_assessment_array_service(
+    payoffs: np.ndarray,
+    prob_matrix: Optional[TransitionMatrix] = None,
+    confidence: float = 0.95,
+    horizon: Optional[int] = None,
+    initial: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    expected_payoffs, ci, risk_adjusted = RiskAgent().riskArrays(payoffs, prob_matrix, confidence, horizon, initial)
+    log_result("risk_assessment_arrays", risk_adjusted, choices=payoffs.size, states=None if prob_matrix is None else prob_matrix.shape[0])
+    return {
+        "ExpectedValue": expected_payoffs,
+        "ConfidenceInterval": np.full(payoffs.size, ci),
+        "RiskAdjustedValue": risk_adjusted
+    }
+
+def risk_assessment_batch_key(request: RiskAssessmentRequest) -> Optional[Hashable]:
+    if request.mode != "analytic" or request.horizon is not None:
+        return None
+    P = request.prob_matrix
+    if not P and request.prob_matrix_sparse is not None:
+        return None
+    if not P:
+        return (len(request.choice_set), None)
+    if any(len(row) != len(P) for row in P):
+        return None
+    return (len(request.choice_set), len(P))
+
+def risk_assessment_kernel(requests: List[RiskAssessmentRequest]) -> List[RiskAssessmentResponse]:
+    n = len(requests[0].choice_set)
+    payoffs = np.array([[r.payoff_matrix.get(c, 0.0) for c in r.choice_set] for r in requests], dtype=float).reshape(len(requests), n)
+
+    if requests[0].prob_matrix:
+        P = np.array([r.prob_matrix for r in requests], dtype=float)
+        with stage("stationary"):
+            pi = stationary_distributions_batch(P)
+        if pi.shape[1] != n:
+            pi = np.full(payoffs.shape, 1/n)
+        expected_payoffs = payoffs * pi
+    else:
+        expected_payoffs = payoffs
+
+    std_dev = np.std(expected_payoffs, axis=1)
+    z_score = ndtri(0.5 + np.array([r.confidence for r in requests]) / 2)
+    ci = z_score * std_dev
+    risk_adjusted = expected_payoffs - ci[:, None]
+
+    responses = []
+    for b, r in enumerate(requests):
+        ci_b = float(ci[b])
+        responses.append(RiskAssessmentResponse(risk_profile={
+            c: RiskMetrics(ExpectedValue=ev, ConfidenceInterval=ci_b, RiskAdjustedValue=ra)
+            for c, ev, ra in zip(r.choice_set, expected_payoffs[b].tolist(), risk_adjusted[b].tolist())
+        }))
+    return responses
+
+@service_weight(HEAVY)
+def risk_assessment_batch_service(request: RiskAssessmentBatchRequest) -> RiskAssessmentBatchResponse:
+    outcomes = run_batch(request.items, risk_assessment_batch_key, risk_assessment_kernel, risk_assessment_service)
+    log_result("risk_assessment_batch", outcomes, items=len(outcomes), errors=sum(e is not None for _, e in outcomes))
+    return RiskAssessmentBatchResponse(results=batch_items(outcomes, RiskAssessmentBatchItem))
@@ -1,6 +1,90 @@
-from models.scarcity_constraint_model import ScarcityConstraintRequest, ScarcityConstraintResponse
+from models.scarcity_constraint_model import ScarcityConstraintRequest, ScarcityConstraintResponse, ScarcityConstraintBatchRequest, ScarcityConstraintBatchResponse, ScarcityConstraintBatchItem
+from services.batching import run_batch, batch_items
+from core.execution import service_weight, LIGHT, HEAVY
+from core.metrics import stage
+from core.structured_logging import log_result
+import numpy as np
 import cvxpy as cp
-from typing import Dict, Any, List
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple, Optional, Hashable
+
+def pack_demands(
+    resource_pool: Dict[str, float],
+    demand_vector: Dict[str, Dict[str, float]]
+) -> Tuple[List[str], List[str], np.ndarray, np.ndarray]:
+    options = list(demand_vector.keys())
+    resources = list(resource_pool.keys())
+    col = {r: j for j, r in enumerate(resources)}
+    available = np.array([resource_pool[r] for r in resources], dtype=float)
+    required = np.zeros((len(options), len(resources)), dtype=float)
+    for i, option in enumerate(options):
+        for resource, amount in demand_vector[option].items():
+            j = col.get(resource)
+            if j is not None:
+                required[i, j] = amount
+    return options, resources, available, required
+
+class ScarcityConstraintVectorized:
+    def __init__(self, tol: float = 1e-6):
+        self.tol = tol
+        self.constraint_set: Dict[str, bool] = {}
+        self.feasibility_map: Dict[str, float] = {}
+        self.infeasible_options: List[str] = []
+        self.binding_constraints: Dict[str, List[str]] = {}
+
+    def maxFeasibleScale(self, available: np.ndarray, required: np.ndarray) -> np.ndarray:
+        # scale * required <= available, 0 <= scale <= 1, solved per option in closed form.
+        # Leading axes are batch axes: (..., options, resources) against (..., resources).
+        available = available[..., None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = available / required
+        upper = np.min(np.where(required > 0, ratio, np.inf), axis=-1, initial=np.inf)
+        lower = np.max(np.where(required < 0, ratio, -np.inf), axis=-1, initial=-np.inf)
+        upper = np.minimum(upper, 1.0)
+        lower = np.maximum(lower, 0.0)
+        unsatisfiable = np.any((required == 0) & (available < 0), axis=-1)
+        solvable = (lower <= upper) & ~unsatisfiable
+        return np.where(solvable, upper, 0.0)
+
+    def bindingResources(self, available: np.ndarray, required: np.ndarray, feasible: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            binding = (required > 0) & (available[..., None, :] / required < 1.0 + self.tol)
+        return binding & ~feasible[..., None]
+
+    def summarize(
+        self,
+        options: List[str],
+        resources: List[str],
+        scale: np.ndarray,
+        feasible: np.ndarray,
+        binding: np.ndarray
+    ) -> Dict[str, Any]:
+        self.feasibility_map = dict(zip(options, scale.tolist()))
+        self.constraint_set = dict(zip(options, feasible.tolist()))
+        self.infeasible_options = [options[i] for i in np.flatnonzero(~feasible)]
+        self.binding_constraints = {
+            options[i]: [resources[j] for j in np.flatnonzero(binding[i])]
+            for i in np.flatnonzero(~feasible)
+        }
+
+        return {
+            "ConstraintSet": self.constraint_set,
+            "FeasibilityMap": self.feasibility_map,
+            "InfeasibleOptions": self.infeasible_options,
+            "BindingConstraints": self.binding_constraints
+        }
+
+    def scarcityConstraint(
+        self,
+        resource_pool: Dict[str, float],
+        demand_vector: Dict[str, Dict[str, float]]
+    ) -> Dict[str, Any]:
+        options, resources, available, required = pack_demands(resource_pool, demand_vector)
+        scale = self.maxFeasibleScale(available, required)
+        feasible = scale >= 1.0 - self.tol
+        binding = self.bindingResources(available, required, feasible)
+        return self.summarize(options, resources, scale, feasible, binding)
 
 class ScarcityConstraintCVXPY:
     def __init__(self):
@@ -31,7 +115,8 @@ class ScarcityConstraintCVXPY:
             constraints.append(scale <= 1)
 
             problem = cp.Problem(cp.Maximize(scale), constraints)
-            problem.solve(solver=cp.SCS)
+            with stage("solve", solver="scs"):
+                problem.solve(solver=cp.SCS)
 
             scale_value = scale.value if scale.value is not None else 0.0
 
@@ -57,17 +142,161 @@ class ScarcityConstraintCVXPY:
             "BindingConstraints": self.binding_constraints
         }
 
+def shape_bucket(n: int) -> int:
+    return 1 << max(n - 1, 0).bit_length()
+
+class JointAllocationProblem:
+    def __init__(self, n_options: int, n_resources: int):
+        self.n_options = n_options
+        self.n_resources = n_resources
+        self.required = cp.Parameter((n_resources, n_options))
+        self.available = cp.Parameter(n_resources)
+        self.weights = cp.Parameter(n_options)
+        self.x = cp.Variable(n_options, bounds=[0, 1])
+        self.capacity = self.required @ self.x <= self.available
+        self.problem = cp.Problem(cp.Maximize(self.weights @ self.x), [self.capacity])
+        self.lock = threading.Lock()
+
+    def solve(self, available: np.ndarray, required: np.ndarray, weights: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], float]:
+        # Inputs smaller than the compiled shape are padded with zero-weight options and
+        # empty resources, which leave the optimum unchanged; results are cut back down.
+        n, m = required.shape
+        padded = np.zeros((self.n_resources, self.n_options))
+        padded[:m, :n] = required.T
+        with self.lock:
+            self.required.value = padded
+            self.available.value = np.pad(available, (0, self.n_resources - m))
+            self.weights.value = np.pad(weights, (0, self.n_options - n))
+            with stage("solve", solver="highs"):
+                self.problem.solve(solver=cp.HIGHS)
+            if self.problem.status not in (cp.OPTIMAL, cp.OPTIMAL_INACCURATE):
+                return None, None, 0.0
+            return np.array(self.x.value)[:n], np.array(self.capacity.dual_value)[:m], float(self.problem.value)
+
+class ScarcityJointAllocator:
+    # Parameterized LPs are compiled once per (options, resources) shape, rounded up to
+    # powers of two, and reused across requests, so similar shapes only pay for the solve.
+    max_cached_problems = 16
+    _problems: "OrderedDict[Tuple[int, int], JointAllocationProblem]" = OrderedDict()
+    _problems_lock = threading.Lock()
+
+    def __init__(self, tol: float = 1e-6):
+        self.tol = tol
+        self.joint_allocation: Dict[str, float] = {}
+        self.shadow_prices: Dict[str, float] = {}
+        self.joint_objective: float = 0.0
+
+    @classmethod
+    def getProblem(cls, n_options: int, n_resources: int) -> JointAllocationProblem:
+        key = (shape_bucket(n_options), shape_bucket(n_resources))
+        with cls._problems_lock:
+            problem = cls._problems.get(key)
+            if problem is None:
+                problem = JointAllocationProblem(*key)
+                cls._problems[key] = problem
+                while len(cls._problems) > cls.max_cached_problems:
+                    cls._problems.popitem(last=False)
+            else:
+                cls._problems.move_to_end(key)
+            return problem
+
+    def jointAllocation(
+        self,
+        resource_pool: Dict[str, float],
+        demand_vector: Dict[str, Dict[str, float]],
+        payoff_weights: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        options, resources, available, required = pack_demands(resource_pool, demand_vector)
+        weights = np.array([(payoff_weights or {}).get(o, 1.0) for o in options], dtype=float)
+
+        if not options:
+            allocation, duals, objective = np.zeros(0), np.zeros(len(resources)), 0.0
+        elif not resources:
+            allocation = (weights >= 0).astype(float)
+            duals, objective = np.zeros(0), float(weights @ allocation)
+        else:
+            problem = self.getProblem(len(options), len(resources))
+            allocation, duals, objective = problem.solve(available, required, weights)
+            if allocation is None:
+                allocation, duals = np.zeros(len(options)), np.zeros(len(resources))
+        allocation = np.clip(allocation, 0.0, 1.0)
+
+        served = allocation >= 1.0 - self.tol
+        slack = available - required.T @ allocation
+        tight = (slack <= self.tol * np.maximum(1.0, np.abs(available))) & (duals > self.tol)
+        binding = (required > 0) & tight[None, :] & ~served[:, None]
+
+        self.joint_allocation = dict(zip(options, allocation.tolist()))
+        self.shadow_prices = {resources[j]: float(duals[j]) for j in np.flatnonzero(tight)}
+        self.joint_objective = objective
+
+        return {
+            "ConstraintSet": dict(zip(options, served.tolist())),
+            "FeasibilityMap": self.joint_allocation,
+            "InfeasibleOptions": [options[i] for i in np.flatnonzero(~served)],
+            "BindingConstraints": {
+                options[i]: [resources[j] for j in np.flatnonzero(binding[i])]
+                for i in np.flatnonzero(~served)
+            },
+            "JointAllocation": self.joint_allocation,
+            "ShadowPrices": self.shadow_prices,
+            "JointObjective": self.joint_objective
+        }
+
+@service_weight(lambda request: HEAVY if request.mode == "joint" or request.solver == "cvxpy" else LIGHT)
 def scarcity_constraint_service(request: ScarcityConstraintRequest) -> ScarcityConstraintResponse:
-    agent = ScarcityConstraintCVXPY()
-    result = agent.scarcityConstraint(
-        resource_pool=request.resource_pool,
-        demand_vector=request.demand_vector
-    )
+    if request.mode == "joint":
+        result = ScarcityJointAllocator().jointAllocation(
+            resource_pool=request.resource_pool,
+            demand_vector=request.demand_vector,
+            payoff_weights=request.payoff_weights
+        )
+    else:
+        agent = ScarcityConstraintVectorized() if request.solver == "vectorized" else ScarcityConstraintCVXPY()
+        result = agent.scarcityConstraint(
+            resource_pool=request.resource_pool,
+            demand_vector=request.demand_vector
+        )
 
-    print(f"Scarcity constraint check: {result}")
+    log_result("scarcity_constraint", result, options=len(request.demand_vector), resources=len(request.resource_pool))
     return ScarcityConstraintResponse(
         constraint_set=result["ConstraintSet"],
         feasibility_map=result["FeasibilityMap"],
         infeasible_options=result["InfeasibleOptions"],
-        binding_constraints=result["BindingConstraints"]
+        binding_constraints=result["BindingConstraints"],
+        joint_allocation=result.get("JointAllocation"),
+        shadow_prices=result.get("ShadowPrices"),
+        joint_objective=result.get("JointObjective")
     )
+
+def scarcity_constraint_batch_key(request: ScarcityConstraintRequest) -> Optional[Hashable]:
+    if request.mode != "independent" or request.solver != "vectorized":
+        return None
+    return (len(request.demand_vector), len(request.resource_pool))
+
+def scarcity_constraint_kernel(requests: List[ScarcityConstraintRequest]) -> List[ScarcityConstraintResponse]:
+    packed = [pack_demands(r.resource_pool, r.demand_vector) for r in requests]
+    available = np.stack([p[2] for p in packed])
+    required = np.stack([p[3] for p in packed])
+
+    engine = ScarcityConstraintVectorized()
+    scale = engine.maxFeasibleScale(available, required)
+    feasible = scale >= 1.0 - engine.tol
+    binding = engine.bindingResources(available, required, feasible)
+
+    responses = []
+    for b, (options, resources, _, _) in enumerate(packed):
+        result = engine.summarize(options, resources, scale[b], feasible[b], binding[b])
+        responses.append(ScarcityConstraintResponse(
+            constraint_set=result["ConstraintSet"],
+            feasibility_map=result["FeasibilityMap"],
+            infeasible_options=result["InfeasibleOptions"],
+            binding_constraints=result["BindingConstraints"]
+        ))
+    return responses
+
+@service_weight(HEAVY)
+def scarcity_constraint_batch_service(request: ScarcityConstraintBatchRequest) -> ScarcityConstraintBatchResponse:
+    outcomes = run_batch(request.items, scarcity_constraint_batch_key, scarcity_constraint_kernel, scarcity_constraint_service)
+    log_result("scarcity_constraint_batch", outcomes, items=len(outcomes), errors=sum(e is not None for _, e in outcomes))
+    return ScarcityConstraintBatchResponse(results=batch_items(outcomes, ScarcityConstraintBatchItem))
@@ -0,0 +1,24 @@
+import numpy as np
+from typing import Optional
+
+def top_k_indices(scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    # Indices of the k largest scores, best first, in the same order as a stable descending
+    # sort (ties keep input order). A partial selection finds the k-th largest score in O(n);
+    # only the candidates at or above it are sorted.
+    scores = np.asarray(scores, dtype=float)
+    n = scores.size
+    if k is not None and k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k is None or k >= n or np.isnan(scores).any():
+        return np.argsort(-scores, kind="stable")[:k]
+    kth = -np.partition(-scores, k - 1)[k - 1]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:k - above.size]
+    candidates = np.concatenate((above, ties))
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+def first_at_least(values: np.ndarray, threshold: float) -> Optional[int]:
+    # Position of the first value >= threshold, or None, as one vectorized scan.
+    hits = np.asarray(values) >= threshold
+    first = int(np.argmax(hits)) if hits.size else 0
+    return first if hits.size and hits[first] else None
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# count, sum S and sum x log x per candidate; see usage_sums in the efficiency ranking service
+STAT_COLUMNS = 3
+
+class UnknownSessionError(ValueError):
+    status_code = 404
+
+class TraceSession:
+    # One row of running sums per candidate, in a growable array.
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.sums = np.zeros((8, STAT_COLUMNS))
+        self.touched = time.monotonic()
+
+    def rows(self, candidates: List[str]) -> np.ndarray:
+        for c in candidates:
+            if c not in self.index:
+                self.index[c] = len(self.index)
+        if len(self.index) > self.sums.shape[0]:
+            grown = np.zeros((max(len(self.index), 2 * self.sums.shape[0]), STAT_COLUMNS))
+            grown[:self.sums.shape[0]] = self.sums
+            self.sums = grown
+        return np.fromiter((self.index[c] for c in candidates), dtype=np.intp, count=len(candidates))
+
+    @property
+    def nbytes(self) -> int:
+        return self.sums.nbytes
+
+class UsageTraceStore:
+    # Sessions are kept in least-recently-used order; expired ones are dropped on access,
+    # the oldest beyond max_sessions on insert.
+    def __init__(self, ttl: float, max_sessions: int):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.expirations = 0
+        self.evictions = 0
+        self._sessions: "OrderedDict[str, TraceSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.touched <= self.ttl:
+                break
+            del self._sessions[session_id]
+            self.expirations += 1
+
+    def _session(self, session_id: str, create: bool) -> TraceSession:
+        now = time.monotonic()
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                raise UnknownSessionError(f"Unknown or expired session_id '{session_id}'. Send its usage samples again to start a new session.")
+            session = self._sessions[session_id] = TraceSession()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        self._sessions.move_to_end(session_id)
+        session.touched = now
+        return session
+
+    def append(self, session_id: str, candidates: List[str], deltas: np.ndarray) -> None:
+        # deltas: one row of sums per (distinct) candidate
+        with self._lock:
+            session = self._session(session_id, create=True)
+            rows = session.rows(candidates)
+            session.sums[rows] += deltas
+
+    def sums(self, session_id: str, candidates: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Candidates the session has not seen yet have no samples (all sums zero).
+        with self._lock:
+            session = self._session(session_id, create=False)
+            rows = np.fromiter((session.index.get(c, -1) for c in candidates), dtype=np.intp, count=len(candidates))
+            values = np.where((rows >= 0)[:, None], session.sums[np.maximum(rows, 0)], 0.0)
+        return values[:, 0], values[:, 1], values[:, 2]
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "candidates": sum(len(s.index) for s in self._sessions.values()),
+                "bytes": sum(s.nbytes for s in self._sessions.values()),
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "ttl_seconds": self.ttl,
+                "max_sessions": self.max_sessions
+            }
+
+trace_store = UsageTraceStore(
+    ttl=float(os.getenv("ECONOMICS_TRACE_TTL", "3600")),
+    max_sessions=int(os.getenv("ECONOMICS_TRACE_MAX_SESSIONS", "10000"))
+)
@@ -0,0 +1,25 @@
+import json
+import os
+from pathlib import Path
+
+# Heavy services run in the threadpool and nothing is warmed up, so the app needs no
+# worker processes under test. Set before the app (and its executor) is imported.
+os.environ.setdefault("ECONOMICS_POOL_WORKERS", "0")
+os.environ.setdefault("ECONOMICS_WARMUP", "none")
+os.environ.setdefault("ECONOMICS_LOG_LEVEL", "CRITICAL")
+
+import pytest
+from fastapi.testclient import TestClient
+
+EXAMPLES = Path(__file__).resolve().parent.parent / "json_examples"
+
+@pytest.fixture(scope="session")
+def client() -> TestClient:
+    from main import app
+    return TestClient(app, raise_server_exceptions=False)
+
+@pytest.fixture
+def example():
+    def load(name: str) -> dict:
+        return json.loads((EXAMPLES / f"{name}.json").read_text())
+    return load
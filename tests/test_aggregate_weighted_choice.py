@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+URL = "/economics/aggregate-weighted-choice"
+
+def assert_same_response(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, dict):
+            assert_same_response(actual[key], value)
+        else:
+            assert actual[key] == pytest.approx(value)
+
+def test_batch_matches_single_requests(client, example):
+    first = {**example("aggregate_weighted_choice"), "capability_weighted": True}
+    second = {"economic_values": {"agent3": {"benefit": 50.0, "cost": 5.0, "capability": 0.2, "tokenFlow": 10.0}}}
+    items = [first, second, {**first, "include_contributions": True}]
+    response = client.post(f"{URL}/batch", json={"items": items})
+    assert response.status_code == 200
+    for item, result in zip(items, response.json()["results"]):
+        assert result.get("error") is None
+        assert_same_response(result["result"], client.post(URL, json=item).json())
+
+AGENTS = {
+    f"agent{i}": {"benefit": 10.0 + 3 * i, "cost": 2.0 + i % 5, "capability": 0.1 * (i % 9), "tokenFlow": 5.0 * i}
+    for i in range(12)
+}
+
+def test_chunks_states_and_merge_match_one_pass(client):
+    names = list(AGENTS)
+    whole = client.post(URL, json={"economic_values": AGENTS, "capability_weighted": True}).json()
+    chunks = [{n: AGENTS[n] for n in names[i:i + 5]} for i in range(0, len(names), 5)]
+
+    state = None
+    for chunk in chunks:
+        state = client.post(URL, json={"economic_values": chunk, "state": state, "capability_weighted": True}).json()["state"]
+    assert_same_response(state, whole["state"])
+
+    partials = [client.post(URL, json={"economic_values": chunk}).json()["state"] for chunk in reversed(chunks)]
+    merged = client.post(f"{URL}/merge", json={"states": partials, "capability_weighted": True}).json()
+    assert_same_response(merged, whole)
+
+    body = "\n".join(json.dumps({name: metrics}) for name, metrics in AGENTS.items())
+    streamed = client.post(f"{URL}/stream?capability_weighted=true", content=body.encode()).json()
+    assert_same_response(streamed, whole)
+
+def test_empty_merge_scores_zero(client):
+    response = client.post(f"{URL}/merge", json={"states": []})
+    assert response.status_code == 200
+    assert response.json()["group_decision_score"] == 0.0
+
+@pytest.mark.parametrize("body", [
+    b'{"benefit": 1.0, "cost": 1.0}\n',
+    b'{"benefit": 1.0, "cost": 1.0, "capability": 0.5, "tokenFlow": "lots"}\n',
+    b"not json\n",
+    b'{"benefit": 1.0, "cost": 1.0, "capability": 0.5, "tokenFlow": 1.0, "pad": "' + b"x" * (2 << 20) + b'"}\n',
+])
+def test_bad_ndjson_lines_answer_400(client, body):
+    assert client.post(f"{URL}/stream", content=body).status_code == 400
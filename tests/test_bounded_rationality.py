@@ -0,0 +1,65 @@
+import importlib.util
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from core.execution import HEAVY, LIGHT
+from models.bounded_rationality_model import BoundedRationalityRequest
+from services.bounded_rationality_service import bounded_rationality_weight, sample_best_of_budget
+
+URL = "/economics/bounded-rationality"
+
+def exact_best_of_budget(payoffs: np.ndarray, budget: int) -> np.ndarray:
+    # Every draw order is equally likely; the pick is the first drawn of the best drawn payoffs.
+    counts = np.zeros(payoffs.size)
+    orders = list(permutations(range(payoffs.size)))
+    for order in orders:
+        drawn = list(order[:budget])
+        best = max(payoffs[i] for i in drawn)
+        counts[next(i for i in drawn if payoffs[i] == best)] += 1
+    return counts / len(orders)
+
+@pytest.mark.parametrize("payoffs, budget", [([3.0, 1.0, 2.0, 5.0, 4.0], 2), ([2.0, 2.0, 1.0, 2.0, 0.0], 3), ([1.0, 1.0, 1.0], 1)])
+def test_sampled_picks_match_exact_distribution(payoffs, budget):
+    payoffs = np.array(payoffs)
+    picked = sample_best_of_budget(payoffs, budget, 200_000, np.random.default_rng(0))
+    frequencies = np.bincount(picked, minlength=payoffs.size) / picked.size
+    assert np.allclose(frequencies, exact_best_of_budget(payoffs, budget), atol=0.01)
+
+def test_simulate_replications_summary(client, example):
+    body = {**example("bounded_rationality"), "mode": "simulate", "replications": 5000, "payoff_quantiles": [0, 1]}
+    response = client.post(URL, json=body)
+    assert response.status_code == 200
+    simulation = response.json()["simulation"]
+    assert simulation["replications"] == 5000
+    assert sum(simulation["choice_frequencies"].values()) == pytest.approx(1.0)
+    assert simulation["payoff_quantiles"] == {"0.0": 10.0, "1.0": 15.0}  # best of any two draws
+
+def test_large_replication_counts_are_heavy(example):
+    body = {**example("bounded_rationality"), "mode": "simulate"}
+    assert bounded_rationality_weight(BoundedRationalityRequest(**body, replications=100)) == LIGHT
+    assert bounded_rationality_weight(BoundedRationalityRequest(**body, replications=1_000_000)) == HEAVY
+
+@pytest.mark.parametrize("extra", [
+    {"replications": -3},
+    {"replications": 0},
+    {"replications": 10 ** 9},
+    {"payoff_quantiles": [2]},
+    {"payoff_quantiles": [-0.1, 0.5]},
+    {"sample_budget": 200_000},
+])
+def test_out_of_range_inputs_answer_422(client, example, extra):
+    body = {**example("bounded_rationality"), "mode": "simulate", **extra}
+    assert client.post(URL, json=body).status_code == 422
+
+@pytest.mark.skipif(importlib.util.find_spec("ax") is not None, reason="ax-platform is installed")
+def test_missing_ax_backend_answers_501(client, example):
+    body = {**example("bounded_rationality"), "mode": "bayes", "bayes_backend": "ax"}
+    response = client.post(URL, json=body)
+    assert response.status_code == 501
+    assert "ax-platform" in response.json()["detail"]
+
+def test_unknown_bayes_policy_answers_400(client, example):
+    body = {**example("bounded_rationality"), "mode": "bayes", "bayes_policy": "greedy"}
+    assert client.post(URL, json=body).status_code == 400
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+URL = "/economics/compute-utility"
+
+def sweep_body(example, **extra):
+    body = {k: v for k, v in example("compute_utility").items() if k != "satisficing_threshold"}
+    return {**body, **extra}
+
+def test_sweep_matches_single_requests(client, example):
+    grid = {"softmax_temp": [0.5, 2.0], "attention_budget": [None, 8.0]}
+    response = client.post(f"{URL}/sweep", json=sweep_body(example, grid=grid))
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 4
+    for result in results:
+        single = client.post(URL, json=sweep_body(example, **result["setting"])).json()
+        assert result["choice"] == single["choice"]
+        assert result["probabilities"] == pytest.approx(single["probabilities"])
+
+@pytest.mark.parametrize("extra", [
+    {"grid": {"foo": [1]}},
+    {"grid": {"softmax_temp": [1.0] * 200, "attention_cost_coeff": [1.0] * 200}},
+    {"grid": {"softmax_temp": [1.0]}, "settings": [{"softmax_temp": 2.0}]},
+    {},
+    {"settings": [{"softmax_temp": None}]},
+])
+def test_bad_sweeps_answer_400(client, example, extra):
+    response = client.post(f"{URL}/sweep", json=sweep_body(example, **extra))
+    assert response.status_code == 400
+
+def test_ndjson_lines_match_json_result(client, example):
+    body = example("compute_utility")
+    result = client.post(URL, json=body).json()
+    response = client.post(URL, json={**body, "format": "ndjson", "fields": ["probabilities", "raw"]})
+    assert response.status_code == 200
+    *lines, summary = [json.loads(line) for line in response.text.splitlines()]
+    assert {line["id"]: line["probabilities"] for line in lines} == pytest.approx(result["probabilities"])
+    assert {line["id"]: line["raw"] for line in lines} == pytest.approx(result["raw"])
+    assert set(lines[0]) == {"id", "probabilities", "raw"}
+    assert summary["choice"] == result["choice"]
+
+def test_unknown_format_and_fields_are_rejected(client, example):
+    body = example("compute_utility")
+    assert client.post(URL, json={**body, "format": "xml"}).status_code == 422
+    assert client.post(URL, json={**body, "format": "ndjson", "fields": ["bogus"]}).status_code == 400
@@ -0,0 +1,86 @@
+import json
+import numpy as np
+import pytest
+
+from services import trace_store as trace_store_module
+from services.trace_store import UsageTraceStore, UnknownSessionError, trace_store
+
+URL = "/economics/efficiency-ranking"
+
+def test_store_expires_idle_sessions(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(trace_store_module.time, "monotonic", lambda: now[0])
+    store = UsageTraceStore(ttl=10, max_sessions=4)
+    store.append("s", ["a"], np.array([[1.0, 2.0, 0.0]]))
+    now[0] += 5
+    assert store.sums("s", ["a"])[1].tolist() == [2.0]
+    now[0] += 11
+    with pytest.raises(UnknownSessionError):
+        store.sums("s", ["a"])
+    assert store.stats()["expirations"] == 1
+
+def test_store_evicts_least_recently_used():
+    store = UsageTraceStore(ttl=3600, max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        store.append(session_id, ["x"], np.ones((1, 3)))
+    with pytest.raises(UnknownSessionError):
+        store.sums("a", ["x"])
+    assert store.stats()["evictions"] == 1
+
+def test_session_ranking_matches_full_traces(client, example):
+    body = example("efficiency_ranking")
+    full = client.post(URL, json=body).json()
+    first = {c: t[:2] for c, t in body["usage_trace"].items()}
+    rest = {c: t[2:] for c, t in body["usage_trace"].items()}
+    assert client.post(f"{URL}/sessions/match", json={"usage_trace": first}).status_code == 200
+    ranked = client.post(URL, json={**body, "usage_trace": rest, "session_id": "match"}).json()
+    assert ranked["ranked_list"] == full["ranked_list"]
+    for c, score in full["efficiency_scores"].items():
+        assert ranked["efficiency_scores"][c] == pytest.approx(score)
+
+def test_expired_session_answers_404(client, example, monkeypatch):
+    body = example("efficiency_ranking")
+    assert client.post(f"{URL}/sessions/old", json={"usage_trace": body["usage_trace"]}).status_code == 200
+    monkeypatch.setattr(trace_store, "ttl", -1.0)
+    response = client.post(URL, json={**body, "usage_trace": {}, "session_id": "old"})
+    assert response.status_code == 404
+    assert "expired" in response.json()["detail"]
+
+def test_unknown_session_answers_404(client, example):
+    response = client.post(URL, json={**example("efficiency_ranking"), "usage_trace": {}, "session_id": "never-created"})
+    assert response.status_code == 404
+
+def test_negative_samples_answer_400(client, example):
+    response = client.post(f"{URL}/sessions/neg", json={"usage_trace": {"optionX": [-1.0]}})
+    assert response.status_code == 400
+    body = {**example("efficiency_ranking"), "incremental": True, "usage_trace": {"optionX": [-1.0]}}
+    assert client.post(URL, json=body).status_code == 400
+
+def test_delete_unknown_session_answers_404(client):
+    assert client.delete(f"{URL}/sessions/missing").status_code == 404
+
+def test_ndjson_lines_match_json_ranking(client, example):
+    body = example("efficiency_ranking")
+    ranked = client.post(URL, json=body).json()
+    response = client.post(URL, json={**body, "format": "ndjson", "fields": ["efficiency_score"]})
+    assert response.status_code == 200
+    *lines, summary = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["candidate"] for line in lines] == ranked["ranked_list"]
+    assert {line["candidate"]: line["efficiency_score"] for line in lines} == pytest.approx(ranked["efficiency_scores"])
+    assert summary["preferred_variant"] == ranked["preferred_variant"]
+
+def test_unknown_format_and_fields_are_rejected(client, example):
+    body = example("efficiency_ranking")
+    assert client.post(URL, json={**body, "format": "xml"}).status_code == 422
+    assert client.post(URL, json={**body, "format": "ndjson", "fields": ["bogus"]}).status_code == 400
+
+def test_top_k_keeps_the_best_candidates(client, example):
+    body = example("efficiency_ranking")
+    ranked = client.post(URL, json=body).json()
+    response = client.post(URL, json={**body, "top_k": 2})
+    assert response.status_code == 200
+    assert response.json()["ranked_list"] == ranked["ranked_list"][:2]
+
+@pytest.mark.parametrize("top_k", [0, -1])
+def test_non_positive_top_k_is_rejected(client, example, top_k):
+    assert client.post(URL, json={**example("efficiency_ranking"), "top_k": top_k}).status_code == 422
@@ -0,0 +1,43 @@
+import io
+
+import numpy as np
+import pytest
+
+from core.encoding import NPY
+
+RISK_URL = "/economics/risk-assessment"
+
+def npy_body(*arrays) -> bytes:
+    buf = io.BytesIO()
+    for values in arrays:
+        np.save(buf, np.asarray(values), allow_pickle=False)
+    return buf.getvalue()
+
+def npy_columns(content: bytes, names: str) -> dict:
+    buf = io.BytesIO(content)
+    return {name: np.load(buf, allow_pickle=False) for name in names.split(",")}
+
+def test_npy_round_trip_matches_json(client, example):
+    body = example("risk_assessment")
+    profile = client.post(RISK_URL, json=body).json()["risk_profile"]
+    payoffs = [body["payoff_matrix"][c] for c in body["choice_set"]]
+    response = client.post(RISK_URL, content=npy_body(body["choice_set"], payoffs, body["prob_matrix"]), headers={"Content-Type": NPY})
+    assert response.status_code == 200
+    columns = npy_columns(response.content, response.headers["X-Array-Names"])
+    assert columns["choice"].tolist() == body["choice_set"]
+    assert columns["ExpectedValue"] == pytest.approx([profile[c]["ExpectedValue"] for c in body["choice_set"]])
+
+@pytest.mark.parametrize("query, content", [
+    ("", b"not an npy payload"),
+    ("?horizon=0", npy_body(["a"], [1.0], [[1.0]])),
+    ("?confidence=2", npy_body(["a"], [1.0], [[1.0]])),
+    ("", npy_body(["a", "b"], [1.0, 2.0], [[0.5, 0.2], [0.5, 0.5]])),
+])
+def test_bad_binary_requests_answer_400(client, query, content):
+    response = client.post(RISK_URL + query, content=content, headers={"Content-Type": NPY})
+    assert response.status_code == 400
+
+def test_json_in_binary_out_answers_400_for_bad_start_weights(client, example):
+    body = {**example("risk_assessment"), "horizon": 2, "initial_distribution": {"optionZ": 1.0}}
+    response = client.post(RISK_URL, json=body, headers={"Accept": NPY})
+    assert response.status_code == 400
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from services.incentive_alignment_service import IncentiveAgent
+
+URL = "/economics/incentive-alignment"
+
+def greedy_capped_strategy(payoffs: np.ndarray, caps: np.ndarray) -> np.ndarray:
+    # max p @ x over {sum x = 1, 0 <= x <= caps} fills the best payoffs first, up to each cap.
+    strategy = np.zeros(payoffs.size)
+    remaining = 1.0
+    for i in np.argsort(-payoffs, kind="stable"):
+        strategy[i] = min(caps[i], remaining)
+        remaining -= strategy[i]
+    return strategy
+
+@pytest.mark.parametrize("seed", range(5))
+def test_analytic_matches_cvxpy(seed):
+    payoffs = np.random.default_rng(seed).normal(size=6)
+    agent = IncentiveAgent()
+    analytic = agent.analyticStrategy(payoffs)
+    solved = agent.cvxpyStrategy(payoffs, np.ones(6), None, 1e-3, 0.0)
+    assert payoffs @ solved == pytest.approx(payoffs @ analytic, abs=1e-6)
+    assert np.allclose(solved, analytic, atol=1e-5)
+
+def test_capped_strategy_matches_greedy_fill():
+    payoffs = np.array([10.0, 5.0, 12.0, 7.0])
+    caps = np.array([0.3, 1.0, 0.4, 0.2])
+    solved = IncentiveAgent().cvxpyStrategy(payoffs, caps, None, 1e-3, 0.0)
+    assert np.allclose(solved, greedy_capped_strategy(payoffs, caps), atol=1e-5)
+
+def test_analytic_route_picks_best_choice(client, example):
+    response = client.post(URL, json=example("incentive_alignment"))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["updated_strategy"] == {"strategyA": 0.0, "strategyB": 0.0, "strategyC": 1.0}
+    assert body["expected_payoff"] == 12.0
+
+def test_negative_caps_are_rejected(client, example):
+    response = client.post(URL, json={**example("incentive_alignment"), "choice_caps": {"strategyA": -1}})
+    assert response.status_code == 422
+
+def test_infeasible_caps_answer_400(client, example):
+    caps = {"strategyA": 0.2, "strategyB": 0.2, "strategyC": 0.2}
+    response = client.post(URL, json={**example("incentive_alignment"), "choice_caps": caps})
+    assert response.status_code == 400
+    assert "choice_caps" in response.json()["detail"]
+
+def test_unknown_solver_answers_400(client, example):
+    response = client.post(URL, json={**example("incentive_alignment"), "solver": "simplex"})
+    assert response.status_code == 400
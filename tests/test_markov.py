@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from services.markov import horizon_distribution, power_iteration, solve_stationary, stationary_distribution, stationary_distributions_batch
+
+def random_chain(seed: int, n: int, density: float = 1.0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    P = rng.random((n, n)) * (rng.random((n, n)) < density) + np.eye(n, k=1) + np.eye(n, k=1 - n)
+    return P / P.sum(axis=1, keepdims=True)
+
+def eigen_stationary(P: np.ndarray) -> np.ndarray:
+    values, vectors = np.linalg.eig(P.T)
+    pi = np.real(vectors[:, np.argmin(np.abs(values - 1.0))])
+    return pi / pi.sum()
+
+@pytest.mark.parametrize("seed", range(3))
+def test_dense_and_sparse_solvers_match_eigenvector(seed):
+    P = random_chain(seed, 30, density=0.2)
+    reference = eigen_stationary(P)
+    assert solve_stationary(P) == pytest.approx(reference, abs=1e-10)
+    assert solve_stationary(sp.csr_matrix(P)) == pytest.approx(reference, abs=1e-10)
+    assert power_iteration(sp.csr_matrix(P)) == pytest.approx(reference, abs=1e-6)
+
+def test_batch_matches_single_solves():
+    chains = np.stack([random_chain(seed, 6) for seed in range(4)])
+    batch = stationary_distributions_batch(chains)
+    for P, pi in zip(chains, batch):
+        assert pi == pytest.approx(eigen_stationary(P), abs=1e-10)
+
+def test_reducible_chain_keeps_first_recurrent_class():
+    # states 0 and 1 are transient, {2, 3} and {4} are recurrent classes
+    P = np.array([
+        [0.5, 0.5, 0.0, 0.0, 0.0],
+        [0.2, 0.2, 0.3, 0.0, 0.3],
+        [0.0, 0.0, 0.1, 0.9, 0.0],
+        [0.0, 0.0, 0.6, 0.4, 0.0],
+        [0.0, 0.0, 0.0, 0.0, 1.0],
+    ])
+    pi = stationary_distribution(P)
+    assert pi @ P == pytest.approx(pi)
+    assert pi.sum() == pytest.approx(1.0)
+    assert np.count_nonzero(pi) in (1, 2) and pi[:2].sum() == 0.0
+    assert stationary_distributions_batch(P[None])[0] == pytest.approx(pi)
+
+@pytest.mark.parametrize("horizon", [1, 7, 64, 1000])
+def test_horizon_distribution_matches_stepping(horizon):
+    P = random_chain(5, 8)
+    x = np.zeros(8)
+    x[3] = 1.0
+    occupancy = np.zeros(8)
+    state = x
+    for _ in range(horizon):
+        occupancy += state
+        state = state @ P
+    assert horizon_distribution(P, x, horizon) == pytest.approx(occupancy / horizon, abs=1e-10)
+    assert horizon_distribution(sp.csr_matrix(P), x, horizon) == pytest.approx(occupancy / horizon, abs=1e-8)
+
+def test_cache_stats_route(client):
+    response = client.get("/economics/markov/cache-stats")
+    assert response.status_code == 200
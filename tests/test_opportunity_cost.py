@@ -0,0 +1,30 @@
+import pytest
+
+URL = "/economics/opportunity-cost"
+
+def test_profile_and_top_k(client, example):
+    # P is doubly stochastic, so every choice is weighted by the uniform 1/3
+    body = example("opportunity_cost")
+    profile = client.post(URL, json=body).json()["trade_off_profile"]
+    assert profile["action1"] == pytest.approx({"action2": 2 / 3, "action3": -2 / 3})
+    response = client.post(URL, json={**body, "top_k": 1, "rows": ["action3"]})
+    assert response.status_code == 200
+    profile = response.json()["trade_off_profile"]
+    assert list(profile) == ["action3"]
+    assert profile["action3"] == pytest.approx({"action2": 4 / 3})
+
+def test_columnar_payoffs_rebuild_the_profile(client, example):
+    body = example("opportunity_cost")
+    profile = client.post(URL, json=body).json()["trade_off_profile"]
+    columnar = client.post(URL, json={**body, "format": "columnar"}).json()
+    payoffs = dict(zip(columnar["choices"], columnar["payoffs"]))
+    for i, row in profile.items():
+        assert row == pytest.approx({j: payoffs[j] - payoffs[i] for j in row})
+
+@pytest.mark.parametrize("top_k", [0, -2])
+def test_non_positive_top_k_is_rejected(client, example, top_k):
+    assert client.post(URL, json={**example("opportunity_cost"), "top_k": top_k}).status_code == 422
+
+@pytest.mark.parametrize("extra", [{"rows": ["action9"]}, {"format": "binary", "rows": ["action9"]}, {"format": "xml"}])
+def test_bad_rows_and_formats_answer_400(client, example, extra):
+    assert client.post(URL, json={**example("opportunity_cost"), **extra}).status_code == 400
@@ -0,0 +1,68 @@
+import pytest
+
+URL = "/economics/payoff-weighted-aggregation"
+
+PROPOSALS = {f"p{i}": {"amount": float((37 * i) % 101)} for i in range(20)}
+GRADIENTS = {f"p{i}": 0.1 + (i % 7) / 10 for i in range(20)}
+
+def shards(size: int):
+    names = list(PROPOSALS)
+    for start in range(0, len(names), size):
+        part = names[start:start + size]
+        yield {"proposal_map": {n: PROPOSALS[n] for n in part}, "payoff_gradients": {n: GRADIENTS[n] for n in part}}
+
+@pytest.mark.parametrize("size", [1, 6, 20])
+def test_partials_combine_to_the_single_result(client, size):
+    whole = client.post(URL, json={"proposal_map": PROPOSALS, "payoff_gradients": GRADIENTS}).json()
+    partials = [client.post(f"{URL}/partial", json=shard).json() for shard in shards(size)]
+    combined = client.post(f"{URL}/combine", json={"partials": partials}).json()
+    assert combined["winning_pattern"] == whole["winning_pattern"]
+    assert combined["count"] == len(PROPOSALS)
+    assert combined["total"] == pytest.approx(sum(whole["weighted_scores"].values()))
+    assert combined["consensus_dsl"] == pytest.approx(whole["consensus_dsl"])
+
+def test_partials_without_scores_still_find_the_winner(client):
+    whole = client.post(URL, json={"proposal_map": PROPOSALS, "payoff_gradients": GRADIENTS}).json()
+    partials = [client.post(f"{URL}/partial", json={**shard, "include_scores": False}).json() for shard in shards(7)]
+    assert all("weighted_scores" not in p for p in partials)
+    combined = client.post(f"{URL}/combine", json={"partials": partials}).json()
+    assert combined["winning_pattern"] == whole["winning_pattern"]
+    assert "consensus_dsl" not in combined
+
+def test_typed_form_matches_proposal_map(client, example):
+    body = example("payoff_weighted_aggregation")
+    typed = {
+        "proposal_ids": list(body["proposal_map"]),
+        "amounts": [p["amount"] for p in body["proposal_map"].values()],
+        "gradients": list(body["payoff_gradients"].values()),
+    }
+    typed_result, mapped_result = client.post(URL, json=typed).json(), client.post(URL, json=body).json()
+    assert typed_result["winning_pattern"] == mapped_result["winning_pattern"]
+    assert typed_result["weighted_scores"] == pytest.approx(mapped_result["weighted_scores"])
+    assert typed_result["consensus_dsl"] == pytest.approx(mapped_result["consensus_dsl"])
+
+def test_overlapping_partials_answer_400(client):
+    partial = client.post(f"{URL}/partial", json=next(shards(5))).json()
+    assert client.post(f"{URL}/combine", json={"partials": [partial, partial]}).status_code == 400
+
+@pytest.mark.parametrize("body", [
+    {"proposal_map": {"a": {"amount": None}}},
+    {"proposal_map": {"a": {"amount": "1e400"}}},
+    {"proposal_ids": ["a", "b"], "amounts": [1.0]},
+    {"proposal_ids": ["a", "a"], "amounts": [1.0, 2.0]},
+    {"proposal_ids": ["a"], "amounts": [1.0], "proposal_map": {"b": {"amount": 1.0}}},
+    {"proposal_ids": ["a", "b"], "amounts": [1.0, 2.0], "gradients": [1.0]},
+])
+def test_bad_proposals_answer_400(client, body):
+    assert client.post(URL, json=body).status_code == 400
+    assert client.post(f"{URL}/partial", json=body).status_code == 400
+
+def test_batch_reports_bad_items_individually(client, example):
+    good = example("payoff_weighted_aggregation")
+    bad = {"proposal_ids": ["a", "b"], "amounts": [1.0]}
+    response = client.post(f"{URL}/batch", json={"items": [good, bad, good]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[1]["result"] is None and results[1]["error"].startswith("ValueError")
+    assert results[0]["result"] == results[2]["result"] == client.post(URL, json=good).json()
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+URL = "/economics/risk-assessment"
+
+def test_simulation_of_fixed_payoffs_has_no_spread(client, example):
+    body = {**example("risk_assessment"), "mode": "simulation", "paths": 200, "random_seed": 0}
+    response = client.post(URL, json=body)
+    assert response.status_code == 200
+    profile = response.json()["risk_profile"]
+    assert profile["optionA"]["VaR"] == profile["optionA"]["CVaR"] == 10.0
+    assert profile["optionC"]["ConfidenceInterval"] == 0.0
+
+@pytest.mark.parametrize("confidence", [0, 1, 1.5, -0.2])
+def test_confidence_outside_unit_interval_is_rejected(client, example, confidence):
+    response = client.post(URL, json={**example("risk_assessment"), "confidence": confidence})
+    assert response.status_code == 422
+
+@pytest.mark.parametrize("extra", [
+    {"paths": 10_000_000},
+    {"paths": 1_000_000, "horizon": 1000},
+    {"paths": 0},
+    {"payoff_distributions": {"optionD": {"sd": 1.0}}},
+])
+def test_simulation_limits_answer_400(client, example, extra):
+    response = client.post(URL, json={**example("risk_assessment"), "mode": "simulation", **extra})
+    assert response.status_code == 400
+
+def test_horizon_weights_match_mean_state_distribution(client, example):
+    body = {**example("risk_assessment"), "horizon": 3, "initial_distribution": {"optionA": 1.0}}
+    response = client.post(URL, json=body)
+    assert response.status_code == 200
+    P = np.array(body["prob_matrix"])
+    x = np.array([1.0, 0.0, 0.0])
+    occupancy = (x + x @ P + x @ P @ P) / 3
+    expected = occupancy * np.array([10.0, 5.0, 12.0])
+    profile = response.json()["risk_profile"]
+    assert [profile[c]["ExpectedValue"] for c in body["choice_set"]] == pytest.approx(expected.tolist())
+
+@pytest.mark.parametrize("extra", [
+    {"horizon": 3, "initial_distribution": {"optionZ": 1.0}},
+    {"horizon": 3, "initial_distribution": {"optionA": -1.0}},
+    {"initial_distribution": {"optionA": 1.0}},
+    {"mode": "simulation", "horizon": 3, "initial_distribution": {"optionA": 1.0}},
+    {"prob_matrix": [[0.5, 0.2, 0.1], [0.1, 0.8, 0.1], [0.2, 0.1, 0.7]]},
+    {"prob_matrix": [[1.5, -0.5, 0.0], [0.1, 0.8, 0.1], [0.2, 0.1, 0.7]], "horizon": 2},
+])
+def test_bad_chains_answer_400(client, example, extra):
+    response = client.post(URL, json={**example("risk_assessment"), **extra})
+    assert response.status_code == 400
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from scipy.optimize import linprog
+
+from services.scarcity_constraint_service import ScarcityConstraintCVXPY, ScarcityConstraintVectorized, ScarcityJointAllocator
+
+URL = "/economics/scarcity-constraint"
+
+def random_problem(seed: int, n_options: int, n_resources: int):
+    rng = np.random.default_rng(seed)
+    required = rng.uniform(0.0, 10.0, (n_options, n_resources)) * (rng.random((n_options, n_resources)) < 0.7)
+    available = required.sum(axis=0) * 0.3
+    resource_pool = {f"r{j}": float(available[j]) for j in range(n_resources)}
+    demand_vector = {f"o{i}": {f"r{j}": float(required[i, j]) for j in range(n_resources)} for i in range(n_options)}
+    return resource_pool, demand_vector, required, available
+
+@pytest.mark.parametrize("seed", range(3))
+def test_closed_form_matches_cvxpy(seed):
+    resource_pool, demand_vector, _, _ = random_problem(seed, 8, 3)
+    closed = ScarcityConstraintVectorized().scarcityConstraint(resource_pool, demand_vector)
+    solved = ScarcityConstraintCVXPY().scarcityConstraint(resource_pool, demand_vector)
+    assert closed["FeasibilityMap"] == pytest.approx(solved["FeasibilityMap"], abs=1e-3)
+    assert closed["InfeasibleOptions"] == solved["InfeasibleOptions"]
+    assert closed["BindingConstraints"] == solved["BindingConstraints"]
+
+@pytest.mark.parametrize("seed", range(3))
+def test_joint_allocation_matches_reference_lp(seed):
+    resource_pool, demand_vector, required, available = random_problem(seed, 40, 4)
+    weights = np.random.default_rng(seed).uniform(0.5, 2.0, len(demand_vector))
+    payoff_weights = dict(zip(demand_vector, weights.tolist()))
+    result = ScarcityJointAllocator().jointAllocation(resource_pool, demand_vector, payoff_weights)
+    reference = linprog(-weights, A_ub=required.T, b_ub=available, bounds=(0, 1), method="highs")
+    assert result["JointObjective"] == pytest.approx(-reference.fun, rel=1e-6)
+    allocation = np.array(list(result["JointAllocation"].values()))
+    assert np.all(required.T @ allocation <= available + 1e-6)
+    prices = np.array([result["ShadowPrices"].get(r, 0.0) for r in resource_pool])
+    assert prices == pytest.approx(-reference.ineqlin.marginals, abs=1e-6)
+
+def test_joint_mode_over_the_route(client, example):
+    response = client.post(URL, json={**example("scarcity_constraint"), "mode": "joint"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["joint_allocation"]["option1"] == pytest.approx(1.0)
+    assert body["joint_allocation"]["option3"] == pytest.approx(1.0)
+    assert body["joint_objective"] == pytest.approx(sum(body["joint_allocation"].values()))
+
+@pytest.mark.parametrize("extra", [{"mode": "greedy"}, {"solver": "simplex"}])
+def test_unknown_mode_or_solver_is_rejected(client, example, extra):
+    response = client.post(URL, json={**example("scarcity_constraint"), **extra})
+    assert response.status_code == 422
+
+def test_batch_matches_single_requests(client, example):
+    base = example("scarcity_constraint")
+    items = [base, {**base, "mode": "joint"}, {**base, "resource_pool": {"resourceA": 20.0, "resourceB": 5.0}}, {**base, "solver": "cvxpy"}]
+    response = client.post(f"{URL}/batch", json={"items": items})
+    assert response.status_code == 200
+    for item, result in zip(items, response.json()["results"]):
+        single = client.post(URL, json=item).json()
+        assert result["result"]["infeasible_options"] == single["infeasible_options"]
+        assert result["result"]["feasibility_map"] == pytest.approx(single["feasibility_map"], abs=1e-4)
@@ -0,0 +1,34 @@
+import os
+import pickle
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from core.registry import LazyService, warmup_modules
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def test_app_starts_without_the_numeric_stack():
+    script = "import sys, main; print(','.join(m for m in ('cvxpy', 'scipy') if m in sys.modules))"
+    env = {**os.environ, "ECONOMICS_WARMUP": "none"}
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+def test_lazy_service_pickles_as_a_reference():
+    service = LazyService("services.markov", "cache_stats")
+    restored = pickle.loads(pickle.dumps(service))
+    assert (restored.module, restored.__name__, restored._fn) == ("services.markov", "cache_stats", None)
+    assert restored() == service()
+
+def test_startup_report_records_first_imports(client, example):
+    assert client.post("/economics/scarcity-constraint", json=example("scarcity_constraint")).status_code == 200
+    report = client.get("/startup").json()
+    assert report["services"]["scarcity_constraint"]["seconds"] is not None
+
+def test_unknown_warmup_services_are_rejected():
+    assert warmup_modules("none") == []
+    with pytest.raises(ValueError):
+        warmup_modules("markov,bogus")